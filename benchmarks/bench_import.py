@@ -0,0 +1,177 @@
+"""
+Import time benchmark for JLR InControl.
+
+Measures the time to import the integration and the platforms Home
+Assistant loads when a config entry is set up, on top of the Home
+Assistant modules that are already loaded by then. Each run is a fresh
+interpreter using python -X importtime. Reports the median total and the
+slowest modules, and exits with an error if the total is over --max-ms
+(150 ms unless given, 0 for no limit) or a module listed in --forbid was
+imported.
+
+    python benchmarks/bench_import.py --runs 5 --max-ms 100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PACKAGE = "custom_components.jlrincontrol"
+
+# Loaded by Home Assistant before the integration sets up
+BASELINE = [
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.device_registry",
+    "homeassistant.helpers.dispatcher",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.event",
+    "homeassistant.helpers.service",
+    "homeassistant.helpers.storage",
+    "homeassistant.components.sensor",
+    "homeassistant.components.lock",
+    "homeassistant.components.device_tracker",
+]
+
+# Imported for a config entry setup
+TARGETS = [
+    PACKAGE,
+    PACKAGE + ".sensor",
+    PACKAGE + ".lock",
+    PACKAGE + ".device_tracker",
+]
+
+# Fails if the median total is over this, unless --max-ms is given
+DEFAULT_MAX_MS = 150
+
+# Should only load when first used
+DEFAULT_FORBID = ["jlrpy", "numpy", PACKAGE + ".config_flow"]
+
+MARKER = "jlrincontrol-import-start"
+
+
+def run_once(targets):
+    """Modules imported for targets in a fresh interpreter, with self times"""
+    code = "\n".join(
+        ["import sys"]
+        + ["import {}".format(name) for name in BASELINE]
+        + ["print({!r}, file=sys.stderr, flush=True)".format(MARKER)]
+        + ["import {}".format(name) for name in targets]
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    lines = proc.stderr.split(MARKER, 1)[1].splitlines()
+    modules = {}
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            modules[name.strip()] = int(self_us)
+    return modules
+
+
+def run_benchmark(runs, targets):
+    results = [run_once(targets) for _ in range(runs)]
+    totals = [sum(modules.values()) / 1000 for modules in results]
+    # Per module medians from every run that imported it
+    names = set().union(*results)
+    modules = {
+        name: statistics.median(r[name] for r in results if name in r) / 1000
+        for name in names
+    }
+    return {
+        "runs": runs,
+        "total_ms": round(statistics.median(totals), 1),
+        "min_ms": round(min(totals), 1),
+        "modules": len(names),
+        "integration_ms": round(
+            sum(ms for name, ms in modules.items() if name.startswith(PACKAGE)), 1
+        ),
+        "slowest": [
+            {"module": name, "ms": round(ms, 2)}
+            for name, ms in sorted(modules.items(), key=lambda i: -i[1])
+        ],
+        "imported": sorted(names),
+    }
+
+
+def print_results(result, top):
+    print(
+        "{} runs, median {:.1f} ms (min {:.1f} ms), {} modules, {:.1f} ms in "
+        "the integration".format(
+            result["runs"],
+            result["total_ms"],
+            result["min_ms"],
+            result["modules"],
+            result["integration_ms"],
+        )
+    )
+    print()
+    header = "{:<60}{:>10}".format("module", "self ms")
+    print(header)
+    print("-" * len(header))
+    for item in result["slowest"][:top]:
+        print("{:<60}{:>10.2f}".format(item["module"], item["ms"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="modules to list")
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=DEFAULT_MAX_MS,
+        help="fail if the median total is over this, 0 for no limit",
+    )
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=DEFAULT_FORBID,
+        help="fail if any of these modules are imported",
+    )
+    parser.add_argument(
+        "--config-flow",
+        action="store_true",
+        help="also import the config flow, as when adding an entry",
+    )
+    parser.add_argument("--json", action="store_true", help="output json")
+    args = parser.parse_args()
+
+    targets = TARGETS + ([PACKAGE + ".config_flow"] if args.config_flow else [])
+    result = run_benchmark(args.runs, targets)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_results(result, args.top)
+
+    failures = [
+        "{} was imported".format(name)
+        for name in args.forbid or []
+        if name in result["imported"] and name not in targets
+    ]
+    if args.max_ms and result["total_ms"] > args.max_ms:
+        failures.append(
+            "import took {:.1f} ms, over {:.1f} ms".format(
+                result["total_ms"], args.max_ms
+            )
+        )
+    for failure in failures:
+        print("FAIL: {}".format(failure), file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Replay a JLR InControl capture journal.
+
+Feeds a journal written with the capture api data option back through
+the integration api handler, one update cycle at a time, and reports wall
+time, api calls and event loop busy time per cycle. Speed scales the
+recorded api latency and the gaps between cycles, with 0 (the default)
+replaying as fast as possible. --profile adds a cProfile of the replay.
+
+    python benchmarks/bench_replay.py jlrincontrol_capture_xxx.jsonl.gz
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import tempfile
+from functools import partial
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.storage import STORAGE_DIR  # noqa: E402
+from homeassistant.util.unit_system import METRIC_SYSTEM  # noqa: E402
+
+from custom_components.jlrincontrol import JLRApiHandler  # noqa: E402
+from custom_components.jlrincontrol.capture import (  # noqa: E402
+    JLRReplayTransport,
+    read_journal,
+)
+from custom_components.jlrincontrol.const import DOMAIN, JLR_DATA  # noqa: E402
+from bench_update import (  # noqa: E402
+    LoopMonitor,
+    Measurement,
+    print_results,
+    transport_counts,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def next_cycle_time(transport):
+    """Recorded time of the next status call, which starts a cycle"""
+    times = [
+        queue[0]["ts"]
+        for (endpoint, _), queue in transport.responses.items()
+        if endpoint == "get_status" and queue
+    ]
+    return min(times) if times else None
+
+
+async def run_replay(args, records, config_dir):
+    hass = HomeAssistant(config_dir)
+    hass.config.units = METRIC_SYSTEM
+    monitor = LoopMonitor(asyncio.get_running_loop())
+
+    config_entry = SimpleNamespace(
+        entry_id="replay",
+        data={"username": "replay", "password": "replay"},
+        options={"pin": "1234", "scan_interval": 5},
+    )
+    data = JLRApiHandler(hass, config_entry)
+    data.transport = JLRReplayTransport(hass, records, args.speed)
+    hass.data[DOMAIN] = {config_entry.entry_id: {JLR_DATA: data}}
+    counts = partial(transport_counts, data.transport)
+
+    results = []
+    try:
+        with Measurement("connect", monitor, counts) as step:
+            await data.async_connect()
+        results.append(step.result)
+
+        cycle = 0
+        last = next_cycle_time(data.transport)
+        while data.vehicles and next_cycle_time(data.transport) is not None:
+            if args.cycles and cycle >= args.cycles:
+                break
+            cycle += 1
+            start = next_cycle_time(data.transport)
+            if args.speed and start > last:
+                await asyncio.sleep((start - last) / args.speed)
+            last = start
+            with Measurement("update {}".format(cycle), monitor, counts) as step:
+                await data.async_update()
+            results.append(step.result)
+    finally:
+        await hass.async_stop(force=True)
+
+    for result in results:
+        result["vehicles"] = len(data.vehicles)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("journal")
+    parser.add_argument("--speed", type=float, default=0, help="0 for no delays")
+    parser.add_argument("--cycles", type=int, default=0, help="0 for all")
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--top", type=int, default=25, help="profile lines")
+    parser.add_argument("--json", action="store_true", help="output json")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.ERROR)
+    records = read_journal(args.journal)
+
+    profiler = cProfile.Profile() if args.profile else None
+    with tempfile.TemporaryDirectory() as config_dir:
+        os.makedirs(os.path.join(config_dir, STORAGE_DIR))
+        if profiler:
+            profiler.enable()
+        results = asyncio.run(run_replay(args, records, config_dir))
+        if profiler:
+            profiler.disable()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("Replayed {} api responses".format(len(records)))
+        print_results(results)
+
+    if profiler:
+        print()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
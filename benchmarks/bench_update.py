@@ -0,0 +1,235 @@
+"""
+Update cycle benchmark for JLR InControl.
+
+Runs the integration api handler against the local fake InControl server
+for a range of vehicle counts and reports, for connect, each update cycle
+and a lock command, the wall time, api requests made and event loop busy
+time.
+
+    python benchmarks/bench_update.py --vehicles 1 10 100 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.storage import STORAGE_DIR  # noqa: E402
+from homeassistant.util.unit_system import METRIC_SYSTEM  # noqa: E402
+
+from custom_components.jlrincontrol import JLRApiHandler  # noqa: E402
+from custom_components.jlrincontrol.capture import JLRCaptureJournal  # noqa: E402
+from custom_components.jlrincontrol.const import DOMAIN, JLR_DATA  # noqa: E402
+from fake_server import FakeInControlServer, patch_jlrpy  # noqa: E402
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Measures time the event loop spends outside of select"""
+
+    def __init__(self, loop):
+        self.idle = 0.0
+        selector = loop._selector
+        select = selector.select
+
+        def timed_select(timeout=None):
+            start = time.perf_counter()
+            try:
+                return select(timeout)
+            finally:
+                self.idle += time.perf_counter() - start
+
+        selector.select = timed_select
+
+
+def server_counts(server):
+    """Requests, errors and per endpoint requests made to the fake server"""
+    return (
+        sum(server.requests.values()),
+        sum(server.errors.values()),
+        dict(server.requests),
+    )
+
+
+def transport_counts(transport):
+    """Calls, errors and per endpoint calls recorded by the transport"""
+    summary = transport.metrics.summary()
+    return (
+        sum(m.calls for m in summary.values()),
+        sum(m.errors for m in summary.values()),
+        {endpoint: m.calls for endpoint, m in summary.items()},
+    )
+
+
+class Measurement:
+    """Wall time, loop busy time and api calls for one step"""
+
+    def __init__(self, name, monitor, counts):
+        self.name = name
+        self.monitor = monitor
+        self.counts = counts
+        self.result = {}
+
+    def __enter__(self):
+        self.before = self.counts()
+        self.idle = self.monitor.idle
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start
+        idle = self.monitor.idle - self.idle
+        calls, errors, endpoints = self.counts()
+        self.result = {
+            "step": self.name,
+            "wall_s": round(wall, 4),
+            "loop_busy_s": round(max(wall - idle, 0), 4),
+            "api_calls": calls - self.before[0],
+            "api_errors": errors - self.before[1],
+            "endpoints": {
+                k: v - self.before[2].get(k, 0)
+                for k, v in endpoints.items()
+                if v - self.before[2].get(k, 0)
+            },
+            "failed": repr(exc) if exc else None,
+        }
+        # Record failures rather than abort the run
+        return exc_type is None or issubclass(exc_type, Exception)
+
+
+async def run_benchmark(args, vehicles, config_dir):
+    server = FakeInControlServer(
+        vehicles=vehicles,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ).start()
+    patch_jlrpy(server.url)
+
+    hass = HomeAssistant(config_dir)
+    hass.config.units = METRIC_SYSTEM
+    monitor = LoopMonitor(asyncio.get_running_loop())
+
+    config_entry = SimpleNamespace(
+        entry_id="bench",
+        data={"username": "bench@example.com", "password": "bench"},
+        options={"pin": "1234", "scan_interval": 5},
+    )
+    data = JLRApiHandler(hass, config_entry)
+    # The account rate limit would measure the limiter, not the integration
+    if not args.rate_limit:
+        data.transport.limiter = None
+    hass.data[DOMAIN] = {config_entry.entry_id: {JLR_DATA: data}}
+    if args.capture:
+        data.transport.journal = JLRCaptureJournal(hass, "bench")
+        data.transport.journal.path = args.capture
+    counts = partial(server_counts, server)
+
+    results = []
+    try:
+        with Measurement("connect", monitor, counts) as step:
+            await data.async_connect()
+        results.append(step.result)
+
+        for cycle in range(args.cycles if data.vehicles else 0):
+            if cycle:
+                server.drive()
+            # Real cycles are minutes apart, past the cache ttls
+            data.cache.invalidate()
+            with Measurement("update {}".format(cycle + 1), monitor, counts) as step:
+                await data.async_update()
+            results.append(step.result)
+
+        if data.vehicles:
+            vin = next(iter(data.vehicles))
+            with Measurement("lock command", monitor, counts) as step:
+                await data.get_service(vin).async_call_service(
+                    service_name="lock", service_code="RDL", pin="1234"
+                )
+            results.append(step.result)
+
+            # Command latency with an update and health update running
+            polls = [
+                hass.async_create_task(data.async_update()),
+                hass.async_create_task(data.async_health_update()),
+            ]
+            await asyncio.sleep(0)
+            with Measurement("lock under load", monitor, counts) as step:
+                await data.get_service(vin).async_call_service(
+                    service_name="lock", service_code="RDL", pin="1234"
+                )
+            results.append(step.result)
+            await asyncio.gather(*polls)
+    finally:
+        server.stop()
+        await data.async_shutdown()
+        await hass.async_stop(force=True)
+
+    for result in results:
+        result["vehicles"] = vehicles
+    return results
+
+
+def print_results(results):
+    header = "{:>8}  {:<16}{:>10}{:>12}{:>11}{:>8}".format(
+        "vehicles", "step", "wall s", "loop busy s", "api calls", "errors"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            "{:>8}  {:<16}{:>10.3f}{:>12.3f}{:>11}{:>8}  {}".format(
+                r["vehicles"],
+                r["step"],
+                r["wall_s"],
+                r["loop_busy_s"],
+                r["api_calls"],
+                r["api_errors"],
+                "failed: {}".format(r["failed"]) if r["failed"] else "",
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vehicles", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="max extra seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0 to 1")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--capture", help="write a capture journal to this file")
+    parser.add_argument(
+        "--rate-limit", action="store_true", help="keep the account rate limit"
+    )
+    parser.add_argument("--json", action="store_true", help="output json")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.ERROR)
+
+    results = []
+    for vehicles in args.vehicles:
+        with tempfile.TemporaryDirectory() as config_dir:
+            os.makedirs(os.path.join(config_dir, STORAGE_DIR))
+            results += asyncio.run(run_benchmark(args, vehicles, config_dir))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""
+Local stand-in for the JLR InControl api.
+
+Serves realistic auth, vehicle, attribute, status, position, trip and
+service payloads for any number of vehicles over plain http, so the
+integration can be exercised without an account or a car. Latency and
+errors can be injected to see how the integration behaves on a slow or
+failing api.
+
+Use patch_jlrpy() to point jlrpy at the server.
+"""
+import argparse
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_LOGGER = logging.getLogger(__name__)
+
+USER_ID = "benchuser"
+SERVICE_CODES = ["RDL", "RDU", "VHS", "HBLF", "ALOFF", "REON", "REOFF", "CP", "ECC", "SWU"]
+
+# Map of url patterns to endpoint names used in request counts
+ROUTES = [
+    ("POST", r"/ifas/jlr/tokens/tokensSSO$", "auth"),
+    ("POST", r"/ifop/jlr/users/[^/]+/clients$", "register_device"),
+    ("GET", r"/if9/jlr/users$", "login"),
+    ("GET", r"/if9/jlr/users/[^/]+/vehicles$", "vehicles"),
+    ("GET", r"/if9/jlr/geocode/reverse/[^/]+/[^/]+/\w+$", "reverse_geocode"),
+    ("GET", r"/if9/jlr/vehicles/(?P<vin>\w+)/attributes$", "attributes"),
+    ("GET", r"/if9/jlr/vehicles/(?P<vin>\w+)/status$", "status"),
+    ("GET", r"/if9/jlr/vehicles/(?P<vin>\w+)/position$", "position"),
+    ("GET", r"/if9/jlr/vehicles/(?P<vin>\w+)/trips$", "trips"),
+    ("GET", r"/if9/jlr/vehicles/(?P<vin>\w+)/services$", "services"),
+    ("GET", r"/if9/jlr/vehicles/(?P<vin>\w+)/services/(?P<service_id>\w+)$", "service_status"),
+    ("POST", r"/if9/jlr/vehicles/(?P<vin>\w+)/users/[^/]+/authenticate$", "authenticate"),
+    ("POST", r"/if9/jlr/vehicles/(?P<vin>\w+)/(?P<command>[\w/]+)$", "command"),
+]
+
+COMMAND_SERVICE_CODES = {
+    "lock": "RDL",
+    "unlock": "RDU",
+    "healthstatus": "VHS",
+    "honkBlink": "HBLF",
+    "engineOn": "REON",
+    "engineOff": "REOFF",
+    "preconditioning": "ECC",
+    "chargeProfile": "CP",
+    "swu": "SWU",
+}
+
+
+def api_time(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S+0000")
+
+
+def make_vin(index):
+    return "SADHA2B10L1F{:05d}".format(index)
+
+
+class FakeVehicle:
+    """State of one vehicle on the fake server"""
+
+    def __init__(self, index, electric):
+        self.index = index
+        self.vin = make_vin(index)
+        self.electric = electric
+        self.locked = True
+        self.soc = 40 + index % 50
+        self.odometer = 10000000 + index * 1000
+        self.latitude = 51.5 + index * 0.001
+        self.longitude = -0.12 - index * 0.001
+        self.trip_id = 1000 * (index + 1)
+        self.trips = []
+        for _ in range(20):
+            self.add_trip()
+        self.pending_services = {}
+
+    def add_trip(self):
+        """Add a trip ending now and move the vehicle"""
+        self.trip_id += 1
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(minutes=25)
+        distance = 8000 + (self.trip_id % 17) * 1000
+        start_position = {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "address": "{} Start Road".format(self.trip_id),
+        }
+        self.latitude += 0.02
+        self.longitude += 0.01
+        self.odometer += distance
+        self.trips.insert(
+            0,
+            {
+                "id": self.trip_id,
+                "name": None,
+                "category": None,
+                "routeDetails": {"boundingBox": None, "route": None},
+                "tripDetails": {
+                    "startTime": api_time(start),
+                    "endTime": api_time(end),
+                    "distance": distance,
+                    "averageSpeed": 42,
+                    "averageFuelConsumption": None if self.electric else 6.8,
+                    "averageEnergyConsumption": 21.4 if self.electric else None,
+                    "fuelEconomy": None,
+                    "startOdometer": self.odometer - distance,
+                    "endOdometer": self.odometer,
+                    "startPosition": start_position,
+                    "endPosition": {
+                        "latitude": self.latitude,
+                        "longitude": self.longitude,
+                        "address": "{} End Street".format(self.trip_id),
+                    },
+                    "totalEcoScore": {
+                        "score": 72.0,
+                        "scoreStatus": "VALID",
+                        "ecoScoreContributions": [],
+                    },
+                },
+            },
+        )
+        del self.trips[1000:]
+
+    def attributes(self):
+        return {
+            "engineCode": "EV400" if self.electric else "PT204",
+            "seatsQuantity": 5,
+            "exteriorColorName": "Yulong White",
+            "exteriorCode": None,
+            "interiorColorName": None,
+            "interiorCode": None,
+            "tyreDimensionCode": None,
+            "tyreInflationPressureLightCode": None,
+            "tyreInflationPressureHeavyCode": None,
+            "fuelType": "Electric" if self.electric else "Petrol",
+            "fuelTankVolume": None if self.electric else 82,
+            "grossWeight": 2670,
+            "modelYear": 2021,
+            "constructionYear": None,
+            "releaseDate": None,
+            "countryCode": "GBR",
+            "vehicleBrand": "Jaguar",
+            "vehicleType": "I-PACE" if self.electric else "F-PACE",
+            "vehicleTypeCode": "X590" if self.electric else "X761",
+            "bodyType": "SUV",
+            "gearboxCode": "AUTO",
+            "availableServices": [
+                {
+                    "serviceType": code,
+                    "vehicleCapable": True,
+                    "serviceEnabled": not (self.electric and code in ["REON", "REOFF"])
+                    and not (not self.electric and code in ["CP", "ECC"]),
+                }
+                for code in SERVICE_CODES
+            ],
+            "capabilities": [
+                {"capability": name, "capabilityClass": "Vehicle"}
+                for name in ["GUARDIAN_MODE", "SERVICE_MODE", "TRANSPORT_MODE"]
+            ],
+            "nickname": "Car {}".format(self.index + 1),
+            "registrationNumber": "BN{:02d} ABC".format(self.index % 100),
+            "telematicsDevice": "TCU",
+            "deliveryInformation": {"isDelivered": True},
+        }
+
+    def status(self):
+        now = api_time(datetime.now(timezone.utc))
+        locked = "TRUE" if self.locked else "FALSE"
+        lock_status = "LOCKED" if self.locked else "UNLOCKED"
+        core = {
+            "ODOMETER_METER": self.odometer,
+            "ODOMETER_MILES": int(self.odometer / 1609.344),
+            "ODOMETER": int(self.odometer / 1000),
+            "DOOR_IS_ALL_DOORS_LOCKED": locked,
+            "DOOR_FRONT_LEFT_LOCK_STATUS": lock_status,
+            "DOOR_FRONT_RIGHT_LOCK_STATUS": lock_status,
+            "DOOR_REAR_LEFT_LOCK_STATUS": lock_status,
+            "DOOR_REAR_RIGHT_LOCK_STATUS": lock_status,
+            "DOOR_ENGINE_HOOD_LOCK_STATUS": lock_status,
+            "DOOR_BOOT_LOCK_STATUS": lock_status,
+            "DOOR_FRONT_LEFT_POSITION": "CLOSED",
+            "DOOR_FRONT_RIGHT_POSITION": "CLOSED",
+            "DOOR_REAR_LEFT_POSITION": "CLOSED",
+            "DOOR_REAR_RIGHT_POSITION": "CLOSED",
+            "DOOR_ENGINE_HOOD_POSITION": "CLOSED",
+            "DOOR_BOOT_POSITION": "CLOSED",
+            "WINDOW_FRONT_LEFT_STATUS": "CLOSED",
+            "WINDOW_FRONT_RIGHT_STATUS": "CLOSED",
+            "WINDOW_REAR_LEFT_STATUS": "CLOSED",
+            "WINDOW_REAR_RIGHT_STATUS": "CLOSED",
+            "IS_SUNROOF_OPEN": "FALSE",
+            "TYRE_PRESSURE_FRONT_LEFT": 250,
+            "TYRE_PRESSURE_FRONT_RIGHT": 252,
+            "TYRE_PRESSURE_REAR_LEFT": 268,
+            "TYRE_PRESSURE_REAR_RIGHT": 266,
+            "TYRE_STATUS_FRONT_LEFT": "NORMAL",
+            "TYRE_STATUS_FRONT_RIGHT": "NORMAL",
+            "TYRE_STATUS_REAR_LEFT": "NORMAL",
+            "TYRE_STATUS_REAR_RIGHT": "NORMAL",
+            "BRAKE_FLUID_WARN": "NORMAL",
+            "ENG_COOLANT_LEVEL_WARN": "NORMAL",
+            "EXT_PARTICULATE_FILTER_WARN": "NORMAL_UNBLOCKED",
+            "ENGINE_BLOCK": "NORMAL_UNBLOCKED",
+            "EXT_EXHAUST_FLUID_WARN": "NORMAL",
+            "EXT_OIL_LEVEL_WARN": "NORMAL",
+            "WASHER_FLUID_WARN": "NORMAL",
+            "EXT_KILOMETERS_TO_SERVICE": 21000,
+            "EXT_EXHAUST_FLUID_DISTANCE_TO_SERVICE_KM": 9000,
+            "EXT_EXHAUST_FLUID_VOLUME_REFILL_LITRESX10": 0,
+            "THEFT_ALARM_STATUS": "ALARM_ARMED" if self.locked else "ALARM_OFF",
+            "IS_PANIC_ALARM_TRIGGERED": "FALSE",
+            "PRIVACY_SWITCH": "FALSE",
+            "VEHICLE_STATE_TYPE": "KEY_REMOVED",
+            "ENGINE_STATE": "OFF",
+            "FUEL_LEVEL_PERC": None if self.electric else 64,
+            "DISTANCE_TO_EMPTY_FUEL": None if self.electric else 480,
+            "BATTERY_VOLTAGE": 12.4,
+            "TU_STATUS_POWER": "VEHICLE_POWER",
+            "TU_STATUS_PRIMARY_VOLT": 4.1,
+            "TU_STATUS_SW_VERSION_MAIN": "KS05.12.23",
+            "TU_STATUS_SERIAL_ANT": "ON",
+            "CLIMATE_STATUS_OPERATING_STATUS": "OFF",
+            "CLIMATE_STATUS_REMAINING_RUNTIME": 0,
+            "CLIMATE_STATUS_FFH_REMAINING_RUNTIME": 0,
+            "CLIMATE_STATUS_VENTING_TIME": 0,
+            "CLIMATE_STATUS_TIMER_ACTIVATION_STATUS": "FALSE",
+            "SRS_STATUS": "NORMAL",
+            "EXT_SERVICE_DUE": "FALSE",
+            "EXT_KILOMETERS_TO_SERVICE_WARN": "FALSE",
+        }
+        ev = {}
+        if self.electric:
+            ev = {
+                "EV_STATE_OF_CHARGE": self.soc,
+                "EV_CHARGING_STATUS": "NOTCONNECTED",
+                "EV_CHARGING_METHOD": "NOTCONNECTED",
+                "EV_CHARGING_MODE_CHOICE": "SLOW",
+                "EV_CHARGING_RATE_SOC_PER_HOUR": 0,
+                "EV_CHARGING_RATE_KM_PER_HOUR": 0,
+                "EV_CHARGING_RATE_MILES_PER_HOUR": 0,
+                "EV_MINUTES_TO_FULLY_CHARGED": 0,
+                "EV_MINUTES_TO_BULK_CHARGED": 0,
+                "EV_RANGE_ON_BATTERY_KM": int(self.soc * 3.8),
+                "EV_RANGE_ON_BATTERY_MILES": int(self.soc * 2.4),
+                "EV_RANGE_COMBINED_KM": int(self.soc * 3.8),
+                "EV_ENERGY_CONSUMED_LAST_CHARGE_KWH": 310,
+                "EV_IS_PRECONDITIONING_SUPPORTED": "TRUE",
+                "EV_PRECONDITION_OPERATING_STATUS": "OFF",
+                "EV_PRECONDITION_REMAINING_RUNTIME_MINUTES": 0,
+                "EV_PERMANENT_MAX_SOC_CHARGE_SETTING_CHOICE": "100",
+                "EV_ONE_OFF_MAX_SOC_CHARGE_SETTING_CHOICE": "CLEAR",
+                "EV_CHARGE_NOW_SETTING": "DEFAULT",
+                "EV_BATTERY_PRECONDITIONING_STATUS": "OFF",
+            }
+        return {
+            "vehicleStatus": {
+                "coreStatus": [{"key": k, "value": str(v)} for k, v in core.items()],
+                "evStatus": [{"key": k, "value": str(v)} for k, v in ev.items()],
+            },
+            "vehicleAlerts": [],
+            "lastUpdatedTime": now,
+        }
+
+    def position(self):
+        return {
+            "position": {
+                "longitude": round(self.longitude, 6),
+                "latitude": round(self.latitude, 6),
+                "timestamp": api_time(datetime.now(timezone.utc)),
+                "speed": 0,
+                "heading": 90,
+            },
+            "calculatedPosition": False,
+        }
+
+
+class FakeInControlServer:
+    """Threaded http server pretending to be the InControl api"""
+
+    def __init__(
+        self,
+        vehicles=1,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        error_endpoints=None,
+        service_polls=1,
+        electric_ratio=0.5,
+        seed=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_endpoints = set(error_endpoints or [])
+        self.service_polls = service_polls
+        self.random = random.Random(seed)
+        self.vehicles = {}
+        for i in range(vehicles):
+            vehicle = FakeVehicle(i, (i * electric_ratio) % 1 < electric_ratio)
+            self.vehicles[vehicle.vin] = vehicle
+        self.requests = Counter()
+        self.errors = Counter()
+        self.service_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-incontrol", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests.clear()
+            self.errors.clear()
+
+    def drive(self):
+        """Add a new trip to every vehicle"""
+        with self.lock:
+            for vehicle in self.vehicles.values():
+                vehicle.add_trip()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                _LOGGER.debug(format, *args)
+
+            def do_GET(self):
+                server.handle(self, "GET")
+
+            def do_POST(self):
+                server.handle(self, "POST")
+
+            def do_DELETE(self):
+                server.handle(self, "DELETE")
+
+        return Handler
+
+    def handle(self, request, method):
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        url = urlsplit(request.path)
+        path = url.path
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        for route_method, pattern, endpoint in ROUTES:
+            match = re.match(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            endpoint, match = "unknown", None
+
+        with self.lock:
+            self.requests[endpoint] += 1
+
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if (
+            self.error_rate
+            and (not self.error_endpoints or endpoint in self.error_endpoints)
+            and self.random.random() < self.error_rate
+        ):
+            with self.lock:
+                self.errors[endpoint] += 1
+            return self._send(request, 503, None)
+
+        if match is None:
+            return self._send(request, 404, None)
+
+        try:
+            data = json.loads(body) if body else None
+        except json.JSONDecodeError:
+            data = None
+
+        with self.lock:
+            status, payload = self.respond(
+                endpoint, {**query, **match.groupdict()}, data
+            )
+        self._send(request, status, payload)
+
+    def _send(self, request, status, payload):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def respond(self, endpoint, params, data):
+        """Return status code and payload for an api request"""
+        vehicle = self.vehicles.get(params.get("vin"))
+        if "vin" in params and vehicle is None:
+            return 404, None
+
+        if endpoint == "auth":
+            return 200, {
+                "access_token": "access-token",
+                "authorization_token": "authorization-token",
+                "expires_in": "86400",
+                "refresh_token": "refresh-token",
+                "token_type": "bearer",
+            }
+        if endpoint == "register_device":
+            return 204, None
+        if endpoint == "login":
+            return 200, {"userId": USER_ID, "loginName": "bench@example.com"}
+        if endpoint == "vehicles":
+            return 200, {
+                "vehicles": [
+                    {"userId": USER_ID, "vin": vin, "role": "Primary"}
+                    for vin in self.vehicles
+                ]
+            }
+        if endpoint == "reverse_geocode":
+            return 200, {"formattedAddress": "1 Bench Street, Coventry"}
+        if endpoint == "attributes":
+            return 200, vehicle.attributes()
+        if endpoint == "status":
+            return 200, vehicle.status()
+        if endpoint == "position":
+            return 200, vehicle.position()
+        if endpoint == "trips":
+            return 200, {"trips": vehicle.trips[: int(params.get("count", 1000))]}
+        if endpoint == "services":
+            return 200, {
+                "services": [
+                    "/vehicles/{}/services/{}".format(vehicle.vin, service_id)
+                    for service_id in vehicle.pending_services
+                ]
+            }
+        if endpoint == "service_status":
+            return self._service_status(vehicle, params["service_id"])
+        if endpoint == "authenticate":
+            return 200, {"token": "service-token"}
+        if endpoint == "command":
+            return self._command(vehicle, params["command"])
+        return 404, None
+
+    def _command(self, vehicle, command):
+        service_id = "{:020d}".format(next(self.service_ids))
+        vehicle.pending_services[service_id] = {
+            "serviceType": COMMAND_SERVICE_CODES.get(command, "NA"),
+            "command": command,
+            "polls": 0,
+        }
+        return 200, self._service_payload(vehicle, service_id, "Started")
+
+    def _service_status(self, vehicle, service_id):
+        service = vehicle.pending_services.get(service_id)
+        if service is None:
+            return 404, None
+        service["polls"] += 1
+        if service["polls"] < self.service_polls:
+            return 200, self._service_payload(vehicle, service_id, "Running")
+
+        # Apply the command
+        if service["command"] == "lock":
+            vehicle.locked = True
+        elif service["command"] == "unlock":
+            vehicle.locked = False
+        del vehicle.pending_services[service_id]
+        return 200, self._service_payload(vehicle, service_id, "Successful")
+
+    def _service_payload(self, vehicle, service_id, status):
+        service = vehicle.pending_services.get(service_id, {})
+        return {
+            "status": status,
+            "statusTimestamp": api_time(datetime.now(timezone.utc)),
+            "startTime": api_time(datetime.now(timezone.utc)),
+            "serviceType": service.get("serviceType", "NA"),
+            "failureReason": None,
+            "serviceId": service_id,
+            "vehicleId": vehicle.vin,
+            "customerServiceId": service_id,
+            "initiator": "USER",
+            "active": status != "Successful",
+        }
+
+
+def patch_jlrpy(url):
+    """Point jlrpy at a fake server"""
+    import jlrpy
+
+    jlrpy.BaseURLs.IFAS = url + "/ifas/jlr"
+    jlrpy.BaseURLs.IFOP = url + "/ifop/jlr"
+    jlrpy.BaseURLs.IF9 = url + "/if9/jlr"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--vehicles", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG)
+    server = FakeInControlServer(
+        vehicles=args.vehicles,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        port=args.port,
+    )
+    print("Fake InControl api on {}".format(server.url))
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
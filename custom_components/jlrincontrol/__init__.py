@@ -9,16 +9,16 @@ msparker@sky.com
 import asyncio
 import json
 import logging
+import time
+from collections import defaultdict
+from urllib.error import HTTPError
 from datetime import timedelta
-from functools import partial
 from typing import Optional
 
 from homeassistant.helpers import config_validation as cv, entity_platform
 from homeassistant.helpers.event import (
-    async_track_time_interval,
     async_call_later,
 )
-import jlrpy
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import (
@@ -35,12 +35,14 @@ from homeassistant.const import (
     UnitOfTemperature,
 )
 from homeassistant.core import callback
+from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.discovery import async_load_platform
 from homeassistant.helpers.dispatcher import (
     async_dispatcher_connect,
     async_dispatcher_send,
 )
 from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.service import async_register_admin_service
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers import device_registry as dr
 from homeassistant.util import dt
@@ -55,14 +57,69 @@ from .const import (
     DEFAULT_SCAN_INTERVAL,
     MIN_SCAN_INTERVAL,
     DEFAULT_HEATH_UPDATE_INTERVAL,
+    GEOCODE_PRECISION,
+    DEFAULT_MAX_DATA_AGE,
+    SOURCE_API,
+    SOURCE_SNAPSHOT,
+    DEFAULT_LOOP_BUDGET,
     SIGNAL_STATE_UPDATED,
+    SIGNAL_VEHICLES_ADDED,
+    SIGNAL_DATA_AGE_UPDATED,
+    SIGNAL_TRIPS_UPDATED,
+    SIGNAL_API_STATUS_UPDATED,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_BACKOFF_BASE,
+    BREAKER_BACKOFF_MAX,
     JLR_SERVICES,
+    JLR_DATA_SERVICES,
+    JLR_ADMIN_SERVICES,
+    JLR_SEQUENCE_SERVICES,
+    SEQUENCE_MAX_STEPS,
     JLR_DATA,
+    TRIP_PERIODS,
+    DEFAULT_ROUTE_TOLERANCE,
     VERSION,
     CONF_USE_CHINA_SERVERS,
+    CONF_CAPTURE_DATA,
+    CONF_DEBUG_DATA,
+    CONF_DISTANCE_UNIT,
+    CONF_HEALTH_MAX_AGE,
+    CONF_HEALTH_UPDATE_INTERVAL,
+    CONF_LOOP_BUDGET,
+    CONF_MAX_DATA_AGE,
+    CONF_PRESSURE_UNIT,
+    CONF_VEHICLE_SCAN_INTERVALS,
+    DEFAULT_HEALTH_MAX_AGE,
+)
+from .charging import JLRChargingSessionTracker
+from .health import JLRHealthScheduler
+from .loop_budget import JLRLoopBudget
+from .polling import JLRPollScheduler, parse_vehicle_intervals
+from .positions import JLRPositionLog, encode_polyline
+from .profiler import (
+    JLRProfiler,
+    PROFILE_COMMAND,
+    PROFILE_HEALTH_UPDATE,
+    PROFILE_TARGETS,
+    PROFILE_UPDATE,
+)
+from .ratelimit import (
+    JLRRateLimitExceeded,
+    PRIORITY_HEALTH,
+    PRIORITY_POSITION,
+    PRIORITY_STATUS,
+)
+from .resilience import JLRCircuitBreaker, STATE_CLOSED, backoff_delay
+from .session import JLRSession
+from .snapshot import JLRSnapshot
+from .transport import JLRTransport
+from .trips import JLRTripStore
+from .vehicle_profile import JLRVehicleProfile
+from .util import (
+    async_create_entry_task,
+    async_register_data_service,
+    field_mask,
 )
-from .services import JLRService
-from .util import field_mask
 
 # from homeassistant.helpers.icon import icon_for_battery_level
 
@@ -74,11 +131,7 @@ DEFAULT_UPDATE_INTERVAL = timedelta(minutes=5)
 HEALTH_UPDATE_TRACKER = "health_update_tracker"
 STATUS_UPDATE_TRACKER = "status_update_tracker"
 UPDATE_LISTENER = "update_listener"
-
-CONF_DEBUG_DATA = "debug_data"
-CONF_DISTANCE_UNIT = "distance_unit"
-CONF_PRESSURE_UNIT = "pressure_unit"
-CONF_HEALTH_UPDATE_INTERVAL = "health_update_interval"
+SETUP_TASK = "setup_task"
 
 PLATFORMS = ["sensor", "lock", "device_tracker"]
 
@@ -86,6 +139,18 @@ ATTR_PIN = "pin"
 ATTR_CHARGE_LEVEL = "max_charge_level"
 ATTR_TARGET_VALUE = "target_value"
 ATTR_TARGET_TEMP = "target_temp"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_MIN_DISTANCE = "min_distance"
+ATTR_LIMIT = "limit"
+ATTR_PERIOD = "period"
+ATTR_TOLERANCE = "tolerance"
+ATTR_TARGET = "target"
+ATTR_COUNT = "count"
+ATTR_TOP = "top"
+ATTR_COMMAND = "command"
+ATTR_STEPS = "steps"
+ATTR_SERVICE = "service"
 
 SERVICES_BASE_SCHEMA = {
     vol.Required(ATTR_ENTITY_ID): cv.entity_id,
@@ -102,6 +167,73 @@ SERVICES_TARGET_VALUE_SCHEMA = {
 SERVICES_CHARGE_LEVEL_SCHEMA = {
     vol.Required(ATTR_CHARGE_LEVEL): vol.Coerce(int),
 }
+SERVICES_DATE_RANGE_SCHEMA = {
+    vol.Optional(ATTR_START): cv.datetime,
+    vol.Optional(ATTR_END): cv.datetime,
+}
+SERVICES_TRIP_FILTER_SCHEMA = {
+    vol.Optional(ATTR_MIN_DISTANCE): vol.Coerce(float),
+    vol.Optional(ATTR_LIMIT, default=100): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=1000)
+    ),
+}
+SERVICES_TRIP_PERIOD_SCHEMA = {
+    vol.Optional(ATTR_PERIOD, default="day"): vol.In(TRIP_PERIODS),
+}
+SERVICES_ROUTE_SCHEMA = {
+    vol.Optional(ATTR_TOLERANCE, default=DEFAULT_ROUTE_TOLERANCE): vol.All(
+        vol.Coerce(float), vol.Range(min=0)
+    ),
+}
+
+SERVICES_PROFILE_SCHEMA = {
+    vol.Required(ATTR_TARGET): vol.In(PROFILE_TARGETS),
+    vol.Optional(ATTR_COUNT, default=1): vol.All(
+        vol.Coerce(int), vol.Range(min=0, max=50)
+    ),
+    vol.Optional(ATTR_TOP, default=30): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=500)
+    ),
+    vol.Optional(ATTR_COMMAND): vol.In(list(JLR_SERVICES)),
+}
+
+# Each step is checked against its command's own schema when run
+SEQUENCE_STEP_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_SERVICE): vol.In(list(JLR_SERVICES)),
+        vol.Optional(ATTR_TARGET_TEMP): vol.Coerce(int),
+        vol.Optional(ATTR_TARGET_VALUE): vol.Coerce(int),
+        vol.Optional(ATTR_CHARGE_LEVEL): vol.Coerce(int),
+    }
+)
+SERVICES_SEQUENCE_SCHEMA = {
+    vol.Optional(ATTR_PIN): vol.Coerce(str),
+    vol.Required(ATTR_STEPS): vol.All(
+        cv.ensure_list,
+        [SEQUENCE_STEP_SCHEMA],
+        vol.Length(min=1, max=SEQUENCE_MAX_STEPS),
+    ),
+}
+
+
+def _build_schema(schema_names):
+    schema = {}
+    for name in schema_names:
+        schema.update(globals()[name])
+    return vol.Schema(schema)
+
+
+# Service schemas built once from the names given in const
+SERVICE_SCHEMAS = {
+    service: _build_schema(service_info.get("schema"))
+    for services in [
+        JLR_SERVICES,
+        JLR_DATA_SERVICES,
+        JLR_SEQUENCE_SERVICES,
+        JLR_ADMIN_SERVICES,
+    ]
+    for service, service_info in services.items()
+}
 
 CONFIG_SCHEMA = vol.Schema(
     {
@@ -180,106 +312,203 @@ async def async_setup_entry(hass, config_entry):
     """Setup JLR InConnect component"""
     _async_import_options_from_data_if_missing(hass, config_entry)
 
-    health_update_track = None
+    data = JLRApiHandler(hass, config_entry)
 
-    def get_schema(schema_list):
-        s = {}
-        for schema in schema_list:
-            s.update(eval(schema))
-        return vol.Schema(s)
+    update_listener = config_entry.add_update_listener(_async_update_listener)
 
-    data = JLRApiHandler(hass, config_entry)
+    hass.data[DOMAIN][config_entry.entry_id] = {
+        JLR_DATA: data,
+        STATUS_UPDATE_TRACKER: None,
+        HEALTH_UPDATE_TRACKER: None,
+        UPDATE_LISTENER: update_listener,
+        SETUP_TASK: None,
+    }
 
-    update_interval = config_entry.options.get(
-        CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
-    )
-    health_update_interval = config_entry.options.get(
-        CONF_HEALTH_UPDATE_INTERVAL, 0
+    # Platforms add entities as vehicles are found
+    await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
+
+    # Connect and get first data without holding up startup
+    hass.data[DOMAIN][config_entry.entry_id][SETUP_TASK] = async_create_entry_task(
+        hass,
+        config_entry,
+        _async_start_entry(hass, config_entry, data),
+        "{} setup {}".format(DOMAIN, config_entry.entry_id),
     )
 
-    try:
-        if await data.async_connect():
-            if not data.connection.vehicles:
-                # No vehicles or wrong credentials
-                _LOGGER.error(
-                    "Unable to get vehicles from api.  Check credentials"
-                )
-                return False
-    except Exception:
-        return False
+    return True
+
+
+async def _async_start_entry(hass, config_entry, data):
+    """Restore last data, connect, do first update, then start polling"""
+    entry_data = hass.data[DOMAIN][config_entry.entry_id]
+
+    # Show last known data while connecting
+    if await data.async_restore_snapshot():
+        await _async_add_vehicles(hass, config_entry, data)
+
+    # Retries until connected, however long the api is down
+    if not await data.async_connect_with_retry():
+        return
+    if not data.connection.vehicles:
+        _LOGGER.error("Unable to get vehicles from api.  Check credentials")
+        return
 
     # Do first update
     await data.async_update()
 
+    await _async_add_vehicles(hass, config_entry, data)
+
     # Poll for updates in background
+    update_interval = config_entry.options.get(
+        CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
+    )
     _LOGGER.info(
         "Update from InControl servers on {} minute interval".format(
             int(update_interval)
         )
     )
-    update_track = async_track_time_interval(
-        hass, data.do_status_update, timedelta(minutes=update_interval),
+    data.poller = JLRPollScheduler(
+        hass,
+        data.async_update_vehicle,
+        update_interval,
+        parse_vehicle_intervals(
+            config_entry.options.get(CONF_VEHICLE_SCAN_INTERVALS)
+        ),
+    )
+    entry_data[STATUS_UPDATE_TRACKER] = data.poller.async_start(
+        [
+            (vin, data.vehicles[vin].attributes.get("nickname"))
+            for vin in data.live_vehicles
+        ]
     )
 
-    # Schedule health update and repeat interval
+    # Request health updates when vehicles are awake
+    health_update_interval = config_entry.options.get(
+        CONF_HEALTH_UPDATE_INTERVAL, 0
+    )
     if health_update_interval and health_update_interval > 0:
+        data.health = JLRHealthScheduler(
+            hass,
+            data.async_health_update,
+            health_update_interval,
+            config_entry.options.get(CONF_HEALTH_MAX_AGE, DEFAULT_HEALTH_MAX_AGE),
+        )
         _LOGGER.info(
-            "Vehicle health update on {} minute interval.".format(
+            "Vehicle health update when awake, at most every {} minutes.".format(
                 int(health_update_interval)
             )
         )
-        # Do initial call to health_update service after HASS start up.
-        # This speeds up restart.
-        # 30 seconds should do it.
-        async_call_later(hass, 30, data.do_health_update)
-
-        health_update_track = async_track_time_interval(
-            hass,
-            data.do_health_update,
-            timedelta(minutes=data.health_update_interval),
-        )
+        vins = [
+            vin
+            for vin in data.live_vehicles
+            if data.vehicles[vin].profile.supports(
+                JLR_SERVICES["update_health_status"].get("service_code")
+            )
+        ]
+        entry_data[HEALTH_UPDATE_TRACKER] = data.health.async_start(vins)
+        # Vehicles awake now are due one straight away
+        for vin in vins:
+            data.health.async_status_updated(vin, data.vehicles[vin])
     else:
         _LOGGER.info(
             "Scheduled vehicle health update is disabled. "
             + "Set interval in options to enable."
         )
 
-    update_listener = config_entry.add_update_listener(_async_update_listener)
 
-    hass.data[DOMAIN][config_entry.entry_id] = {
-        JLR_DATA: data,
-        STATUS_UPDATE_TRACKER: update_track,
-        HEALTH_UPDATE_TRACKER: health_update_track,
-        UPDATE_LISTENER: update_listener,
-    }
+async def _async_add_vehicles(hass, config_entry, data):
+    """Add devices, services and entities for vehicles not yet added"""
+    await async_update_device_registry(
+        hass, config_entry, list(data.vehicles.values()), data
+    )
 
-    # for vehicle in data.vehicles:
-    for platform in PLATFORMS:
-        hass.async_create_task(
-            hass.config_entries.async_forward_entry_setup(
-                config_entry, platform
+    async_register_services(hass, data)
+
+    new_vehicles = [vin for vin in data.vehicles if vin not in data.added_vehicles]
+    if new_vehicles:
+        data.added_vehicles.update(new_vehicles)
+        async_dispatcher_send(
+            hass,
+            SIGNAL_VEHICLES_ADDED.format(config_entry.entry_id),
+            new_vehicles,
+        )
+
+
+@callback
+def _async_service_handler(hass, function_name):
+    """Handler calling the entry whose vehicle the service is for"""
+
+    async def async_handle_service(service):
+        handlers = [
+            entry_data[JLR_DATA] for entry_data in hass.data[DOMAIN].values()
+        ]
+        entity_id = service.data.get(ATTR_ENTITY_ID)
+        if entity_id is None:
+            # Not for a vehicle, such as profiling, so for every entry
+            for data in handlers:
+                await getattr(data, function_name)(service)
+            return None
+        for data in handlers:
+            if data.get_entity(entity_id):
+                return await getattr(data, function_name)(service)
+        _LOGGER.error(
+            "Unable to call {}. {} is not a JLR InControl entity".format(
+                service.service, entity_id
             )
         )
+        return None
+
+    return async_handle_service
 
-    # Add services
-    for service, service_info in JLR_SERVICES.items():
+
+@callback
+def async_register_services(hass, data):
+    """Register services, skipping commands no vehicle supports"""
+    for service in JLR_SERVICES:
+        if not data.supports_service(service):
+            _LOGGER.debug(
+                "Not adding {} service. Not supported by any vehicle".format(
+                    service
+                )
+            )
+            continue
+        if hass.services.has_service(DOMAIN, service):
+            continue
         _LOGGER.debug("Adding {} service".format(service))
         hass.services.async_register(
             DOMAIN,
             service,
-            data.async_call_service,
-            schema=get_schema(service_info.get("schema")),
+            _async_service_handler(hass, "async_call_service"),
+            schema=SERVICE_SCHEMAS[service],
         )
 
-    # Create vehicle devices
-    await async_update_device_registry(
-        hass, config_entry, data.connection.vehicles, data
-    )
+    for service, service_info in (
+        list(JLR_DATA_SERVICES.items()) + list(JLR_SEQUENCE_SERVICES.items())
+    ):
+        if hass.services.has_service(DOMAIN, service):
+            continue
+        _LOGGER.debug("Adding {} service".format(service))
+        async_register_data_service(
+            hass,
+            DOMAIN,
+            service,
+            _async_service_handler(hass, service_info.get("function_name")),
+            SERVICE_SCHEMAS[service],
+        )
 
-    return True
+    for service, service_info in JLR_ADMIN_SERVICES.items():
+        if hass.services.has_service(DOMAIN, service):
+            continue
+        _LOGGER.debug("Adding {} service".format(service))
+        async_register_admin_service(
+            hass,
+            DOMAIN,
+            service,
+            _async_service_handler(hass, service_info.get("function_name")),
+            SERVICE_SCHEMAS[service],
+        )
 
 
-@callback
 def _async_import_options_from_data_if_missing(hass, config_entry):
     options = dict(config_entry.options)
     modified = False
@@ -328,32 +557,43 @@ async def async_unload_entry(hass, config_entry):
     """Unload a config entry."""
     _LOGGER.info("Unloading JLR InControl Component")
 
-    # Deregister services
-    _LOGGER.info("Unregister JLR InControl Services")
-    for service in JLR_SERVICES.items():
-        _LOGGER.info("Unregister {}".format(service[0]))
-        hass.services.async_remove(DOMAIN, service[0])
+    # Services are shared by all accounts, so only removed with the last
+    if list(hass.data[DOMAIN]) == [config_entry.entry_id]:
+        _LOGGER.info("Unregister JLR InControl Services")
+        for service in (
+            list(JLR_SERVICES.items())
+            + list(JLR_DATA_SERVICES.items())
+            + list(JLR_SEQUENCE_SERVICES.items())
+            + list(JLR_ADMIN_SERVICES.items())
+        ):
+            if not hass.services.has_service(DOMAIN, service[0]):
+                continue
+            _LOGGER.info("Unregister {}".format(service[0]))
+            hass.services.async_remove(DOMAIN, service[0])
+
+    entry_data = hass.data[DOMAIN][config_entry.entry_id]
+
+    # Stop setup if still connecting, so it cannot start anything after this
+    setup_task = entry_data[SETUP_TASK]
+    if setup_task and not setup_task.done():
+        setup_task.cancel()
+        await asyncio.wait([setup_task])
 
     # Stop scheduled updates
-    hass.data[DOMAIN][config_entry.entry_id][UPDATE_LISTENER]()
-    hass.data[DOMAIN][config_entry.entry_id][STATUS_UPDATE_TRACKER]()
-    if hass.data[DOMAIN][config_entry.entry_id][HEALTH_UPDATE_TRACKER]:
-        hass.data[DOMAIN][config_entry.entry_id][HEALTH_UPDATE_TRACKER]()
+    entry_data[UPDATE_LISTENER]()
+    if entry_data[STATUS_UPDATE_TRACKER]:
+        entry_data[STATUS_UPDATE_TRACKER]()
+    if entry_data[HEALTH_UPDATE_TRACKER]:
+        entry_data[HEALTH_UPDATE_TRACKER]()
 
     # Remove platform components
-    unload_ok = all(
-        await asyncio.gather(
-            *[
-                hass.config_entries.async_forward_entry_unload(
-                    config_entry, platform
-                )
-                for platform in PLATFORMS
-            ]
-        )
+    unload_ok = await hass.config_entries.async_unload_platforms(
+        config_entry, PLATFORMS
     )
 
     if unload_ok:
-        hass.data[DOMAIN].pop(config_entry.entry_id)
+        data = hass.data[DOMAIN].pop(config_entry.entry_id)[JLR_DATA]
+        await data.async_shutdown()
 
     return unload_ok
 
@@ -363,11 +603,45 @@ class JLRApiHandler:
         self.hass = hass
         self.config_entry = config_entry
         self.connection = None
+        self.transport = JLRTransport(hass)
+        self.profiler = JLRProfiler(hass)
+        self.loop_budget = JLRLoopBudget(
+            config_entry.options.get(CONF_LOOP_BUDGET, DEFAULT_LOOP_BUDGET)
+        )
+        self.breaker = JLRCircuitBreaker(
+            BREAKER_FAILURE_THRESHOLD, BREAKER_BACKOFF_BASE, BREAKER_BACKOFF_MAX
+        )
+        self._probe_timer = None
+        self.session = JLRSession(config_entry)
+        self.limiter = self.session.limiter
+        self.transport.limiter = self.limiter
+        self.executor = self.session.executor
+        self.transport.executor = self.executor
+        self.scheduler = self.session.scheduler
+        self.transport.scheduler = self.scheduler
+        self.cache = self.session.cache
+        self.transport.cache = self.cache
+        self.poller = None
+        self.health = None
         self.email = config_entry.data.get(CONF_USERNAME)
         self.password = config_entry.data.get(CONF_PASSWORD)
         self.use_china_servers = config_entry.data.get(CONF_USE_CHINA_SERVERS)
         self.vehicles = {}
-        self.entities = []
+        self.trip_stores = {}
+        self.charging_trackers = {}
+        self.position_logs = {}
+        # Entities by entity_id and by vehicle
+        self.entities = {}
+        self.vehicle_entities = defaultdict(dict)
+        self.vehicle_services = {}
+        # Last known data, and when and where each vehicle's data came from
+        self.snapshot = JLRSnapshot(hass, config_entry.entry_id)
+        self.data_received = {}
+        self.data_source = {}
+        self.added_vehicles = set()
+        self.max_data_age = config_entry.options.get(
+            CONF_MAX_DATA_AGE, DEFAULT_MAX_DATA_AGE
+        )
         self.pin = config_entry.options.get(CONF_PIN)
         self.distance_unit = config_entry.options.get(CONF_DISTANCE_UNIT)
         self.pressure_unit = config_entry.options.get(CONF_PRESSURE_UNIT)
@@ -380,22 +654,28 @@ class JLRApiHandler:
 
         self.debug_data = config_entry.options.get(CONF_DEBUG_DATA)
 
-    @callback
-    def do_status_update(self, *args):
-        self.hass.async_create_task(self.async_update())
+        # Write all api responses to a journal for replay
+        if config_entry.options.get(CONF_CAPTURE_DATA):
+            from .capture import JLRCaptureJournal
 
-    @callback
-    def do_health_update(self, *args):
-        self.hass.async_create_task(self.async_health_update())
+            self.transport.journal = JLRCaptureJournal(hass, config_entry.entry_id)
+            _LOGGER.info(
+                "Capturing api responses to {}".format(self.transport.journal.path)
+            )
 
     async def async_connect(self):
         _LOGGER.debug(f"Initialising JLR InControl v{VERSION}")
         _LOGGER.debug("Creating connection to JLR InControl API")
         try:
-            self.connection = await self.hass.async_add_executor_job(
-                partial(jlrpy.Connection, self.email, self.password, '' , '', self.use_china_servers)
+            self.connection = await self.session.async_connect(
+                self.transport, self.password
             )
         except Exception as ex:
+            # Trying again will not help if the login is refused
+            if isinstance(ex, HTTPError) and ex.code in [401, 403]:
+                raise ConfigEntryAuthFailed(
+                    "Login refused by JLR InControl. Error is {}".format(ex)
+                ) from ex
             _LOGGER.warning(
                 "Error connecting to JLRInControl.  Error is {}".format(ex)
             )
@@ -412,7 +692,7 @@ class JLRApiHandler:
         # Discover all vehicles and get one time info
         for vehicle in self.connection.vehicles:
             # Get attributes
-            vehicle.attributes = await self.hass.async_add_executor_job(
+            vehicle.attributes = await self.transport.async_call(
                 vehicle.get_attributes
             )
 
@@ -422,9 +702,7 @@ class JLRApiHandler:
                 _LOGGER.debug(f"Attribute data is empty for {field_mask(vehicle.vin, 3, 2)}")
 
             #Get status
-            status = await self.hass.async_add_executor_job(
-                vehicle.get_status
-            )
+            status = await self.transport.async_call(vehicle.get_status)
 
             if status:
                 _LOGGER.debug(f"Retrieved status data for {field_mask(vehicle.vin, 3, 2)}")
@@ -459,9 +737,20 @@ class JLRApiHandler:
                 f"Discovered {vehicle.attributes.get('vehicleBrand')} {vehicle.attributes.get('vehicleType')} {vehicle.engine_type} Vehicle - {field_mask(vehicle.vin, 3, 2)}"
             )
 
+            # Build static info and unit profile
+            self.update_profile(vehicle)
+
+            # Keep last known data until the first update
+            previous = self.vehicles.get(vehicle.vin)
+            vehicle.status_ev = getattr(previous, "status_ev", {})
+            vehicle.position = getattr(previous, "position", None)
+            vehicle.last_trip = getattr(previous, "last_trip", None)
+
             #Add vehicle to collection
             self.vehicles[vehicle.vin] = vehicle
 
+            await self._async_setup_vehicle(vehicle)
+
             # Add one time dump of attr and status data for debugging
             if self.debug_data:
                 _LOGGER.debug(f"ATTRIBUTE DATA - {vehicle.attributes}")
@@ -469,22 +758,166 @@ class JLRApiHandler:
 
         return True
 
+    async def async_connect_with_retry(self):
+        """
+        Connect, retrying with backoff while the api is unavailable.
+
+        Returns False without retrying if the login is refused, starting a
+        reauth flow so the user can enter the new password.
+        """
+        attempt = 0
+        while True:
+            try:
+                if await self.async_connect():
+                    return True
+            except ConfigEntryAuthFailed as ex:
+                _LOGGER.error("{}. Not retrying".format(ex))
+                self.config_entry.async_start_reauth(self.hass)
+                return False
+            except Exception as ex:
+                _LOGGER.warning(
+                    "Error getting vehicles from JLRInControl.  Error is {}".format(ex)
+                )
+            delay = backoff_delay(BREAKER_BACKOFF_BASE, BREAKER_BACKOFF_MAX, attempt)
+            attempt += 1
+            _LOGGER.warning(
+                "Unable to connect to JLR InControl. Retrying in {} seconds".format(
+                    int(delay)
+                )
+            )
+            async_dispatcher_send(self.hass, SIGNAL_DATA_AGE_UPDATED, None)
+            await asyncio.sleep(delay)
+
+    async def async_restore_snapshot(self):
+        """Add vehicles from their last known data. Returns True if any."""
+        for vin, (vehicle, received) in (await self.snapshot.async_load()).items():
+            self.update_profile(vehicle)
+            self.vehicles[vin] = vehicle
+            self.data_received[vin] = received
+            self.data_source[vin] = SOURCE_SNAPSHOT
+            await self._async_setup_vehicle(vehicle)
+        return bool(self.vehicles)
+
+    async def _async_setup_vehicle(self, vehicle):
+        """Open local history and trackers for a vehicle if not already open"""
+        # Track charging sessions on EV/PHEV
+        if (
+            vehicle.engine_type in [FUEL_TYPE_BATTERY, FUEL_TYPE_HYBRID]
+            and vehicle.vin not in self.charging_trackers
+        ):
+            self.charging_trackers[vehicle.vin] = JLRChargingSessionTracker(
+                self.hass, vehicle.vin, vehicle.attributes.get("nickname")
+            )
+            await self.charging_trackers[vehicle.vin].async_load()
+
+        # Load position history
+        if vehicle.vin not in self.position_logs:
+            self.position_logs[vehicle.vin] = JLRPositionLog(self.hass, vehicle.vin)
+            await self.position_logs[vehicle.vin].async_load()
+
+        # Open local trip history
+        if vehicle.vin not in self.trip_stores:
+            self.trip_stores[vehicle.vin] = JLRTripStore(
+                self.hass, vehicle.vin, self.transport
+            )
+            await self.trip_stores[vehicle.vin].async_setup()
+
+    @property
+    def live_vehicles(self):
+        """Vins of the vehicles on the connected account"""
+        if not self.connection:
+            return []
+        return [vehicle.vin for vehicle in self.connection.vehicles]
+
+    def data_age(self, vin):
+        """Seconds since a vehicle's data was received from the api"""
+        received = self.data_received.get(vin)
+        if not received:
+            return None
+        return (dt.utcnow() - received).total_seconds()
+
+    async def async_shutdown(self):
+        """Stop timers and close files"""
+        if self._probe_timer:
+            self._probe_timer()
+            self._probe_timer = None
+        self.session.close()
+        if self.transport.journal:
+            await self.transport.journal.async_close()
+
+    def update_profile(self, vehicle):
+        """Rebuild static profile after attributes or options change"""
+        vehicle.profile = JLRVehicleProfile(
+            self.hass, vehicle, self.distance_unit, self.pressure_unit
+        )
+
+    def supports_service(self, service):
+        """Whether any vehicle supports a JLR service"""
+        service_code = JLR_SERVICES[service].get("service_code")
+        return any(
+            vehicle.profile.supports(service_code)
+            for vehicle in self.vehicles.values()
+        )
+
+    async def async_reverse_geocode(self, latitude, longitude):
+        """Address of a location, rounded so nearby positions share a lookup"""
+        if not self.connection or not self.limiter.allow(PRIORITY_POSITION):
+            return None
+        return await self.transport.async_call(
+            self.connection.reverse_geocode,
+            round(latitude, GEOCODE_PRECISION),
+            round(longitude, GEOCODE_PRECISION),
+            priority=PRIORITY_POSITION,
+        )
+
+    def get_entity(self, entity_id):
+        return self.entities.get(entity_id)
+
+    @callback
+    def async_add_entity(self, entity):
+        self.entities[entity.entity_id] = entity
+        self.vehicle_entities[entity._vin][entity.entity_id] = entity
+
+    @callback
+    def async_remove_entity(self, entity):
+        self.entities.pop(entity.entity_id, None)
+        self.vehicle_entities[entity._vin].pop(entity.entity_id, None)
+
+    def get_service(self, vin):
+        """Service caller for a vehicle, shared by all calls to it"""
+        if vin not in self.vehicle_services:
+            from .services import JLRService
+
+            self.vehicle_services[vin] = JLRService(
+                self.hass, self.config_entry, vin
+            )
+        return self.vehicle_services[vin]
+
     async def async_call_service(self, service):
-        entity_id = service.data.get(ATTR_ENTITY_ID)
-        entity = next(
-            (
-                entity
-                for entity in self.hass.data[DOMAIN][
-                    self.config_entry.entry_id
-                ][JLR_DATA].entities
-                if entity.entity_id == entity_id
-            ),
-            None,
+        await self.profiler.async_run(
+            PROFILE_COMMAND,
+            self._async_call_service,
+            service,
+            name=service.service,
         )
 
+    async def _async_call_service(self, service):
+        entity_id = service.data.get(ATTR_ENTITY_ID)
+        entity = self.get_entity(entity_id)
+
         # Get service info
         if entity and JLR_SERVICES[service.service]:
             vin = entity._vin
+            service_code = JLR_SERVICES[service.service].get("service_code")
+            if not self.vehicles[vin].profile.supports(service_code):
+                _LOGGER.error(
+                    "Service {} is not available on vehicle {}".format(
+                        service.service,
+                        self.vehicles[vin].attributes.get("nickname"),
+                    )
+                )
+                return
+
             kwargs = {}
             kwargs["service_name"] = JLR_SERVICES[service.service].get(
                 "function_name"
@@ -494,8 +927,9 @@ class JLRApiHandler:
             )
             for k, v in service.data.items():
                 kwargs[k] = v
-            jlr_service = JLRService(self.hass, self.config_entry, vin)
-            status = await jlr_service.async_call_service(**kwargs)
+            status = await self.get_service(vin).async_call_service(**kwargs)
+            if self.health and service.service == "update_health_status":
+                self.health.async_record_request(vin)
 
             if status and status == "Successful":
                 _LOGGER.debug(
@@ -506,114 +940,399 @@ class JLRApiHandler:
                     )
                 )
             # Call update on return of monitor
-            await self.async_update()
+            await self.async_update_vehicle(vin)
 
     async def async_update(self):
-        try:
-            for vehicle in self.vehicles:
-                status = await self.hass.async_add_executor_job(
-                    self.vehicles[vehicle].get_status
-                )
-                last_updated = status.get("lastUpdatedTime")
+        await self.profiler.async_run(PROFILE_UPDATE, self._async_update)
+
+    async def async_update_vehicle(self, vin, status_only=False):
+        """Update a single vehicle, or only its status if status_only"""
+        await self.profiler.async_run(
+            PROFILE_UPDATE,
+            self._async_update,
+            [vin],
+            status_only,
+            name=field_mask(vin, 3, 2),
+        )
 
-                status_core = {
-                    d["key"]: d["value"] for d in status["vehicleStatus"].get("coreStatus")
-                }
-                status_core["lastUpdatedTime"] = last_updated
-                self.vehicles[vehicle].status = status_core
+    async def _async_update(self, vins=None, status_only=False):
+        if not await self._async_update_vehicles(vins, status_only):
+            # Entities show the data getting older
+            async_dispatcher_send(
+                self.hass,
+                SIGNAL_DATA_AGE_UPDATED,
+                vins[0] if vins and len(vins) == 1 else None,
+            )
 
-                status_ev = {}
-                if self.vehicles[vehicle].engine_type in [FUEL_TYPE_BATTERY, FUEL_TYPE_HYBRID]:
-                    status_ev = {
-                        d["key"]: d["value"] for d in status["vehicleStatus"].get("evStatus")
-                    }
-                    self.vehicles[vehicle].status_ev = status_ev
+    async def _async_update_vehicles(self, vins, status_only=False):
+        """Returns True if all vehicles were updated"""
+        if not self.connection:
+            return False
 
+        if not self.limiter.allow(PRIORITY_STATUS):
+            _LOGGER.debug("Skipping update as daily request budget is used")
+            return False
 
-                _LOGGER.debug(
-                    "Received status data update for {}".format(
+        if not self.breaker.allow_request():
+            _LOGGER.debug(
+                "Skipping update as JLR InControl api is unavailable. "
+                + "Retrying in {} seconds".format(int(self.breaker.retry_in))
+            )
+            return False
+
+        try:
+            for vehicle in vins or self.live_vehicles:
+                await self._async_update_vehicle_data(vehicle, status_only)
+                self.snapshot.async_update(
+                    self.vehicles[vehicle], self.data_received[vehicle]
+                )
+                if self.health:
+                    self.health.async_status_updated(
+                        vehicle, self.vehicles[vehicle]
+                    )
+
+                _LOGGER.info(
+                    "JLR InControl update received for {}".format(
                         self.vehicles[vehicle].attributes.get("nickname")
                     )
                 )
 
+            # Send update notice to entities of updated vehicles
+            self.loop_budget.start_cycle()
+            if vins and len(vins) == 1:
+                async_dispatcher_send(self.hass, SIGNAL_STATE_UPDATED, vins[0])
+            else:
+                async_dispatcher_send(self.hass, SIGNAL_STATE_UPDATED, None)
+            if self.breaker.record_success():
+                async_dispatcher_send(self.hass, SIGNAL_API_STATUS_UPDATED)
+            return True
+        except JLRRateLimitExceeded as ex:
+            # Not a server failure so the breaker is left alone
+            _LOGGER.debug("Update stopped. {}".format(ex))
+            self.breaker.cancel_probe()
+        except Exception as ex:
+            _LOGGER.debug(
+                "Unable to update data from JLRInControl servers."
+                + "May be down or you have a internet connectivity issue. "
+                + "Error is : {}".format(ex)
+            )
+            self.update_failed(ex)
+        return False
+
+    async def _async_update_vehicle_data(self, vehicle, status_only=False):
+        status = await self.transport.async_call(
+            self.vehicles[vehicle].get_status
+        )
+        last_updated = status.get("lastUpdatedTime")
+
+        status_core = {
+            d["key"]: d["value"] for d in status["vehicleStatus"].get("coreStatus")
+        }
+        status_core["lastUpdatedTime"] = last_updated
+        self.vehicles[vehicle].status = status_core
+        self.data_received[vehicle] = dt.utcnow()
+        self.data_source[vehicle] = SOURCE_API
+
+        status_ev = {}
+        if self.vehicles[vehicle].engine_type in [FUEL_TYPE_BATTERY, FUEL_TYPE_HYBRID]:
+            status_ev = {
+                d["key"]: d["value"] for d in status["vehicleStatus"].get("evStatus")
+            }
+            self.vehicles[vehicle].status_ev = status_ev
+            self.charging_trackers[vehicle].async_process_status(
+                status_ev, last_updated
+            )
 
-                position = await self.hass.async_add_executor_job(
-                    self.vehicles[vehicle].get_position
+        _LOGGER.debug(
+            "Received status data update for {}".format(
+                self.vehicles[vehicle].attributes.get("nickname")
+            )
+        )
+
+        # Keep the last position and trips if low on budget
+        if status_only or not self.limiter.allow(PRIORITY_POSITION):
+            return
+
+        position = await self.transport.async_call(
+            self.vehicles[vehicle].get_position,
+            priority=PRIORITY_POSITION,
+        )
+
+        if position:
+            self.vehicles[vehicle].position = position
+            await self.position_logs[vehicle].async_add_position(
+                position
+            )
+            _LOGGER.debug(
+                "Received position data update for {}".format(
+                    self.vehicles[vehicle].attributes.get("nickname")
+                )
+            )
+        else:
+            self.vehicles[vehicle].position = None
+            _LOGGER.debug(
+                "No position data received for {}".format(
+                    self.vehicles[vehicle].attributes.get("nickname")
                 )
+            )
 
-                if position:
-                    self.vehicles[vehicle].position = position
-                    _LOGGER.debug(
-                        "Received position data update for {}".format(
-                            self.vehicles[vehicle].attributes.get("nickname")
-                        )
+        # Only get trip data if privacy mode is not enabled
+        if status_core.get("PRIVACY_SWITCH") == "FALSE":
+            trip_store = self.trip_stores[vehicle]
+            new_trips, last_trip = await trip_store.async_sync(
+                self.vehicles[vehicle]
+            )
+            if last_trip:
+                self.vehicles[vehicle].last_trip = last_trip
+            elif not trip_store.trip_count:
+                self.vehicles[vehicle].last_trip = None
+                _LOGGER.debug(
+                    "No trip data received for {}".format(
+                        self.vehicles[vehicle].attributes.get("nickname")
                     )
-                else:
-                    self.vehicles[vehicle].position = None
-                    _LOGGER.debug(
-                        "No position data received for {}".format(
-                            self.vehicles[vehicle].attributes.get("nickname")
+                )
+            if new_trips:
+                async_dispatcher_send(
+                    self.hass, SIGNAL_TRIPS_UPDATED, vehicle
+                )
+                _LOGGER.debug(
+                    "Retieved trip data update for {}".format(
+                        self.vehicles[vehicle].attributes.get(
+                            "nickname"
                         )
                     )
+                )
+        else:
+            self.vehicles[vehicle].last_trip = None
+            _LOGGER.debug(
+                "Privacy mode is enabled. "
+                + "Trip data will not be loaded for {}".format(
+                    self.vehicles[vehicle].attributes.get("nickname")
+                )
+            )
 
-                # Only get trip data if privacy mode is not enabled
-                if status_core.get("PRIVACY_SWITCH") == "FALSE":
-                    trips = await self.hass.async_add_executor_job(
-                        self.vehicles[vehicle].get_trips, 1
-                    )
-                    if trips and trips.get("trips"):
-                        self.vehicles[vehicle].last_trip = trips.get("trips")[
-                            0
-                        ]
-                        _LOGGER.debug(
-                            "Retieved trip data update for {}".format(
-                                self.vehicles[vehicle].attributes.get(
-                                    "nickname"
-                                )
-                            )
-                        )
-                    else:
-                        self.vehicles[vehicle].last_trip = None
-                        _LOGGER.debug(
-                            "No trip data received for {}".format(
-                                self.vehicles[vehicle].attributes.get(
-                                    "nickname"
-                                )
-                            )
-                        )
-                else:
-                    self.vehicles[vehicle].last_trip = None
-                    _LOGGER.debug(
-                        "Privacy mode is enabled. "
-                        + "Trip data will not be loaded for {}".format(
-                            self.vehicles[vehicle].attributes.get("nickname")
+    @callback
+    def update_failed(self, ex):
+        """Record a failed update and schedule a probe if the breaker opens"""
+        delay = self.breaker.record_failure(ex)
+        if delay is not None:
+            if self._probe_timer:
+                self._probe_timer()
+            self._probe_timer = async_call_later(
+                self.hass, delay, self._async_probe
+            )
+        async_dispatcher_send(self.hass, SIGNAL_API_STATUS_UPDATED)
+
+    async def _async_probe(self, *args):
+        self._probe_timer = None
+        await self.async_update()
+
+    async def async_run_sequence(self, service):
+        return await self.profiler.async_run(
+            PROFILE_COMMAND,
+            self._async_run_sequence,
+            service,
+            name=service.service,
+        )
+
+    async def _async_run_sequence(self, service):
+        """Check commands once, run them in turn, then update once"""
+        entity = self.get_entity(service.data.get(ATTR_ENTITY_ID))
+        if not entity:
+            return None
+        vin = entity._vin
+        nickname = self.vehicles[vin].attributes.get("nickname")
+        pin = service.data.get(ATTR_PIN) or self.pin
+
+        # Check every step before running any of them
+        names = [step[ATTR_SERVICE] for step in service.data[ATTR_STEPS]]
+        steps = []
+        error = None
+        for name, step in zip(names, service.data[ATTR_STEPS]):
+            service_info = JLR_SERVICES[name]
+            if not self.vehicles[vin].profile.supports(
+                service_info.get("service_code")
+            ):
+                error = "Service {} is not available on vehicle {}".format(
+                    name, nickname
+                )
+                break
+            step_data = {k: v for k, v in step.items() if k != ATTR_SERVICE}
+            step_data[ATTR_ENTITY_ID] = entity.entity_id
+            if "SERVICES_PIN_SCHEMA" in service_info.get("schema"):
+                # Never send a missing pin to the api
+                if not pin:
+                    error = (
+                        "Step {} on vehicle {} needs a pin. ".format(
+                            name, nickname
                         )
+                        + "Give one in the service call or set it in options"
                     )
-
-            _LOGGER.info(
-                "JLR InControl update received for {}".format(
-                    self.vehicles[vehicle].attributes.get("nickname")
+                    break
+                step_data[ATTR_PIN] = pin
+            try:
+                step_data = SERVICE_SCHEMAS[name](step_data)
+            except vol.Invalid as ex:
+                error = "Invalid step {} for vehicle {}. {}".format(
+                    name, nickname, ex
                 )
+                break
+            step_data["service_name"] = service_info.get("function_name")
+            step_data["service_code"] = service_info.get("service_code")
+            steps.append(step_data)
+
+        start = time.monotonic()
+        results = []
+        if error:
+            _LOGGER.error("{}. Sequence not run".format(error))
+        else:
+            results, error = await self.get_service(vin).async_run_sequence(
+                steps
             )
+        if self.health:
+            for name, (status, _) in zip(names, results):
+                if name == "update_health_status" and status == "Successful":
+                    self.health.async_record_request(vin)
+
+        # One update for the whole sequence
+        refresh_start = time.monotonic()
+        if results:
+            await self.async_update_vehicle(vin)
+        refresh_time = time.monotonic() - refresh_start
+
+        return {
+            "vehicle": nickname,
+            "success": len(results) == len(names)
+            and all(status == "Successful" for status, _ in results),
+            "error": error,
+            "steps": [
+                {
+                    "service": name,
+                    "status": (
+                        (results[i][0] or "Failed")
+                        if i < len(results)
+                        else "Skipped"
+                    ),
+                    "duration_s": (
+                        round(results[i][1], 2) if i < len(results) else None
+                    ),
+                }
+                for i, name in enumerate(names)
+            ],
+            "refresh_s": round(refresh_time, 2),
+            "total_s": round(time.monotonic() - start, 2),
+        }
+
+    async def async_get_trip_history(self, service):
+        """Return stored trips for a vehicle within a date range"""
+        entity = self.get_entity(service.data.get(ATTR_ENTITY_ID))
+        if not entity:
+            return None
+
+        min_distance = service.data.get(ATTR_MIN_DISTANCE)
+        trips = await self.trip_stores[entity._vin].async_get_trips(
+            start=service.data.get(ATTR_START),
+            end=service.data.get(ATTR_END),
+            min_distance=min_distance * 1000 if min_distance else None,
+            limit=service.data.get(ATTR_LIMIT),
+        )
 
-            # Send update notice to all components to update
-            async_dispatcher_send(self.hass, SIGNAL_STATE_UPDATED)
-        except Exception as ex:
+        for trip in trips:
+            for key in ["start", "end"]:
+                timestamp = trip.pop(f"{key}_ts")
+                trip[key] = (
+                    dt.as_local(dt.utc_from_timestamp(timestamp)).isoformat()
+                    if timestamp
+                    else None
+                )
+            trip["distance"] = round(trip["distance"] / 1000, 2)
+
+        return {"entity_id": entity.entity_id, "trips": trips}
+
+    async def async_get_trip_summary(self, service):
+        """Return per period trip aggregates for a vehicle"""
+        entity = self.get_entity(service.data.get(ATTR_ENTITY_ID))
+        if not entity:
+            return None
+
+        summary = await self.trip_stores[entity._vin].async_get_summary(
+            start=service.data.get(ATTR_START),
+            end=service.data.get(ATTR_END),
+            period=service.data.get(ATTR_PERIOD),
+        )
+
+        for period in summary:
+            period["distance"] = round(period["distance"] / 1000, 2)
+
+        return {"entity_id": entity.entity_id, "periods": summary}
+
+    async def async_get_route(self, service):
+        """Return a simplified route for a vehicle within a time window"""
+        entity = self.get_entity(service.data.get(ATTR_ENTITY_ID))
+        if not entity:
+            return None
+
+        end = service.data.get(ATTR_END) or dt.utcnow()
+        start = service.data.get(ATTR_START) or end - timedelta(days=1)
+        route, total = await self.position_logs[entity._vin].async_get_route(
+            dt.as_utc(start).timestamp(),
+            dt.as_utc(end).timestamp(),
+            service.data.get(ATTR_TOLERANCE),
+        )
+
+        return {
+            "entity_id": entity.entity_id,
+            "points": total,
+            "route": [
+                [
+                    lat,
+                    lon,
+                    dt.as_local(dt.utc_from_timestamp(timestamp)).isoformat(),
+                ]
+                for lat, lon, timestamp in route
+            ],
+            "polyline": encode_polyline([(lat, lon) for lat, lon, _ in route]),
+        }
+
+    async def async_profile(self, service):
+        """Profile the next runs of an update or command"""
+        self.profiler.arm(
+            service.data[ATTR_TARGET],
+            service.data[ATTR_COUNT],
+            service.data[ATTR_TOP],
+            service.data.get(ATTR_COMMAND),
+        )
+
+    async def async_health_update(self, vins=None):
+        """Request health updates for vehicles, or all if none given"""
+        return await self.profiler.async_run(
+            PROFILE_HEALTH_UPDATE, self._async_health_update, vins
+        )
+
+    async def _async_health_update(self, vins=None):
+        if self.breaker.state != STATE_CLOSED:
             _LOGGER.debug(
-                "Unable to update data from JLRInControl servers."
-                + "May be down or you have a internet connectivity issue. "
-                + "Error is : {}".format(ex)
+                "Skipping health update as JLR InControl api is unavailable"
             )
+            return False
+
+        if not self.limiter.allow(PRIORITY_HEALTH):
+            _LOGGER.debug("Skipping health update as daily request budget is low")
+            return False
 
-    async def async_health_update(self):
         try:
-            for vehicle in self.vehicles:
+            for vehicle in vins or self.live_vehicles:
                 service = JLR_SERVICES["update_health_status"]
+                if not self.vehicles[vehicle].profile.supports(
+                    service.get("service_code")
+                ):
+                    continue
                 kwargs = {}
                 kwargs["service_name"] = service.get("function_name")
                 kwargs["service_code"] = service.get("service_code")
-                jlr_service = JLRService(self.hass, self.config_entry, vehicle)
-                await jlr_service.async_call_service(**kwargs)
+                await self.get_service(vehicle).async_call_service(
+                    priority=PRIORITY_HEALTH, **kwargs
+                )
             return True
         except Exception as ex:
             _LOGGER.debug(
@@ -0,0 +1,153 @@
+"""
+Trip and efficiency analytics for JLR InControl.
+
+Loads the local trip history into NumPy arrays and computes rolling
+efficiency, eco score trends and running costs in a single vectorised pass.
+"""
+import logging
+
+import numpy as np
+from homeassistant.const import UnitOfLength
+from homeassistant.util import dt
+
+from .const import (
+    ANALYTICS_PERIOD_DAYS,
+    ANALYTICS_WINDOW,
+    FUEL_TYPE_BATTERY,
+)
+from .util import convert_fuel_consumption, distance_conversion_factor
+
+_LOGGER = logging.getLogger(__name__)
+
+ANALYTICS_COLUMNS = [
+    "start_ts",
+    "distance",
+    "fuel_consumption",
+    "energy_consumption",
+    "eco_score",
+]
+
+
+def _weighted_mean(values, weights):
+    """Mean of values weighted by weights, ignoring missing values"""
+    mask = ~np.isnan(values) & (weights > 0)
+    if not mask.any():
+        return None
+    return float(np.average(values[mask], weights=weights[mask]))
+
+
+def _mean(values):
+    """Mean of values, ignoring missing values"""
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return None
+    return float(values.mean())
+
+
+def _rolling_weighted_mean(values, weights, window):
+    """Rolling mean over the last window trips, weighted by distance"""
+    mask = ~np.isnan(values) & (weights > 0)
+    weighted = np.where(mask, values * weights, 0).cumsum()
+    total = np.where(mask, weights, 0).cumsum()
+    weighted[window:] = weighted[window:] - weighted[:-window]
+    total[window:] = total[window:] - total[:-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, weighted / total, np.nan)
+
+
+def _round(value, digits=1):
+    if value is None or np.isnan(value):
+        return None
+    return round(float(value), digits)
+
+
+def compute_trip_analytics(rows, distance_unit, fuel_type, price=None, now=None):
+    """
+    Compute analytics from trip rows ordered by start time.
+
+    Rows are (start_ts, distance m, l/100km, kWh/100km, eco score) tuples as
+    returned by JLRTripStore.get_analytics_rows. Consumption figures use the
+    same unit conversions as the last trip sensor.
+    """
+    if not rows:
+        return None
+
+    data = np.array(rows, dtype=float)
+    start_ts = data[:, 0]
+    distance = np.nan_to_num(data[:, 1])
+    eco_score = data[:, 4]
+
+    if fuel_type == FUEL_TYPE_BATTERY:
+        consumption = data[:, 3]
+    else:
+        consumption = data[:, 2]
+
+    window = min(ANALYTICS_WINDOW, len(data))
+    rolling = _rolling_weighted_mean(consumption, distance, window)
+
+    # Restrict period figures to trips in the analytics period
+    now = now if now is not None else dt.utcnow().timestamp()
+    period = start_ts >= now - ANALYTICS_PERIOD_DAYS * 86400
+    period_distance_km = distance[period].sum() / 1000
+    period_consumption = _weighted_mean(consumption[period], distance[period])
+
+    # Eco score trend as change in points per week
+    eco_trend = None
+    scored = ~np.isnan(eco_score) & period
+    if scored.sum() >= 2 and np.ptp(start_ts[scored]) > 0:
+        slope = np.polyfit(start_ts[scored] / 86400, eco_score[scored], 1)[0]
+        eco_trend = slope * 7
+
+    distance_factor = distance_conversion_factor(
+        UnitOfLength.KILOMETERS, distance_unit
+    )
+
+    # Cost per unit distance from l or kWh per 100km
+    cost_per_distance = None
+    period_cost = None
+    if price and period_consumption is not None:
+        cost_per_km = period_consumption * price / 100
+        cost_per_distance = cost_per_km / distance_factor
+        period_cost = cost_per_km * period_distance_km
+
+    def consumption_units(value):
+        if value is None or np.isnan(value):
+            return None
+        if fuel_type == FUEL_TYPE_BATTERY:
+            return value
+        return convert_fuel_consumption(value, distance_unit)
+
+    return {
+        "trips": int(len(data)),
+        "period_trips": int(period.sum()),
+        "period_distance": _round(period_distance_km * distance_factor),
+        "rolling_consumption": _round(consumption_units(rolling[-1])),
+        "period_consumption": _round(consumption_units(period_consumption)),
+        "eco_score": _round(_mean(eco_score[-window:])),
+        "eco_score_trend": _round(eco_trend, 2),
+        "cost_per_distance": _round(cost_per_distance, 3),
+        "period_cost": _round(period_cost, 2),
+    }
+
+
+class JLRTripAnalytics:
+    """Analytics for a single vehicle, recomputed when trips are added"""
+
+    def __init__(self, hass, trip_store, distance_unit, fuel_type, price=None):
+        self.hass = hass
+        self.trip_store = trip_store
+        self.distance_unit = distance_unit
+        self.fuel_type = fuel_type
+        self.price = price
+        self.results = None
+
+    def _compute(self):
+        rows = self.trip_store.get_analytics_rows(ANALYTICS_COLUMNS)
+        return compute_trip_analytics(
+            rows, self.distance_unit, self.fuel_type, self.price
+        )
+
+    async def async_refresh(self):
+        """Recompute analytics from the trip store"""
+        self.results = await self.hass.async_add_executor_job(self._compute)
+        return self.results
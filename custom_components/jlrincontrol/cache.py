@@ -0,0 +1,94 @@
+"""
+Api response cache for JLR InControl.
+
+Responses from some endpoints are kept for a short time so that the
+different code paths that read them within seconds of each other share one
+request. A request already in flight is shared by everyone asking for the
+same thing, and errors are never cached. The cache holds a bounded number
+of responses, dropping the least recently used. Commands invalidate a
+vehicle's entries so the next read sees the result.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class JLRResponseCache:
+    """TTL and LRU cache of api responses with in flight sharing"""
+
+    def __init__(self, ttls, max_entries):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def cacheable(self, endpoint):
+        return endpoint in self.ttls
+
+    async def async_get(self, key, fetch):
+        """Cached response for key, calling fetch to get it if needed"""
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        task = self.in_flight.get(key)
+        if task:
+            self.shared += 1
+        else:
+            self.misses += 1
+            task = asyncio.get_running_loop().create_task(
+                self._async_fetch(key, fetch)
+            )
+            # Errors are raised to callers, this stops unretrieved warnings
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self.in_flight[key] = task
+        # Shielded so one caller being cancelled does not cancel the others
+        return await asyncio.shield(task)
+
+    async def _async_fetch(self, key, fetch):
+        try:
+            result = await fetch()
+        finally:
+            self.in_flight.pop(key, None)
+        self.entries[key] = (time.monotonic() + self.ttls[key[0]], result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def invalidate(self, vin=None):
+        """Drop cached responses for a vehicle, or all if no vin"""
+        keys = [key for key in self.entries if vin is None or key[1] == vin]
+        for key in keys:
+            del self.entries[key]
+        self.invalidations += 1
+        _LOGGER.debug(
+            "Cleared {} cached responses for {}".format(
+                len(keys), field_mask(vin, 3, 2) if vin else "all vehicles"
+            )
+        )
+
+    def as_dict(self):
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttls,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_in_flight": self.shared,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,269 @@
+"""
+Api traffic capture and replay for JLR InControl.
+
+With the capture data option set, every api response is written to a
+gzipped, timestamped JSONL journal in the config directory. VINs, tokens,
+pins and account details are masked before writing. A journal can be fed
+back into JLRApiHandler with JLRReplayTransport to reproduce and profile
+a real session locally.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from functools import wraps
+from types import MethodType
+
+from homeassistant.util import dt
+
+from .const import CAPTURE_FILE, CAPTURE_VERSION
+from .transport import JLRTransport, endpoint_name, endpoint_vin
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+# Keys whose values are always masked
+MASKED_KEYS = {
+    "access_token",
+    "authorization_token",
+    "refresh_token",
+    "token",
+    "pin",
+    "password",
+    "email",
+    "loginName",
+    "userId",
+    "vin",
+    "vehicleId",
+    "customerServiceId",
+    "serviceId",
+    "registrationNumber",
+}
+
+VIN_PATTERN = re.compile(r"\b[A-HJ-NPR-Z0-9]{17}\b")
+
+
+def mask_vin(vin):
+    return field_mask(vin, 3, 2) if vin else vin
+
+
+def mask_data(data, vins):
+    """Copy of api data with sensitive values masked"""
+    if isinstance(data, dict):
+        return {
+            k: mask_value(k, v, vins) if k in MASKED_KEYS else mask_data(v, vins)
+            for k, v in data.items()
+        }
+    if isinstance(data, (list, tuple)):
+        return [mask_data(v, vins) for v in data]
+    if isinstance(data, str) and vins:
+        # Vins embedded in urls and ids
+        return VIN_PATTERN.sub(
+            lambda m: mask_vin(m.group(0)) if m.group(0) in vins else m.group(0),
+            data,
+        )
+    return data
+
+
+def mask_value(key, value, vins):
+    if not isinstance(value, str) or not value:
+        return value
+    if value in vins:
+        return mask_vin(value)
+    if key in ["customerServiceId", "serviceId"]:
+        # Keep service ids distinct so replayed monitoring still matches
+        return field_mask(value, 0, 6)
+    return field_mask(value)
+
+
+def serialise_response(endpoint, result):
+    """Api response in a form that can be written to the journal"""
+    if endpoint == "connect":
+        return {"vehicles": [dict(vehicle) for vehicle in result.vehicles]}
+    return result
+
+
+class JLRCaptureJournal:
+    """Writes masked api responses to a gzipped JSONL journal"""
+
+    def __init__(self, hass, name):
+        self.hass = hass
+        self.path = hass.config.path(
+            CAPTURE_FILE.format(name, dt.now().strftime("%Y%m%d_%H%M%S"))
+        )
+        self.vins = set()
+        self.records = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._pending = deque()
+
+    def _write(self):
+        # Lines are queued in call order on the event loop and written
+        # under the lock, so order is kept whichever thread runs this
+        with self._lock:
+            if not self._pending:
+                return
+            if self._file is None:
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+                self._file.write(
+                    json.dumps({"version": CAPTURE_VERSION, "started": time.time()})
+                    + "\n"
+                )
+            while self._pending:
+                self._file.write(self._pending.popleft() + "\n")
+            self._file.flush()
+
+    def record(self, endpoint, vin, args, elapsed, result=None, error=None):
+        """Queue a masked record to be written in the executor"""
+        response = serialise_response(endpoint, result) if result else result
+        if endpoint == "connect" and response:
+            self.vins.update(v.get("vin") for v in response.get("vehicles", []))
+        if vin:
+            self.vins.add(vin)
+
+        record = {
+            "ts": round(time.time(), 3),
+            "endpoint": endpoint,
+            "vin": mask_vin(vin),
+            "args": mask_data(args, self.vins) if endpoint != "connect" else [],
+            "elapsed": round(elapsed, 4),
+            "response": mask_data(response, self.vins),
+            "error": mask_data(str(error), self.vins) if error else None,
+        }
+        try:
+            line = json.dumps(record, default=str)
+        except (TypeError, ValueError) as ex:
+            _LOGGER.debug("Unable to capture {} response. {}".format(endpoint, ex))
+            return
+        self.records += 1
+        self._pending.append(line)
+        self.hass.async_add_executor_job(self._write)
+
+    def _close(self):
+        self._write()
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    async def async_close(self):
+        await self.hass.async_add_executor_job(self._close)
+        if self.records:
+            _LOGGER.info(
+                "Captured {} api responses to {}".format(self.records, self.path)
+            )
+
+
+def read_journal(path):
+    """Read a capture journal into a list of records"""
+    records = []
+    with gzip.open(path, "rt", encoding="utf-8") as journal:
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line may be partly written
+                continue
+            if "endpoint" in record:
+                records.append(record)
+    return records
+
+
+class JournalExhausted(Exception):
+    """No more recorded responses for this call"""
+
+
+def replay_method(obj, cls, name):
+    """
+    Placeholder for a jlrpy method with the same name and signature.
+
+    The replay transport answers calls by name, so these are never run.
+    """
+    method = getattr(cls, name, None)
+    if name.startswith("_") or not callable(method):
+        raise AttributeError(name)
+
+    @wraps(method)
+    def endpoint(self, *args, **kwargs):
+        raise JournalExhausted(name)
+
+    return MethodType(endpoint, obj)
+
+
+class ReplayVehicle(dict):
+    """Stands in for a jlrpy vehicle"""
+
+    def __init__(self, data, connection):
+        super().__init__(data)
+        self.connection = connection
+        self.vin = data["vin"]
+
+    def __getattr__(self, name):
+        import jlrpy
+
+        return replay_method(self, jlrpy.Vehicle, name)
+
+
+class ReplayConnection:
+    """Stands in for a jlrpy connection"""
+
+    def __init__(self, vehicles):
+        self.email = "replay"
+        self.vehicles = [ReplayVehicle(v, self) for v in vehicles]
+
+    def __getattr__(self, name):
+        import jlrpy
+
+        return replay_method(self, jlrpy.Connection, name)
+
+
+class JLRReplayTransport(JLRTransport):
+    """
+    Serves api calls from a capture journal.
+
+    Responses are returned in recorded order for each endpoint and vehicle.
+    Speed scales the recorded call latency, with 0 returning immediately.
+    """
+
+    def __init__(self, hass, records, speed=0):
+        super().__init__(hass)
+        self.speed = speed
+        self.responses = defaultdict(deque)
+        for record in records:
+            self.responses[(record["endpoint"], record["vin"])].append(record)
+
+    @property
+    def remaining(self):
+        return sum(len(v) for v in self.responses.values())
+
+    async def async_call(
+        self,
+        func,
+        *args,
+        endpoint=None,
+        vin=None,
+        priority=None,
+        lane=None,
+        timeout=None,
+    ):
+        """Return the next recorded response for this call"""
+        endpoint = endpoint or endpoint_name(func)
+        vin = vin or endpoint_vin(func)
+        queue = self.responses.get((endpoint, vin))
+        if not queue:
+            raise JournalExhausted(endpoint)
+
+        record = queue.popleft()
+        if self.speed:
+            await asyncio.sleep(record["elapsed"] / self.speed)
+        self.metrics.record(endpoint, vin, record["elapsed"], record["error"])
+
+        if record["error"]:
+            raise Exception(record["error"])
+        if endpoint == "connect":
+            return ReplayConnection(record["response"]["vehicles"])
+        return record["response"]
@@ -0,0 +1,319 @@
+"""
+Charging session capture for JLR InControl.
+
+Watches EV_CHARGING_STATUS for the start and end of a charging session,
+records SOC and charge rate samples while it runs and, when it ends,
+imports the energy and SOC curves into HA long term statistics. The start
+of the last imported session is stored, so a session is never imported twice.
+"""
+import logging
+import math
+from array import array
+
+from homeassistant.const import PERCENTAGE, UnitOfEnergy
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt
+
+from .const import (
+    CHARGING_SESSION_SAMPLES,
+    CHARGING_STORE,
+    CHARGING_STORE_VERSION,
+    DOMAIN,
+    JLR_CHARGING_ACTIVE_STATES,
+)
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class SampleRingBuffer:
+    """Fixed size ring buffer of charging samples held in typed arrays"""
+
+    def __init__(self, size):
+        self.size = size
+        self.timestamps = array("d", [0.0] * size)
+        self.soc = array("d", [0.0] * size)
+        self.rate = array("d", [0.0] * size)
+        self.count = 0
+
+    def append(self, timestamp, soc, rate):
+        i = self.count % self.size
+        self.timestamps[i] = timestamp
+        self.soc[i] = soc
+        self.rate[i] = rate
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    @property
+    def last_timestamp(self):
+        if not self.count:
+            return None
+        return self.timestamps[(self.count - 1) % self.size]
+
+    def samples(self):
+        """Return samples oldest first"""
+        if self.count <= self.size:
+            order = range(self.count)
+        else:
+            start = self.count % self.size
+            order = list(range(start, self.size)) + list(range(start))
+        return [(self.timestamps[i], self.soc[i], self.rate[i]) for i in order]
+
+
+def hourly_buckets(samples):
+    """Group samples by the hour they fall in, keyed by hour start timestamp"""
+    buckets = {}
+    for timestamp, soc, rate in samples:
+        hour = timestamp - timestamp % 3600
+        buckets.setdefault(hour, []).append((timestamp, soc, rate))
+    return dict(sorted(buckets.items()))
+
+
+def split_energy_by_hour(buckets, energy, start_soc):
+    """Split session energy across hours in proportion to SOC gained"""
+    gains = {}
+    previous = start_soc
+    for hour, samples in buckets.items():
+        last = samples[-1][1]
+        if math.isnan(last):
+            gains[hour] = 0
+            continue
+        gains[hour] = max(0, last - previous) if not math.isnan(previous) else 0
+        previous = last
+
+    total = sum(gains.values())
+    if not total:
+        last_hour = list(buckets)[-1]
+        return {hour: energy if hour == last_hour else 0 for hour in buckets}
+    return {hour: energy * gain / total for hour, gain in gains.items()}
+
+
+class JLRChargingSessionTracker:
+    """Detects charging sessions for one vehicle and records their samples"""
+
+    def __init__(self, hass, vin, name):
+        self.hass = hass
+        self.vin = vin
+        self.name = name
+        self.samples = SampleRingBuffer(CHARGING_SESSION_SAMPLES)
+        self.session_start = None
+        self.start_soc = None
+        self.last_session = None
+        self.last_imported = None
+        self._store = Store(
+            hass, CHARGING_STORE_VERSION, CHARGING_STORE.format(vin.lower())
+        )
+
+    async def async_load(self):
+        """Load the start of the last imported session"""
+        try:
+            data = await self._store.async_load() or {}
+        except Exception as ex:
+            _LOGGER.warning(
+                "Unable to load charging data for {}. {}".format(self.name, ex)
+            )
+            data = {}
+        self.last_imported = data.get("last_imported")
+
+    @property
+    def energy_statistic_id(self):
+        return f"{DOMAIN}:{self.vin.lower()}_charging_energy"
+
+    @property
+    def soc_statistic_id(self):
+        return f"{DOMAIN}:{self.vin.lower()}_charging_soc"
+
+    @callback
+    def async_process_status(self, status_ev, last_updated=None):
+        """Update session state from a new ev status"""
+        if not status_ev:
+            return
+
+        charging = status_ev.get("EV_CHARGING_STATUS") in JLR_CHARGING_ACTIVE_STATES
+        reported = dt.parse_datetime(last_updated) if last_updated else None
+        timestamp = (reported or dt.utcnow()).timestamp()
+
+        if charging and self.session_start is None:
+            self.session_start = timestamp
+            self.start_soc = _to_float(status_ev.get("EV_STATE_OF_CHARGE"))
+            self.samples.clear()
+            _LOGGER.debug(
+                "Charging session started for {}".format(
+                    field_mask(self.vin, 3, 2)
+                )
+            )
+
+        if self.session_start is None:
+            return
+
+        # Only record a sample if the vehicle has reported since the last one
+        if self.samples.last_timestamp != timestamp:
+            self.samples.append(
+                timestamp,
+                _to_float(status_ev.get("EV_STATE_OF_CHARGE")),
+                _to_float(status_ev.get("EV_CHARGING_RATE_SOC_PER_HOUR")),
+            )
+
+        if not charging:
+            energy = (
+                _to_float(status_ev.get("EV_ENERGY_CONSUMED_LAST_CHARGE_KWH"))
+                / 10
+            )
+            self._end_session(energy)
+
+    @callback
+    def _end_session(self, energy):
+        samples = self.samples.samples()
+        session_start = self.session_start
+        start_soc = self.start_soc
+        self.last_session = {
+            "start": dt.utc_from_timestamp(self.session_start),
+            "end": dt.utc_from_timestamp(samples[-1][0]),
+            "start_soc": start_soc,
+            "end_soc": samples[-1][1],
+            "energy": None if math.isnan(energy) else energy,
+            "max_rate": max(
+                (s[2] for s in samples if not math.isnan(s[2])), default=None
+            ),
+            "samples": len(samples),
+        }
+        self.session_start = None
+        self.start_soc = None
+        self.samples.clear()
+
+        _LOGGER.debug(
+            "Charging session ended for {}. {} samples recorded".format(
+                field_mask(self.vin, 3, 2), len(samples)
+            )
+        )
+
+        if "recorder" in self.hass.config.components:
+            self.hass.async_create_task(
+                self.async_import_session(
+                    session_start, samples, start_soc, energy
+                )
+            )
+
+    async def async_import_session(
+        self, session_start, samples, start_soc, energy
+    ):
+        """Import a finished session into long term statistics"""
+        # Sessions end in order, so any starting earlier are already imported
+        if self.last_imported is not None and session_start <= self.last_imported:
+            _LOGGER.debug(
+                "Charging session for {} already imported".format(
+                    field_mask(self.vin, 3, 2)
+                )
+            )
+            return
+        try:
+            await self._async_import_statistics(samples, start_soc, energy)
+            self.last_imported = session_start
+            await self._store.async_save({"last_imported": session_start})
+        except Exception as ex:
+            _LOGGER.warning(
+                "Unable to import charging statistics for {}. Error is {}".format(
+                    self.name, ex
+                )
+            )
+
+    async def _async_import_statistics(self, samples, start_soc, energy):
+        from homeassistant.components.recorder.statistics import (
+            async_add_external_statistics,
+        )
+
+        buckets = hourly_buckets(samples)
+
+        # SOC curve as hourly mean/min/max
+        soc_stats = []
+        for hour, hour_samples in buckets.items():
+            values = [s[1] for s in hour_samples if not math.isnan(s[1])]
+            if values:
+                soc_stats.append(
+                    {
+                        "start": dt.utc_from_timestamp(hour),
+                        "mean": sum(values) / len(values),
+                        "min": min(values),
+                        "max": max(values),
+                    }
+                )
+
+        energy_stats = []
+        if energy and not math.isnan(energy):
+            energy_stats = await self._async_energy_statistics(
+                buckets, energy, start_soc
+            )
+
+        # Written together once both are worked out
+        if soc_stats:
+            async_add_external_statistics(
+                self.hass,
+                {
+                    "has_mean": True,
+                    "has_sum": False,
+                    "name": f"{self.name} Charging SOC",
+                    "source": DOMAIN,
+                    "statistic_id": self.soc_statistic_id,
+                    "unit_of_measurement": PERCENTAGE,
+                },
+                soc_stats,
+            )
+        if energy_stats:
+            async_add_external_statistics(
+                self.hass,
+                {
+                    "has_mean": False,
+                    "has_sum": True,
+                    "name": f"{self.name} Charging Energy",
+                    "source": DOMAIN,
+                    "statistic_id": self.energy_statistic_id,
+                    "unit_of_measurement": UnitOfEnergy.KILO_WATT_HOUR,
+                },
+                energy_stats,
+            )
+
+    async def _async_energy_statistics(self, buckets, energy, start_soc):
+        """Hourly energy statistics for a session"""
+        from homeassistant.components.recorder import get_instance
+        from homeassistant.components.recorder.statistics import get_last_statistics
+
+        # Energy as a running sum continuing from the last imported session
+        last = await get_instance(self.hass).async_add_executor_job(
+            get_last_statistics,
+            self.hass,
+            2,
+            self.energy_statistic_id,
+            True,
+            {"sum"},
+        )
+        last = last.get(self.energy_statistic_id, []) if last else []
+        total = (last[0].get("sum") or 0) if last else 0
+        energy_by_hour = split_energy_by_hour(buckets, energy, start_soc)
+
+        # A second session in the same hour adds to that hour's figure
+        first_hour = list(energy_by_hour)[0]
+        if last and last[0].get("start") == first_hour:
+            total = (last[1].get("sum") or 0) if len(last) > 1 else 0
+            energy_by_hour[first_hour] += (last[0].get("sum") or 0) - total
+
+        energy_stats = []
+        for hour, hour_energy in energy_by_hour.items():
+            total += hour_energy
+            energy_stats.append(
+                {
+                    "start": dt.utc_from_timestamp(hour),
+                    "state": round(total, 3),
+                    "sum": round(total, 3),
+                }
+            )
+        return energy_stats
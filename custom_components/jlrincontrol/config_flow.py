@@ -15,21 +15,37 @@ from homeassistant.const import (
     UnitOfPressure,
 )
 from homeassistant.core import callback
-import jlrpy
 
 from .const import (
     DOMAIN,
+    DEFAULT_API_THREADS,
+    DEFAULT_DAILY_REQUEST_BUDGET,
+    MAX_API_THREADS,
+    MIN_API_THREADS,
+    DEFAULT_LOOP_BUDGET,
     DEFAULT_SCAN_INTERVAL,
     MIN_SCAN_INTERVAL,
     DEFAULT_HEATH_UPDATE_INTERVAL,
     CONF_USE_CHINA_SERVERS,
+    CONF_ALL_DATA_SENSOR,
+    CONF_DEBUG_DATA,
+    CONF_CAPTURE_DATA,
+    CONF_LOOP_BUDGET,
+    CONF_DAILY_REQUEST_BUDGET,
+    CONF_API_THREADS,
+    CONF_VEHICLE_SCAN_INTERVALS,
+    CONF_DISTANCE_UNIT,
+    CONF_PRESSURE_UNIT,
+    CONF_HEALTH_UPDATE_INTERVAL,
+    CONF_HEALTH_MAX_AGE,
+    CONF_FUEL_PRICE,
+    CONF_ENERGY_PRICE,
+    CONF_MAX_DATA_AGE,
+    DEFAULT_MAX_DATA_AGE,
+    DEFAULT_HEALTH_MAX_AGE,
 )
+from .session import connect
 
-CONF_ALL_DATA_SENSOR = "all_data_sensor"
-CONF_DEBUG_DATA = "debug_data"
-CONF_DISTANCE_UNIT = "distance_unit"
-CONF_PRESSURE_UNIT = "pressure_unit"
-CONF_HEALTH_UPDATE_INTERVAL = "health_update_interval"
 UNIQUE_ID = "unique_id"
 
 _LOGGER = logging.getLogger(__name__)
@@ -42,6 +58,8 @@ DATA_SCHEMA = vol.Schema(
     }
 )
 
+REAUTH_SCHEMA = vol.Schema({vol.Required(CONF_PASSWORD): str})
+
 
 @callback
 def configured_instances(hass):
@@ -54,7 +72,7 @@ async def validate_input(hass, data):
 
     try:
         connection = await hass.async_add_executor_job(
-            jlrpy.Connection, data[CONF_USERNAME], data[CONF_PASSWORD], '', '', data[CONF_USE_CHINA_SERVERS]
+            connect, data[CONF_USERNAME], data[CONF_PASSWORD], data[CONF_USE_CHINA_SERVERS]
         )
     except urllib.error.HTTPError as ex:
         if ex.code > 400 and ex.code < 500:
@@ -85,6 +103,7 @@ class JLRInControlFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self):
         """Initialize the jlrincontrol flow."""
         self.conf = {}
+        self.reauth_entry = None
 
     @staticmethod
     @callback
@@ -122,6 +141,51 @@ class JLRInControlFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=DATA_SCHEMA, errors=errors
         )
 
+    async def async_step_reauth(self, entry_data):
+        """Handle the login being refused for an existing entry."""
+        self.reauth_entry = self.hass.config_entries.async_get_entry(
+            self.context["entry_id"]
+        )
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(self, user_input=None):
+        """Ask for the new password and check it."""
+        errors = {}
+        if user_input is not None:
+            data = {
+                **self.reauth_entry.data,
+                CONF_PASSWORD: user_input[CONF_PASSWORD],
+            }
+            try:
+                await validate_input(self.hass, data)
+            except CannotConnect:
+                errors["base"] = "cannot_connect"
+            except InvalidAuth:
+                errors["base"] = "invalid_auth"
+            except NoVehicles:
+                errors["base"] = "no_vehicles"
+            except Exception as ex:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected exception - {}".format(ex))
+                errors["base"] = "unknown"
+
+            if "base" not in errors:
+                self.hass.config_entries.async_update_entry(
+                    self.reauth_entry, data=data
+                )
+                await self.hass.config_entries.async_reload(
+                    self.reauth_entry.entry_id
+                )
+                return self.async_abort(reason="reauth_successful")
+
+        return self.async_show_form(
+            step_id="reauth_confirm",
+            data_schema=REAUTH_SCHEMA,
+            errors=errors,
+            description_placeholders={
+                CONF_USERNAME: self.reauth_entry.data[CONF_USERNAME]
+            },
+        )
+
     async def async_step_import(self, import_data):
         """Handle import."""
         return await self.async_step_user(import_data)
@@ -163,6 +227,10 @@ class JLRInControlOptionsFlowHandler(config_entries.OptionsFlow):
                 ): (
                     vol.All(vol.Coerce(int), vol.Clamp(min=MIN_SCAN_INTERVAL))
                 ),
+                vol.Optional(
+                    CONF_VEHICLE_SCAN_INTERVALS,
+                    default=self.options.get(CONF_VEHICLE_SCAN_INTERVALS, ""),
+                ): str,
                 vol.Optional(
                     CONF_HEALTH_UPDATE_INTERVAL,
                     default=self.options.get(
@@ -170,6 +238,18 @@ class JLRInControlOptionsFlowHandler(config_entries.OptionsFlow):
                         DEFAULT_HEATH_UPDATE_INTERVAL,
                     ),
                 ): vol.Coerce(int),
+                vol.Optional(
+                    CONF_HEALTH_MAX_AGE,
+                    default=self.options.get(
+                        CONF_HEALTH_MAX_AGE, DEFAULT_HEALTH_MAX_AGE
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_MAX_DATA_AGE,
+                    default=self.options.get(
+                        CONF_MAX_DATA_AGE, DEFAULT_MAX_DATA_AGE
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
                 vol.Optional(
                     CONF_DISTANCE_UNIT,
                     default=self.options.get(
@@ -180,10 +260,39 @@ class JLRInControlOptionsFlowHandler(config_entries.OptionsFlow):
                     CONF_PRESSURE_UNIT,
                     default=self.options.get(CONF_PRESSURE_UNIT, UnitOfPressure.BAR),
                 ): vol.In(["Default", UnitOfPressure.BAR, UnitOfPressure.PSI]),
+                vol.Optional(
+                    CONF_FUEL_PRICE,
+                    default=self.options.get(CONF_FUEL_PRICE, 0),
+                ): vol.Coerce(float),
+                vol.Optional(
+                    CONF_ENERGY_PRICE,
+                    default=self.options.get(CONF_ENERGY_PRICE, 0),
+                ): vol.Coerce(float),
+                vol.Optional(
+                    CONF_DAILY_REQUEST_BUDGET,
+                    default=self.options.get(
+                        CONF_DAILY_REQUEST_BUDGET, DEFAULT_DAILY_REQUEST_BUDGET
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_API_THREADS,
+                    default=self.options.get(CONF_API_THREADS, DEFAULT_API_THREADS),
+                ): vol.All(
+                    vol.Coerce(int),
+                    vol.Clamp(min=MIN_API_THREADS, max=MAX_API_THREADS),
+                ),
+                vol.Optional(
+                    CONF_LOOP_BUDGET,
+                    default=self.options.get(CONF_LOOP_BUDGET, DEFAULT_LOOP_BUDGET),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0)),
                 vol.Optional(
                     CONF_DEBUG_DATA,
                     default=self.options.get(CONF_DEBUG_DATA, False),
                 ): bool,
+                vol.Optional(
+                    CONF_CAPTURE_DATA,
+                    default=self.options.get(CONF_CAPTURE_DATA, False),
+                ): bool,
                 vol.Optional(
                     CONF_ALL_DATA_SENSOR,
                     default=self.options.get(CONF_ALL_DATA_SENSOR, False),
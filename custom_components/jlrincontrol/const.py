@@ -14,15 +14,108 @@ JLR_DATA = "jlr_data"
 VERSION = "2.2.7"
 
 CONF_USE_CHINA_SERVERS = "use_china_servers"
+CONF_ALL_DATA_SENSOR = "all_data_sensor"
+CONF_DEBUG_DATA = "debug_data"
+CONF_CAPTURE_DATA = "capture_data"
+CONF_LOOP_BUDGET = "loop_budget"
+CONF_DAILY_REQUEST_BUDGET = "daily_request_budget"
+CONF_API_THREADS = "api_threads"
+CONF_VEHICLE_SCAN_INTERVALS = "vehicle_scan_intervals"
+CONF_DISTANCE_UNIT = "distance_unit"
+CONF_PRESSURE_UNIT = "pressure_unit"
+CONF_HEALTH_UPDATE_INTERVAL = "health_update_interval"
+CONF_FUEL_PRICE = "fuel_price"
+CONF_ENERGY_PRICE = "energy_price"
+CONF_MAX_DATA_AGE = "max_data_age"
+CONF_HEALTH_MAX_AGE = "health_max_age"
 
 DEFAULT_SCAN_INTERVAL = 5
 MIN_SCAN_INTERVAL = 1
 DEFAULT_HEATH_UPDATE_INTERVAL = 0  # Default disabled
+DEFAULT_HEALTH_MAX_AGE = 1440
+# Minutes since the vehicle last reported in that it is counted as awake
+HEALTH_AWAKE_WINDOW = 10
 
 SIGNAL_STATE_UPDATED = f"{DOMAIN}.updated"
+# Formatted with the config entry id
+SIGNAL_VEHICLES_ADDED = f"{DOMAIN}.vehicles_added.{{}}"
+SIGNAL_DATA_AGE_UPDATED = f"{DOMAIN}.data_age_updated"
+EVENT_COMMAND_FAILED = f"{DOMAIN}_command_failed"
+
+# Trip history store
+TRIP_DB_FILE = "jlrincontrol_trips.db"
+TRIP_SYNC_BATCH = 10
+TRIP_SYNC_MAX = 1000
+TRIP_PERIODS = ["day", "week", "month", "year"]
+
+# Position history
+POSITION_LOG_FILE = "jlrincontrol_positions_{}.bin"
+POSITION_SCALE = 1000000
+DEFAULT_ROUTE_TOLERANCE = 25
+
+# Last known vehicle data
+SNAPSHOT_STORE = "jlrincontrol_snapshot_{}"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 60
+SOURCE_API = "api"
+SOURCE_SNAPSHOT = "snapshot"
+ATTR_DATA_AGE = "data_age"
+ATTR_SOURCE = "source"
+DEFAULT_MAX_DATA_AGE = 0  # Never unavailable
+
+# Api traffic capture
+CAPTURE_FILE = "jlrincontrol_capture_{}_{}.jsonl.gz"
+CAPTURE_VERSION = 1
+
+# Profiling
+PROFILE_FILE = "jlrincontrol_profile_{}_{}"
+PROFILE_LAG_INTERVAL = 0.05
+
+# Circuit breaker for polling, times in seconds
+SIGNAL_API_STATUS_UPDATED = f"{DOMAIN}.api_status_updated"
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_BACKOFF_BASE = 60
+BREAKER_BACKOFF_MAX = 3600
+
+# Account api rate limit and daily request budget
+RATE_LIMIT_PER_MINUTE = 20
+RATE_LIMIT_BURST = 20
+DEFAULT_DAILY_REQUEST_BUDGET = 0  # Default unlimited
+
+# Api thread pool size, concurrent calls and slots kept for commands
+DEFAULT_API_THREADS = 4
+MIN_API_THREADS = 2
+MAX_API_THREADS = 16
+SCHEDULER_SLOTS = DEFAULT_API_THREADS
+SCHEDULER_RESERVED_SLOTS = 1
+
+# Api call timeouts in seconds. Connecting makes several calls.
+API_CALL_TIMEOUT = 60
+API_CONNECT_TIMEOUT = 120
+
+# Api response cache, ttl in seconds by endpoint
+CACHE_TTLS = {
+    "get_attributes": 3600,
+    "get_status": 10,
+    "get_position": 10,
+    "get_services": 5,
+    "get_service_status": 2,
+    "reverse_geocode": 86400,
+}
+CACHE_MAX_ENTRIES = 256
+GEOCODE_PRECISION = 4
+
+# Event loop time per entity class per update, in ms
+DEFAULT_LOOP_BUDGET = 50
+
+# Trip analytics
+SIGNAL_TRIPS_UPDATED = f"{DOMAIN}.trips_updated"
+ANALYTICS_WINDOW = 20
+ANALYTICS_PERIOD_DAYS = 30
 
 # Conversions
 KMS_TO_MILES = 0.62137
+L100KM_TO_MPG = 2.35215
 
 FUEL_TYPE_BATTERY = "Electric"
 FUEL_TYPE_ICE = "ICE"
@@ -46,6 +139,15 @@ JLR_CHARGE_STATUS_TO_HA = {
     "No Message": "Not Charging",
 }
 
+# Charging statuses counted as an active charging session
+JLR_CHARGING_ACTIVE_STATES = ["CHARGING", "INITIALIZATION"]
+
+# Vehicle states where the vehicle is in use and awake
+JLR_ACTIVE_VEHICLE_STATES = ["KEY_INSERTED", "ENGINE_ON", "ENGINE_ON_REMOTE_START"]
+CHARGING_SESSION_SAMPLES = 1440
+CHARGING_STORE = "jlrincontrol_charging_{}"
+CHARGING_STORE_VERSION = 1
+
 JLR_CHARGE_METHOD_TO_HA = {
     "WIRED": "Wired",
     "NOTCONNECTED": "Not Connected",
@@ -193,6 +295,9 @@ DATA_ATTRS_WINDOW_STATUS = {
 
 SERVICE_STATUS_OK = ["CLEAR", "FUNCTIONING", "NORMAL", "NORMAL_UNBLOCKED"]
 
+# Service code for services every vehicle supports
+SERVICE_CODE_ANY = "NA"
+
 JLR_SERVICES = {
     "update_health_status": {
         "function_name": "get_health_status",
@@ -264,3 +369,47 @@ JLR_SERVICES = {
         "schema": ["SERVICES_BASE_SCHEMA", "SERVICES_CHARGE_LEVEL_SCHEMA"],
     },
 }
+
+# Services answered from locally stored data, without calling the api
+JLR_DATA_SERVICES = {
+    "get_trip_history": {
+        "function_name": "async_get_trip_history",
+        "schema": [
+            "SERVICES_BASE_SCHEMA",
+            "SERVICES_DATE_RANGE_SCHEMA",
+            "SERVICES_TRIP_FILTER_SCHEMA",
+        ],
+    },
+    "get_trip_summary": {
+        "function_name": "async_get_trip_summary",
+        "schema": [
+            "SERVICES_BASE_SCHEMA",
+            "SERVICES_DATE_RANGE_SCHEMA",
+            "SERVICES_TRIP_PERIOD_SCHEMA",
+        ],
+    },
+    "get_route": {
+        "function_name": "async_get_route",
+        "schema": [
+            "SERVICES_BASE_SCHEMA",
+            "SERVICES_DATE_RANGE_SCHEMA",
+            "SERVICES_ROUTE_SCHEMA",
+        ],
+    },
+}
+
+# Services running several commands in turn on one vehicle
+JLR_SEQUENCE_SERVICES = {
+    "run_sequence": {
+        "function_name": "async_run_sequence",
+        "schema": ["SERVICES_BASE_SCHEMA", "SERVICES_SEQUENCE_SCHEMA"],
+    },
+}
+SEQUENCE_MAX_STEPS = 10
+
+JLR_ADMIN_SERVICES = {
+    "profile": {
+        "function_name": "async_profile",
+        "schema": ["SERVICES_PROFILE_SCHEMA"],
+    },
+}
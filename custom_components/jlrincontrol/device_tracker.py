@@ -1,9 +1,10 @@
 """Support for JLR InControl Device Trackers."""
 import logging
+from homeassistant.core import callback
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.components.device_tracker import SourceType
 from homeassistant.components.device_tracker.config_entry import TrackerEntity
-from .const import JLR_DATA, DOMAIN
+from .const import GEOCODE_PRECISION, JLR_DATA, DOMAIN, SIGNAL_VEHICLES_ADDED
 from .entity import JLREntity
 
 
@@ -12,20 +13,30 @@ _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     data = hass.data[DOMAIN][config_entry.entry_id][JLR_DATA]
-    devices = []
 
-    for vehicle in data.vehicles:
-        if data.vehicles[vehicle].position:
-            devices.append(JLRDeviceTracker(hass, data, vehicle))
-
-        else:
-            _LOGGER.debug(
-                "Vehicle {} is not providing any position information.".format(
-                    data.vehicles[vehicle].attributes.get("nickname")
+    @callback
+    def async_add_vehicles(vins):
+        devices = []
+        for vehicle in vins:
+            if data.vehicles[vehicle].position:
+                devices.append(JLRDeviceTracker(hass, data, vehicle))
+
+            else:
+                _LOGGER.debug(
+                    "Vehicle {} is not providing any position information.".format(
+                        data.vehicles[vehicle].attributes.get("nickname")
+                    )
+                    + " No device trakcer will be created."
                 )
-                + " No device trakcer will be created."
-            )
-    async_add_entities(devices, True)
+        async_add_entities(devices, True)
+
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            SIGNAL_VEHICLES_ADDED.format(config_entry.entry_id),
+            async_add_vehicles,
+        )
+    )
 
 
 class JLRDeviceTracker(JLREntity, TrackerEntity):
@@ -33,6 +44,8 @@ class JLRDeviceTracker(JLREntity, TrackerEntity):
         self._position = None
         self._latitude = None
         self._longitude = None
+        self._location = None
+        self._geocoded = None
         self._icon = "mdi:car-connected"
         self._sensor_name = "device tracker"
         super().__init__(hass, data, vin)
@@ -46,6 +59,21 @@ class JLRDeviceTracker(JLREntity, TrackerEntity):
             if self._position:
                 self._latitude = round(self._position.get("latitude"), 8)
                 self._longitude = round(self._position.get("longitude"), 8)
+                # Only look up the address when the vehicle has moved further
+                # than the precision addresses are looked up at
+                coordinates = (
+                    round(self._latitude, GEOCODE_PRECISION),
+                    round(self._longitude, GEOCODE_PRECISION),
+                )
+                if coordinates != self._geocoded:
+                    geocode = await self._data.async_reverse_geocode(
+                        self._latitude, self._longitude
+                    )
+                    self._location = (
+                        geocode.get("formattedAddress") if geocode else None
+                    )
+                    # Tried again next update if the lookup failed
+                    self._geocoded = coordinates if geocode else None
         except Exception as ex:
             _LOGGER.debug(
                 "Unable to update device tracker for {}. Error is {}".format(
@@ -57,14 +85,8 @@ class JLRDeviceTracker(JLREntity, TrackerEntity):
     def extra_state_attributes(self):
         attrs = {}
 
-        try:
-            loc_name = self._hass.async_add_exexutor_job(
-                self._data.connection.reverse_geocode,
-                (self._latitude, self._longitude),
-            )
-            attrs["location"] = loc_name.get("formattedAddress")
-        except Exception:
-            pass
+        if self._location:
+            attrs["location"] = self._location
         attrs["speed"] = self._position.get("speed")
         attrs["heading"] = self._position.get("heading")
 
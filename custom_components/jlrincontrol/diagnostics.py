@@ -0,0 +1,39 @@
+"""Diagnostics support for JLR InControl."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_PASSWORD, CONF_PIN, CONF_USERNAME
+
+from .const import DOMAIN, JLR_DATA
+from .util import field_mask
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, CONF_PIN}
+
+
+async def async_get_config_entry_diagnostics(hass, config_entry):
+    """Return diagnostics for a config entry."""
+    data = hass.data[DOMAIN][config_entry.entry_id][JLR_DATA]
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(config_entry.data), TO_REDACT),
+            "options": async_redact_data(dict(config_entry.options), TO_REDACT),
+        },
+        "vehicles": {
+            field_mask(vin, 3, 2): {
+                "engine_type": vehicle.engine_type,
+                "model": vehicle.attributes.get("vehicleType"),
+                "model_year": vehicle.attributes.get("modelYear"),
+                "services": sorted(vehicle.profile.services),
+            }
+            for vin, vehicle in data.vehicles.items()
+        },
+        "polling": data.poller.as_dict() if data.poller else None,
+        "health_updates": data.health.as_dict() if data.health else None,
+        "session": data.session.as_dict(),
+        "circuit_breaker": data.breaker.as_dict(),
+        "rate_limit": data.limiter.as_dict(),
+        "scheduler": data.scheduler.as_dict(),
+        "executor": data.executor.as_dict(),
+        "response_cache": data.cache.as_dict(),
+        "api_metrics": data.transport.metrics.as_dict(),
+        "entity_loop_time": data.loop_budget.as_dict(),
+    }
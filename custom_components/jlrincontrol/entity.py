@@ -1,12 +1,18 @@
 import logging
-from homeassistant.const import (
-    UnitOfLength,
-    UnitOfPressure,
-)
+import time
+from functools import partial
+from homeassistant.const import UnitOfLength
+from homeassistant.core import callback
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import Entity
 from homeassistant.util import dt
-from .const import DOMAIN, SIGNAL_STATE_UPDATED
+from .const import (
+    ATTR_DATA_AGE,
+    ATTR_SOURCE,
+    DOMAIN,
+    SIGNAL_DATA_AGE_UPDATED,
+    SIGNAL_STATE_UPDATED,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -17,7 +23,6 @@ class JLREntity(Entity):
         self._hass = hass
         self._data = data
         self._vin = vin
-        self._vehicle = self._data.vehicles[self._vin]
         self._name = (
             self._vehicle.attributes.get("nickname")
             + " "
@@ -48,10 +53,19 @@ class JLREntity(Entity):
         """Return the icon for this sensor."""
         return self._icon or "mdi:cloud"
 
+    @property
+    def _vehicle(self):
+        # Restored vehicles are replaced when the api connects
+        return self._data.vehicles[self._vin]
+
     @property
     def vehicle(self):
         return self._vehicle
 
+    @property
+    def profile(self):
+        return self._vehicle.profile
+
     @property
     def unique_id(self):
         """Return the sensor's unique id."""
@@ -69,6 +83,23 @@ class JLREntity(Entity):
         """Return true if unable to access real state of entity."""
         return True
 
+    @property
+    def available(self):
+        """Unavailable if the data is older than the max data age option"""
+        if not self._data.max_data_age:
+            return True
+        age = self._data.data_age(self._vin)
+        return age is not None and age <= self._data.max_data_age * 60
+
+    @property
+    def state_attributes(self):
+        """Platform attributes plus the age and source of the data"""
+        attrs = dict(super().state_attributes or {})
+        age = self._data.data_age(self._vin)
+        attrs[ATTR_DATA_AGE] = int(age) if age is not None else None
+        attrs[ATTR_SOURCE] = self._data.data_source.get(self._vin)
+        return attrs
+
     async def async_update(self):
         _LOGGER.debug("Updating {}".format(self._name))
         return True
@@ -76,15 +107,48 @@ class JLREntity(Entity):
     async def async_added_to_hass(self):
         """Subscribe for update from the hub"""
 
-        async def async_update_state():
+        async def async_update_state(vin=None):
             """Update sensor state."""
-            await self.async_update_ha_state(True)
+            # Only the updated vehicle, or all if none given
+            if vin and vin != self._vin:
+                return
+            try:
+                await self.async_device_update()
+            except Exception:
+                _LOGGER.exception("Update for {} fails".format(self.entity_id))
+                return
+            self.async_write_budgeted_state()
+
+        @callback
+        def async_update_data_age(vin=None):
+            """Show the data getting older while updates fail"""
+            if vin and vin != self._vin:
+                return
+            self.async_write_budgeted_state()
 
         self.async_on_remove(
             async_dispatcher_connect(
                 self._hass, SIGNAL_STATE_UPDATED, async_update_state
             )
         )
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self._hass, SIGNAL_DATA_AGE_UPDATED, async_update_data_age
+            )
+        )
+
+        # Register for service calls by entity_id
+        self._data.async_add_entity(self)
+        self.async_on_remove(partial(self._data.async_remove_entity, self))
+
+    @callback
+    def async_write_budgeted_state(self):
+        """Write state, recording the loop time used against this class"""
+        start = time.perf_counter()
+        self.async_write_ha_state()
+        self._data.loop_budget.record(
+            type(self).__name__, time.perf_counter() - start
+        )
 
     def to_local_datetime(self, datetime: str):
         try:
@@ -93,19 +157,10 @@ class JLREntity(Entity):
             return None
 
     def get_distance_units(self):
-        if self._data.distance_unit and self._data.distance_unit != "Default":
-            return self._data.distance_unit
-        else:
-            return self._hass.config.units.length_unit
+        return self.profile.distance_unit
 
     def get_pressure_units(self):
-        if self._data.pressure_unit and self._data.pressure_unit != "Default":
-            return self._data.pressure_unit
-        else:
-            if self._hass.config.units.pressure_unit == UnitOfPressure.PA:
-                return UnitOfPressure.BAR
-            else:
-                return UnitOfPressure.PSI
+        return self.profile.pressure_unit
 
     def get_odometer(self, vehicle):
         self.units = self.get_distance_units()
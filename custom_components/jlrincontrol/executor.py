@@ -0,0 +1,105 @@
+"""
+Thread pool for blocking jlrpy calls.
+
+Api calls run in a small pool owned by the integration rather than the
+Home Assistant executor, so a hung InControl endpoint can only tie up
+these threads. Each call has a timeout. A call still queued when it times
+out or is cancelled never runs. One already running cannot be stopped,
+so its thread stays busy until jlrpy returns and shows in the metrics.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .const import API_CALL_TIMEOUT, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class JLRCallTimeout(Exception):
+    """Api call did not complete in time"""
+
+
+class JLRExecutor:
+    """Bounded thread pool with per call timeouts"""
+
+    def __init__(self, size, timeout=API_CALL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(
+            max_workers=size, thread_name_prefix=DOMAIN
+        )
+        self.created = time.monotonic()
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.busy_time = 0.0
+        self._lock = threading.Lock()
+
+    def _run(self, func, args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.busy_time += time.perf_counter() - start
+
+    async def async_run(self, func, *args, timeout=None):
+        """Run a blocking function in the pool, waiting at most timeout"""
+        timeout = timeout or self.timeout
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            self.calls += 1
+        future = self.pool.submit(self._run, func, args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._cancel(future)
+            raise JLRCallTimeout(
+                "No response from JLR InControl in {} seconds".format(timeout)
+            ) from None
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            self._cancel(future)
+            raise
+
+    def _cancel(self, future):
+        """Stop a call that has not started"""
+        if future.cancel():
+            with self._lock:
+                self.queued -= 1
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def utilization(self):
+        """Share of thread time used since the pool was created"""
+        elapsed = time.monotonic() - self.created
+        with self._lock:
+            busy = self.busy_time
+        return busy / (elapsed * self.size) if elapsed else 0
+
+    def as_dict(self):
+        return {
+            "threads": self.size,
+            "timeout_s": self.timeout,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "utilization_pct": round(self.utilization * 100, 1),
+        }
@@ -0,0 +1,151 @@
+"""
+Wake aware health updates for JLR InControl.
+
+A health update has the vehicle report in, waking it if it is asleep,
+which is slow and drains its battery. Health updates are requested when a
+status update shows the vehicle is already awake: it reported in recently,
+its engine is running or it is charging. They are never requested more
+often than the minimum interval, and a sleeping vehicle is only woken once
+its health data is older than the maximum age.
+"""
+import logging
+from datetime import timedelta
+
+from homeassistant.core import callback
+from homeassistant.util import dt
+
+from .const import (
+    HEALTH_AWAKE_WINDOW,
+    JLR_ACTIVE_VEHICLE_STATES,
+    JLR_CHARGING_ACTIVE_STATES,
+)
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+REASON_REPORTED = "reported"
+REASON_ACTIVE = "active"
+REASON_CHARGING = "charging"
+REASON_MAX_AGE = "max_age"
+
+
+def awake_reason(vehicle, now):
+    """Why the vehicle is thought to be awake, or None if asleep"""
+    last_updated = vehicle.status.get("lastUpdatedTime")
+    if last_updated:
+        reported = dt.parse_datetime(last_updated)
+        if reported and now - reported <= timedelta(minutes=HEALTH_AWAKE_WINDOW):
+            return REASON_REPORTED
+    if vehicle.status.get("VEHICLE_STATE_TYPE") in JLR_ACTIVE_VEHICLE_STATES:
+        return REASON_ACTIVE
+    status_ev = getattr(vehicle, "status_ev", None) or {}
+    if status_ev.get("EV_CHARGING_STATUS") in JLR_CHARGING_ACTIVE_STATES:
+        return REASON_CHARGING
+    return None
+
+
+class JLRHealthScheduler:
+    """Requests health updates for vehicles when they are awake"""
+
+    def __init__(self, hass, request_health, min_interval, max_age):
+        self.hass = hass
+        self.request_health = request_health
+        self.min_interval = timedelta(minutes=min_interval)
+        # A max age of 0 never wakes a sleeping vehicle
+        self.max_age = (
+            max(timedelta(minutes=max_age), self.min_interval) if max_age else None
+        )
+        self.last_request = {}
+        self.last_reason = {}
+        self.in_flight = set()
+        self.requests = 0
+        self.failures = 0
+        self.skipped = 0
+        self.started = None
+        self._stopped = False
+
+    @callback
+    def async_start(self, vins):
+        """Start for vehicles. Returns a callable that stops it."""
+        self.started = dt.utcnow()
+        for vin in vins:
+            self.last_request.setdefault(vin, None)
+        self._stopped = False
+        return self.async_stop
+
+    @callback
+    def async_stop(self):
+        self._stopped = True
+
+    @callback
+    def async_record_request(self, vin):
+        """Record a health update requested elsewhere, such as the service"""
+        if vin in self.last_request:
+            self.last_request[vin] = dt.utcnow()
+
+    @callback
+    def async_status_updated(self, vin, vehicle):
+        """Request a health update if the vehicle is awake and one is due"""
+        if self._stopped or vin not in self.last_request or vin in self.in_flight:
+            return
+        now = dt.utcnow()
+        last = self.last_request[vin]
+        if last and now - last < self.min_interval:
+            return
+
+        reason = awake_reason(vehicle, now)
+        if reason is None:
+            # Not known since starting, so counted from then rather than
+            # waking every vehicle on a restart
+            age = now - (last or self.started)
+            if self.max_age is None or age < self.max_age:
+                self.skipped += 1
+                _LOGGER.debug(
+                    "Not requesting health update for {} as it is asleep".format(
+                        field_mask(vin, 3, 2)
+                    )
+                )
+                return
+            reason = REASON_MAX_AGE
+
+        _LOGGER.debug(
+            "Requesting health update for {} ({})".format(
+                field_mask(vin, 3, 2), reason
+            )
+        )
+        self.in_flight.add(vin)
+        self.last_reason[vin] = reason
+        self.hass.async_create_task(self._async_request(vin))
+
+    async def _async_request(self, vin):
+        try:
+            if await self.request_health([vin]):
+                self.requests += 1
+            else:
+                self.failures += 1
+        finally:
+            # Recorded whether or not it worked, so a failing request waits
+            # the minimum interval rather than being retried on every update
+            self.last_request[vin] = dt.utcnow()
+            self.in_flight.discard(vin)
+
+    def as_dict(self):
+        return {
+            "min_interval_min": self.min_interval.total_seconds() / 60,
+            "max_age_min": (
+                self.max_age.total_seconds() / 60 if self.max_age else None
+            ),
+            "requests": self.requests,
+            "failures": self.failures,
+            "skipped_asleep": self.skipped,
+            "vehicles": {
+                field_mask(vin, 3, 2): {
+                    "last_request": (
+                        dt.as_local(last).isoformat() if last else None
+                    ),
+                    "last_reason": self.last_reason.get(vin),
+                    "in_flight": vin in self.in_flight,
+                }
+                for vin, last in self.last_request.items()
+            },
+        }
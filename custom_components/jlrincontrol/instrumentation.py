@@ -0,0 +1,157 @@
+"""
+API call instrumentation for JLR InControl.
+
+Keeps latency histograms, error counts and daily call totals for each
+api endpoint and vehicle, so polling can be tuned against real numbers.
+"""
+import logging
+from bisect import bisect_left
+
+from homeassistant.util import dt
+
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 5, 10, 20, 30, 60]
+
+
+class EndpointMetrics:
+    """Counters for one endpoint on one vehicle"""
+
+    __slots__ = [
+        "calls",
+        "errors",
+        "calls_today",
+        "errors_today",
+        "total_time",
+        "max_time",
+        "buckets",
+        "last_call",
+        "last_error",
+    ]
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.calls_today = 0
+        self.errors_today = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.last_call = None
+        self.last_error = None
+
+    def record(self, elapsed, error=None):
+        self.calls += 1
+        self.calls_today += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.last_call = dt.utcnow()
+        if error is not None:
+            self.errors += 1
+            self.errors_today += 1
+            self.last_error = str(error)
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.calls_today += other.calls_today
+        self.errors_today += other.errors_today
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        if other.last_call and (not self.last_call or other.last_call > self.last_call):
+            self.last_call = other.last_call
+            self.last_error = other.last_error or self.last_error
+
+    def percentile(self, percent):
+        """Approximate latency percentile from the histogram bucket bounds"""
+        if not self.calls:
+            return None
+        target = self.calls * percent / 100
+        count = 0
+        for i, bucket in enumerate(self.buckets):
+            count += bucket
+            if count >= target:
+                if i < len(LATENCY_BUCKETS):
+                    return min(LATENCY_BUCKETS[i], self.max_time)
+                return self.max_time
+        return self.max_time
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "calls_today": self.calls_today,
+            "errors_today": self.errors_today,
+            "avg_ms": round(self.total_time / self.calls * 1000) if self.calls else None,
+            "p50_ms": round(self.percentile(50) * 1000) if self.calls else None,
+            "p95_ms": round(self.percentile(95) * 1000) if self.calls else None,
+            "max_ms": round(self.max_time * 1000),
+            "histogram": dict(
+                zip([f"<={b}s" for b in LATENCY_BUCKETS] + ["slower"], self.buckets)
+            ),
+            "last_call": self.last_call.isoformat() if self.last_call else None,
+            "last_error": self.last_error,
+        }
+
+
+class JLRApiMetrics:
+    """Api call metrics for an account, keyed by endpoint and vin"""
+
+    def __init__(self):
+        self.endpoints = {}
+        self.day = dt.now().date()
+
+    def _roll_day(self):
+        today = dt.now().date()
+        if today != self.day:
+            self.day = today
+            for metrics in self.endpoints.values():
+                metrics.calls_today = 0
+                metrics.errors_today = 0
+
+    def record(self, endpoint, vin, elapsed, error=None):
+        """Record a completed api call"""
+        self._roll_day()
+        key = (endpoint, vin)
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointMetrics()
+        self.endpoints[key].record(elapsed, error)
+
+    def summary(self, vin=None, by_vin=False):
+        """Metrics merged by endpoint, for one vin or the whole account"""
+        self._roll_day()
+        merged = {}
+        for (endpoint, endpoint_vin), metrics in self.endpoints.items():
+            if vin and endpoint_vin != vin:
+                continue
+            key = (endpoint_vin, endpoint) if by_vin else endpoint
+            if key not in merged:
+                merged[key] = EndpointMetrics()
+            merged[key].merge(metrics)
+        return merged
+
+    def calls_today(self, vin=None):
+        return sum(m.calls_today for m in self.summary(vin).values())
+
+    def errors_today(self, vin=None):
+        return sum(m.errors_today for m in self.summary(vin).values())
+
+    def as_dict(self):
+        """All metrics, for diagnostics, with vins masked"""
+        vins = {}
+        for (vin, endpoint), metrics in self.summary(by_vin=True).items():
+            vin = field_mask(vin, 3, 2) if vin else "account"
+            vins.setdefault(vin, {})[endpoint] = metrics.as_dict()
+
+        return {
+            "day": self.day.isoformat(),
+            "calls_today": self.calls_today(),
+            "errors_today": self.errors_today(),
+            "endpoints": {k: v.as_dict() for k, v in self.summary().items()},
+            "vehicles": vins,
+        }
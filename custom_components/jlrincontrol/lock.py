@@ -3,12 +3,15 @@ import logging
 
 # from homeassistant.const import STATE_OFF, UNIT_PERCENTAGE
 from homeassistant.components.lock import LockEntity
-from .services import JLRService
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from .const import (
     DOMAIN,
     DATA_ATTRS_DOOR_POSITION,
     DATA_ATTRS_DOOR_STATUS,
+    EVENT_COMMAND_FAILED,
     JLR_DATA,
+    SIGNAL_VEHICLES_ADDED,
 )
 from .entity import JLREntity
 
@@ -17,58 +20,117 @@ _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     data = hass.data[DOMAIN][config_entry.entry_id][JLR_DATA]
-    devices = []
 
-    for vehicle in data.vehicles:
-        devices.append(JLRLock(hass, data, vehicle))
-        data.entities.extend(devices)
+    @callback
+    def async_add_vehicles(vins):
+        devices = []
+        for vehicle in vins:
+            # Only vehicles with remote lock or unlock
+            profile = data.vehicles[vehicle].profile
+            if not (profile.supports("RDL") or profile.supports("RDU")):
+                _LOGGER.debug(
+                    "Remote lock not available on {}".format(
+                        data.vehicles[vehicle].attributes.get("nickname")
+                    )
+                )
+                continue
+            devices.append(JLRLock(hass, data, vehicle))
         async_add_entities(devices, True)
 
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            SIGNAL_VEHICLES_ADDED.format(config_entry.entry_id),
+            async_add_vehicles,
+        )
+    )
+
 
 class JLRLock(JLREntity, LockEntity):
     def __init__(self, hass, data, vin):
         self._icon = "mdi:car-key"
         self._sensor_name = "doors"
+        self._pending = None
+        self._optimistic = None
         super().__init__(hass, data, vin)
 
     @property
     def is_locked(self):
         """Return true if lock is locked."""
+        # Show the expected state until a newer status is received
+        if self._optimistic is not None:
+            return self._optimistic[0]
         return self._vehicle.status.get("DOOR_IS_ALL_DOORS_LOCKED") == "TRUE"
 
+    @property
+    def is_locking(self):
+        return self._pending == "lock"
+
+    @property
+    def is_unlocking(self):
+        return self._pending == "unlock"
+
+    async def async_update(self):
+        """Drop the expected state once a newer status is received"""
+        if (
+            self._optimistic is not None
+            and self._vehicle.status.get("lastUpdatedTime") != self._optimistic[1]
+        ):
+            self._optimistic = None
+        return await super().async_update()
+
     async def async_lock(self, **kwargs):
         """Lock the car."""
         _LOGGER.debug("Locking vehicle")
-        p = self._data.pin
-        if p:
-            kwargs = {}
-            kwargs["service_name"] = "lock"
-            kwargs["service_code"] = "RDL"
-            kwargs["pin"] = p
-            jlr_service = JLRService(
-                self._hass, self._data.config_entry, self._vin
-            )
-            await jlr_service.async_call_service(**kwargs)
-            await self._data.async_update()
-        else:
-            _LOGGER.warning("Cannot lock vehicle - pin not set in options.")
+        await self._async_command("lock", "RDL", True)
 
     async def async_unlock(self, **kwargs):
         """Unlock the car."""
         _LOGGER.debug("Unlocking vehicle")
+        await self._async_command("unlock", "RDU", False)
+
+    async def _async_command(self, service_name, service_code, locked):
+        """Call a lock service, showing the expected state while it runs"""
         p = self._data.pin
-        if p:
-            kwargs = {}
-            kwargs["service_name"] = "unlock"
-            kwargs["service_code"] = "RDU"
-            kwargs["pin"] = p
-            jlr_service = JLRService(
-                self._hass, self._data.config_entry, self._vin
+        if not p:
+            _LOGGER.warning(
+                "Cannot {} vehicle - pin not set in options.".format(service_name)
+            )
+            return
+
+        def accepted():
+            self._pending = None
+            self._optimistic = (locked, self._vehicle.status.get("lastUpdatedTime"))
+            self.async_write_budgeted_state()
+
+        self._pending = service_name
+        self.async_write_budgeted_state()
+        status = None
+        try:
+            status = await self._data.get_service(self._vin).async_call_service(
+                on_accepted=accepted,
+                service_name=service_name,
+                service_code=service_code,
+                pin=p,
             )
-            await jlr_service.async_call_service(**kwargs)
-            await self._data.async_update()
-        else:
-            _LOGGER.warning("Cannot unlock vehicle - pin not set in options.")
+        finally:
+            self._pending = None
+            if status != "Successful":
+                # Roll back to the last known state
+                self._optimistic = None
+                self.async_write_budgeted_state()
+                self._hass.bus.async_fire(
+                    EVENT_COMMAND_FAILED,
+                    {
+                        "entity_id": self.entity_id,
+                        "command": service_name,
+                        "status": status,
+                    },
+                )
+
+        # Only the status shows the result, so position and trips are left
+        await self._data.async_update_vehicle(self._vin, status_only=True)
+        self.async_write_budgeted_state()
 
     @property
     def extra_state_attributes(self):
@@ -0,0 +1,106 @@
+"""
+Event loop time budget for JLR InControl entities.
+
+State writes, including state and attribute rendering, run on the event
+loop. Time spent writing is accumulated per entity class for each update
+cycle, and a warning is logged the first time a class goes over the
+budget in a cycle.
+"""
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ClassBudget:
+    """Loop time used by one entity class"""
+
+    __slots__ = [
+        "cycle_time",
+        "cycle_writes",
+        "last_time",
+        "max_time",
+        "total_time",
+        "writes",
+        "cycles",
+        "over_budget",
+    ]
+
+    def __init__(self):
+        self.cycle_time = 0.0
+        self.cycle_writes = 0
+        self.last_time = 0.0
+        self.max_time = 0.0
+        self.total_time = 0.0
+        self.writes = 0
+        self.cycles = 0
+        self.over_budget = 0
+
+    def end_cycle(self):
+        if self.cycle_writes:
+            self.last_time = self.cycle_time
+            self.max_time = max(self.max_time, self.cycle_time)
+            self.total_time += self.cycle_time
+            self.cycles += 1
+        self.cycle_time = 0.0
+        self.cycle_writes = 0
+
+    def as_dict(self):
+        return {
+            "current_cycle_ms": round(self.cycle_time * 1000, 2),
+            "last_cycle_ms": round(self.last_time * 1000, 2),
+            "max_cycle_ms": round(self.max_time * 1000, 2),
+            "avg_cycle_ms": round(self.total_time / self.cycles * 1000, 2)
+            if self.cycles
+            else None,
+            "writes": self.writes,
+            "cycles": self.cycles,
+            "cycles_over_budget": self.over_budget,
+        }
+
+
+class JLRLoopBudget:
+    """Per update cycle loop time accounting by entity class"""
+
+    def __init__(self, budget_ms):
+        self.budget = budget_ms / 1000 if budget_ms else None
+        self.classes = {}
+        self.cycle = 0
+
+    def start_cycle(self):
+        """Close the previous update cycle"""
+        self.cycle += 1
+        for budget in self.classes.values():
+            budget.end_cycle()
+
+    def record(self, name, elapsed):
+        """Record loop time used writing state for an entity class"""
+        budget = self.classes.get(name)
+        if budget is None:
+            budget = self.classes[name] = ClassBudget()
+
+        before = budget.cycle_time
+        budget.cycle_time += elapsed
+        budget.cycle_writes += 1
+        budget.writes += 1
+
+        if self.budget and before <= self.budget < budget.cycle_time:
+            budget.over_budget += 1
+            _LOGGER.warning(
+                "{} entities have used {:.1f}ms of event loop time this update,".format(
+                    name, budget.cycle_time * 1000
+                )
+                + " over the budget of {:.0f}ms".format(self.budget * 1000)
+            )
+
+    def as_dict(self):
+        return {
+            "budget_ms": round(self.budget * 1000) if self.budget else None,
+            "cycles": self.cycle,
+            "classes": {
+                name: budget.as_dict()
+                for name, budget in sorted(
+                    self.classes.items(),
+                    key=lambda c: -max(c[1].max_time, c[1].cycle_time),
+                )
+            },
+        }
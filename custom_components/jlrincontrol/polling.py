@@ -0,0 +1,108 @@
+"""
+Staggered polling for JLR InControl.
+
+Each vehicle has its own update timer. Vehicles are given evenly spaced
+phase offsets across the scan interval, so an account with many vehicles
+makes a steady trickle of requests rather than one burst per interval.
+Vehicles can have their own interval. Due times advance by whole
+intervals so the spacing does not drift.
+"""
+import logging
+from datetime import timedelta
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt
+
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_vehicle_intervals(value):
+    """
+    Parse per vehicle intervals in the form "vin=minutes, ...".
+
+    Vehicles can also be given by nickname or the last 6 or more
+    characters of the vin.
+    """
+    intervals = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        key, _, minutes = item.partition("=")
+        try:
+            intervals[key.strip().lower()] = max(float(minutes), 1)
+        except ValueError:
+            _LOGGER.warning(
+                "Ignoring invalid vehicle scan interval {}".format(item.strip())
+            )
+    return intervals
+
+
+class JLRPollScheduler:
+    """Per vehicle update timers with staggered phases"""
+
+    def __init__(self, hass, update_vehicle, interval, overrides=None):
+        self.hass = hass
+        self.update_vehicle = update_vehicle
+        self.interval = interval
+        self.overrides = overrides or {}
+        self.next_due = {}
+        self.intervals = {}
+        self._unsubs = {}
+
+    def vehicle_interval(self, vin, nickname=None):
+        """Scan interval in minutes for a vehicle"""
+        for key, minutes in self.overrides.items():
+            if key == vin.lower() or key == (nickname or "").lower():
+                return minutes
+            if len(key) >= 6 and vin.lower().endswith(key):
+                return minutes
+        return self.interval
+
+    @callback
+    def async_start(self, vehicles):
+        """Start polling. Returns a callable that stops it."""
+        now = dt.utcnow()
+        count = len(vehicles)
+        for i, (vin, nickname) in enumerate(vehicles):
+            minutes = self.vehicle_interval(vin, nickname)
+            self.intervals[vin] = timedelta(minutes=minutes)
+            self.next_due[vin] = now + self.intervals[vin] * (i + 1) / count
+            if minutes != self.interval:
+                _LOGGER.info(
+                    "Updating {} on {} minute interval".format(nickname, minutes)
+                )
+            self._schedule(vin)
+        return self.async_stop
+
+    def _schedule(self, vin):
+        @callback
+        def poll(now):
+            self._unsubs.pop(vin, None)
+            # Skip any missed polls rather than run them together
+            while self.next_due[vin] <= now:
+                self.next_due[vin] += self.intervals[vin]
+            self._schedule(vin)
+            _LOGGER.debug("Scheduled update for {}".format(field_mask(vin, 3, 2)))
+            self.hass.async_create_task(self.update_vehicle(vin))
+
+        self._unsubs[vin] = async_track_point_in_utc_time(
+            self.hass, poll, self.next_due[vin]
+        )
+
+    @callback
+    def async_stop(self):
+        for unsub in self._unsubs.values():
+            unsub()
+        self._unsubs.clear()
+
+    def as_dict(self):
+        return {
+            field_mask(vin, 3, 2): {
+                "interval_min": self.intervals[vin].total_seconds() / 60,
+                "next_update": dt.as_local(due).isoformat(),
+            }
+            for vin, due in self.next_due.items()
+        }
@@ -0,0 +1,260 @@
+"""
+Position history for JLR InControl.
+
+Each vehicle has an append only binary log in the HA storage directory.
+Records hold the change in time, latitude and longitude from the previous
+record as zigzag varints, so a typical point takes a few bytes. Routes are
+simplified with Ramer-Douglas-Peucker when read.
+"""
+import logging
+import math
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import dt
+
+from .const import POSITION_LOG_FILE, POSITION_SCALE
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+LOG_HEADER = b"JLRP\x01"
+EARTH_RADIUS = 6371008.8
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def encode_record(values, previous):
+    """Encode values as varint deltas from the previous values"""
+    out = bytearray()
+    for value, last in zip(values, previous):
+        n = _zigzag(value - last)
+        while n > 0x7F:
+            out.append((n & 0x7F) | 0x80)
+            n >>= 7
+        out.append(n)
+    return bytes(out)
+
+
+def decode_log(data, fields=3):
+    """
+    Decode a delta encoded log into one array per field.
+
+    Also returns the length of data holding complete records, so a partly
+    written last record can be cut off.
+    """
+    columns = [array("q") for _ in range(fields)]
+    current = [0] * fields
+    field = 0
+    n = 0
+    shift = 0
+    complete = 0
+    for offset, byte in enumerate(data):
+        n |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        current[field] += _unzigzag(n)
+        columns[field].append(current[field])
+        field = (field + 1) % fields
+        n = 0
+        shift = 0
+        if field == 0:
+            complete = offset + 1
+    # Drop any partly written record
+    length = min(len(column) for column in columns)
+    return [column[:length] for column in columns], complete
+
+
+def decode_records(data, fields=3):
+    """Decode a delta encoded log into one array per field"""
+    return decode_log(data, fields)[0]
+
+
+def simplify_route(points, tolerance):
+    """
+    Ramer-Douglas-Peucker simplification.
+
+    Points are (lat, lon, ...) tuples in degrees and tolerance is in metres.
+    Returns the indexes of the points to keep.
+    """
+    if len(points) < 3:
+        return list(range(len(points)))
+
+    # Project to a local flat plane in metres
+    ref_lat = math.radians(points[0][0])
+    cos_lat = math.cos(ref_lat)
+    xy = [
+        (
+            math.radians(p[1]) * cos_lat * EARTH_RADIUS,
+            math.radians(p[0]) * EARTH_RADIUS,
+        )
+        for p in points
+    ]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = xy[first]
+        x2, y2 = xy[last]
+        dx = x2 - x1
+        dy = y2 - y1
+        length = math.hypot(dx, dy)
+
+        max_dist = 0
+        index = None
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            if length:
+                dist = abs(dy * x - dx * y + x2 * y1 - y2 * x1) / length
+            else:
+                dist = math.hypot(x - x1, y - y1)
+            if dist > max_dist:
+                max_dist = dist
+                index = i
+
+        if index is not None and max_dist > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [i for i, k in enumerate(keep) if k]
+
+
+def encode_polyline(points):
+    """Encode (lat, lon) points in the Google encoded polyline format"""
+    out = []
+    last_lat = last_lon = 0
+    for lat, lon in points:
+        lat = int(round(lat * 1e5))
+        lon = int(round(lon * 1e5))
+        for delta in (lat - last_lat, lon - last_lon):
+            n = ~(delta << 1) if delta < 0 else delta << 1
+            while n >= 0x20:
+                out.append(chr((0x20 | (n & 0x1F)) + 63))
+                n >>= 5
+            out.append(chr(n + 63))
+        last_lat, last_lon = lat, lon
+    return "".join(out)
+
+
+class JLRPositionLog:
+    """Compact position history for a single vehicle"""
+
+    def __init__(self, hass, vin):
+        self.hass = hass
+        self.vin = vin
+        self.path = hass.config.path(
+            STORAGE_DIR, POSITION_LOG_FILE.format(vin.lower())
+        )
+        self.timestamps = array("q")
+        self.latitudes = array("q")
+        self.longitudes = array("q")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            with open(self.path, "wb") as log:
+                log.write(LOG_HEADER)
+            return
+
+        with open(self.path, "rb") as log:
+            data = log.read()
+
+        if not data.startswith(LOG_HEADER):
+            _LOGGER.warning(
+                "Position log for {} is not valid and will be replaced".format(
+                    field_mask(self.vin, 3, 2)
+                )
+            )
+            os.replace(self.path, self.path + ".bad")
+            return self._load()
+
+        records = data[len(LOG_HEADER):]
+        (self.timestamps, self.latitudes, self.longitudes), complete = decode_log(
+            records
+        )
+        if complete < len(records):
+            # New records would otherwise decode out of step after it
+            _LOGGER.warning(
+                "Removing partly written record from position log for {}".format(
+                    field_mask(self.vin, 3, 2)
+                )
+            )
+            with open(self.path, "r+b") as log:
+                log.truncate(len(LOG_HEADER) + complete)
+
+    async def async_load(self):
+        """Load the stored position history"""
+        await self.hass.async_add_executor_job(self._load)
+        _LOGGER.debug(
+            "Loaded {} stored positions for {}".format(
+                len(self.timestamps), field_mask(self.vin, 3, 2)
+            )
+        )
+
+    def _append(self, record):
+        with open(self.path, "ab") as log:
+            log.write(record)
+
+    async def async_add_position(self, position):
+        """Add a position from the api if the vehicle has moved"""
+        if not position or not position.get("position"):
+            return False
+
+        p = position.get("position")
+        try:
+            latitude = int(round(float(p.get("latitude")) * POSITION_SCALE))
+            longitude = int(round(float(p.get("longitude")) * POSITION_SCALE))
+        except (TypeError, ValueError):
+            return False
+
+        reported = dt.parse_datetime(str(p.get("timestamp", "")))
+        timestamp = int((reported or dt.utcnow()).timestamp())
+
+        if self.timestamps:
+            previous = (
+                self.timestamps[-1],
+                self.latitudes[-1],
+                self.longitudes[-1],
+            )
+            if timestamp <= previous[0] or previous[1:] == (latitude, longitude):
+                return False
+        else:
+            previous = (0, 0, 0)
+
+        record = encode_record((timestamp, latitude, longitude), previous)
+        self.timestamps.append(timestamp)
+        self.latitudes.append(latitude)
+        self.longitudes.append(longitude)
+        await self.hass.async_add_executor_job(self._append, record)
+        return True
+
+    def get_route(self, start, end, tolerance):
+        """Return simplified (lat, lon, timestamp) points between two times"""
+        first = bisect_left(self.timestamps, int(start))
+        last = bisect_right(self.timestamps, int(end))
+        points = [
+            (
+                self.latitudes[i] / POSITION_SCALE,
+                self.longitudes[i] / POSITION_SCALE,
+                self.timestamps[i],
+            )
+            for i in range(first, last)
+        ]
+        return [points[i] for i in simplify_route(points, tolerance)], len(points)
+
+    async def async_get_route(self, start, end, tolerance):
+        """Simplify a route in the executor"""
+        return await self.hass.async_add_executor_job(
+            self.get_route, start, end, tolerance
+        )
@@ -0,0 +1,168 @@
+"""
+On demand profiling for JLR InControl.
+
+The profile service arms the profiler for the next N runs of a status
+update, health update or command. Each run is profiled with cProfile while
+a sampler measures event loop lag. When the last run completes, a .prof
+file and a summary with the top functions are written to the config dir.
+
+cProfile only sees the event loop thread, so the figures show loop cost.
+Time spent waiting on the api in the executor shows as wall time only.
+"""
+import asyncio
+import io
+import logging
+import time
+
+from homeassistant.util import dt
+
+from .const import PROFILE_FILE, PROFILE_LAG_INTERVAL
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_UPDATE = "update"
+PROFILE_HEALTH_UPDATE = "health_update"
+PROFILE_COMMAND = "command"
+PROFILE_TARGETS = [PROFILE_UPDATE, PROFILE_HEALTH_UPDATE, PROFILE_COMMAND]
+
+
+class LoopLagSampler:
+    """Samples how late the event loop runs a short sleep"""
+
+    def __init__(self, interval=PROFILE_LAG_INTERVAL):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _sample(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(
+                max(time.perf_counter() - start - self.interval, 0)
+            )
+
+    def start(self, hass):
+        self._task = hass.loop.create_task(self._sample())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def summary(self):
+        if not self.samples:
+            return {"samples": 0}
+        samples = sorted(self.samples)
+        return {
+            "samples": len(samples),
+            "avg_ms": round(sum(samples) / len(samples) * 1000, 1),
+            "p95_ms": round(samples[int(len(samples) * 0.95)] * 1000, 1),
+            "max_ms": round(samples[-1] * 1000, 1),
+        }
+
+
+class ProfileSession:
+    """Profile of the next N runs of a target"""
+
+    def __init__(self, target, count, top, command=None):
+        self.target = target
+        self.count = count
+        self.top = top
+        self.command = command
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self.lag = LoopLagSampler()
+        self.runs = []
+
+    def matches(self, target, name):
+        if target != self.target:
+            return False
+        return not self.command or self.command == name
+
+    @property
+    def complete(self):
+        return len(self.runs) >= self.count
+
+    def report(self):
+        """Summary text with run times, loop lag and top functions"""
+        import pstats
+
+        out = io.StringIO()
+        out.write(
+            "JLR InControl profile of {} {}\n".format(
+                self.target, self.command or ""
+            ).rstrip()
+            + "\n\n"
+        )
+        for i, (name, wall) in enumerate(self.runs):
+            out.write("Run {} {} wall {:.3f}s\n".format(i + 1, name or "", wall))
+        out.write("\nLoop lag {}\n".format(self.lag.summary()))
+
+        for sort in ["cumulative", "tottime"]:
+            out.write("\nTop {} by {}\n".format(self.top, sort))
+            stats = pstats.Stats(self.profile, stream=out)
+            stats.strip_dirs().sort_stats(sort).print_stats(self.top)
+        return out.getvalue()
+
+
+class JLRProfiler:
+    """Arms and runs profile sessions for an account"""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.sessions = {}
+        self.active = None
+
+    def arm(self, target, count, top, command=None):
+        """Profile the next count runs of target. A count of 0 cancels."""
+        if not count:
+            self.sessions.pop(target, None)
+            _LOGGER.info("Profiling of {} cancelled".format(target))
+            return
+        self.sessions[target] = ProfileSession(target, count, top, command)
+        _LOGGER.info(
+            "Profiling the next {} {} runs{}".format(
+                count, target, " of {}".format(command) if command else ""
+            )
+        )
+
+    async def async_run(self, target, func, *args, name=None):
+        """Run a coroutine function, profiling it if armed for target"""
+        session = self.sessions.get(target)
+        # Runs inside another profiled run are part of that profile
+        if not session or not session.matches(target, name) or self.active:
+            return await func(*args)
+
+        self.active = session
+        session.lag.start(self.hass)
+        start = time.perf_counter()
+        session.profile.enable()
+        try:
+            return await func(*args)
+        finally:
+            session.profile.disable()
+            session.runs.append((name, time.perf_counter() - start))
+            session.lag.stop()
+            self.active = None
+            if session.complete:
+                self.sessions.pop(target, None)
+                self.hass.async_create_task(self.async_write(session))
+
+    def _write(self, session):
+        path = self.hass.config.path(
+            PROFILE_FILE.format(session.target, dt.now().strftime("%Y%m%d_%H%M%S"))
+        )
+        session.profile.dump_stats(path + ".prof")
+        with open(path + ".txt", "w", encoding="utf-8") as summary:
+            summary.write(session.report())
+        return path
+
+    async def async_write(self, session):
+        path = await self.hass.async_add_executor_job(self._write, session)
+        _LOGGER.info(
+            "Profile of {} written to {}.prof and {}.txt".format(
+                session.target, path, path
+            )
+        )
@@ -0,0 +1,172 @@
+"""
+Account level rate limiting for JLR InControl.
+
+Every api call for an account takes a token from a shared bucket, so
+bursts such as connecting many vehicles are spread out. When calls have
+to wait, they are let through in priority order, commands first.
+
+An optional daily request budget is shared out by priority. Each lower
+priority stops a share of the budget early, keeping the rest for higher
+priorities, so background work tails off as the budget runs low and
+commands can always use the last of it.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from homeassistant.util import dt
+
+from .const import RATE_LIMIT_BURST, RATE_LIMIT_PER_MINUTE
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_COMMAND = 0
+PRIORITY_STATUS = 1
+PRIORITY_POSITION = 2
+PRIORITY_HEALTH = 3
+PRIORITY_NAMES = {
+    PRIORITY_COMMAND: "command",
+    PRIORITY_STATUS: "status",
+    PRIORITY_POSITION: "position",
+    PRIORITY_HEALTH: "health",
+}
+
+# Share of the daily budget kept back from each priority
+BUDGET_RESERVE = {
+    PRIORITY_COMMAND: 0,
+    PRIORITY_STATUS: 0.1,
+    PRIORITY_POSITION: 0.25,
+    PRIORITY_HEALTH: 0.5,
+}
+
+
+class JLRRateLimitExceeded(Exception):
+    """Daily request budget used up for a priority"""
+
+
+class JLRRateLimiter:
+    """Token bucket and daily request budget for an account"""
+
+    def __init__(
+        self, daily_budget=0, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST
+    ):
+        self.daily_budget = daily_budget
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.day = dt.now().date()
+        self.used = {priority: 0 for priority in PRIORITY_NAMES}
+        self.waited = 0
+        self.rejected = 0
+        self.suspended = set()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer = None
+
+    @property
+    def used_today(self):
+        return sum(self.used.values())
+
+    @property
+    def remaining(self):
+        if not self.daily_budget:
+            return None
+        return max(self.daily_budget - self.used_today, 0)
+
+    def _roll_day(self):
+        today = dt.now().date()
+        if today != self.day:
+            self.day = today
+            self.used = {priority: 0 for priority in PRIORITY_NAMES}
+            if self.suspended:
+                _LOGGER.info("Daily request budget reset. Resuming all updates")
+            self.suspended.clear()
+
+    def allow(self, priority):
+        """Whether the daily budget has room for a request of this priority"""
+        self._roll_day()
+        if not self.daily_budget:
+            return True
+        allowed = self.remaining > self.daily_budget * BUDGET_RESERVE[priority]
+        if not allowed and priority not in self.suspended:
+            self.suspended.add(priority)
+            _LOGGER.warning(
+                "{} of {} daily api requests used. ".format(
+                    self.used_today, self.daily_budget
+                )
+                + "Pausing {} requests until tomorrow".format(
+                    PRIORITY_NAMES[priority]
+                )
+            )
+        return allowed
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def async_acquire(self, priority):
+        """Wait for a token. Raises JLRRateLimitExceeded if over budget."""
+        if not self.allow(priority):
+            self.rejected += 1
+            raise JLRRateLimitExceeded(
+                "Daily request budget of {} used for {} requests".format(
+                    self.daily_budget, PRIORITY_NAMES[priority]
+                )
+            )
+
+        self._refill()
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+        else:
+            self.waited += 1
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+            self._schedule()
+            await future
+        self.used[priority] += 1
+
+    def _schedule(self):
+        if self._timer or not self._waiters:
+            return
+        delay = max((1 - self.tokens) / self.rate, 0)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self):
+        """Hand out tokens to waiters, highest priority first"""
+        self._timer = None
+        self._refill()
+        while self._waiters and self.tokens >= 1:
+            future = heapq.heappop(self._waiters)[2]
+            # Skip waiters that were cancelled
+            if not future.done():
+                self.tokens -= 1
+                future.set_result(None)
+        self._schedule()
+
+    def cancel(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    def as_dict(self):
+        self._roll_day()
+        return {
+            "daily_budget": self.daily_budget or None,
+            "used_today": self.used_today,
+            "remaining_today": self.remaining,
+            "used_by_priority": {
+                PRIORITY_NAMES[priority]: used for priority, used in self.used.items()
+            },
+            "paused": sorted(PRIORITY_NAMES[priority] for priority in self.suspended),
+            "tokens": round(self.tokens, 1),
+            "waiting": len(self._waiters),
+            "requests_delayed": self.waited,
+            "requests_rejected": self.rejected,
+        }
@@ -0,0 +1,120 @@
+"""
+Circuit breaker for JLR InControl polling.
+
+After repeated failed updates the breaker opens and scheduled polling
+stops. It waits an exponentially increasing time, with jitter so many
+installs do not retry together, then lets a single probe update through.
+A successful probe closes the breaker, a failed one opens it again with a
+longer wait.
+"""
+import logging
+import random
+import time
+
+from homeassistant.util import dt
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+def backoff_delay(base, maximum, level):
+    """Exponential backoff with equal jitter"""
+    backoff = min(base * 2 ** level, maximum)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class JLRCircuitBreaker:
+    """Per account circuit breaker"""
+
+    def __init__(self, failure_threshold, backoff_base, backoff_max):
+        self.failure_threshold = failure_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.level = 0
+        self.trips = 0
+        self.rejected = 0
+        self.retry_at = None
+        self.opened_at = None
+        self.last_error = None
+        self.probe_in_flight = False
+
+    @property
+    def retry_in(self):
+        """Seconds until the next probe is allowed"""
+        if self.state != STATE_OPEN:
+            return 0
+        return max(self.retry_at - time.monotonic(), 0)
+
+    def allow_request(self):
+        """Whether a polling request may be made now"""
+        if self.state == STATE_CLOSED:
+            return True
+        # Allow for the probe timer firing slightly early
+        if self.state == STATE_OPEN and self.retry_in < 1:
+            self.state = STATE_HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == STATE_HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def cancel_probe(self):
+        """Probe ended without reaching the api"""
+        self.probe_in_flight = False
+
+    def record_success(self):
+        """Returns True if this closed the breaker"""
+        closed = self.state != STATE_CLOSED
+        if closed:
+            _LOGGER.info("JLR InControl api is available again. Resuming updates")
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.level = 0
+        self.retry_at = None
+        self.opened_at = None
+        self.probe_in_flight = False
+        return closed
+
+    def record_failure(self, error=None):
+        """Returns the seconds until the next probe if this opened the breaker"""
+        self.failures += 1
+        self.last_error = str(error) if error else None
+
+        if self.state == STATE_HALF_OPEN:
+            # Failed probe, wait longer next time
+            self.level += 1
+        elif self.state == STATE_OPEN or self.failures < self.failure_threshold:
+            return None
+
+        delay = backoff_delay(self.backoff_base, self.backoff_max, self.level)
+        if self.state == STATE_CLOSED:
+            self.trips += 1
+            self.opened_at = dt.utcnow()
+        self.state = STATE_OPEN
+        self.probe_in_flight = False
+        self.retry_at = time.monotonic() + delay
+        _LOGGER.warning(
+            "JLR InControl api has failed {} times. ".format(self.failures)
+            + "Pausing updates for {} seconds. Error is {}".format(
+                int(delay), self.last_error
+            )
+        )
+        return delay
+
+    def as_dict(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "backoff_level": self.level,
+            "retry_in": round(self.retry_in),
+            "opened_at": self.opened_at.isoformat() if self.opened_at else None,
+            "times_opened": self.trips,
+            "rejected_requests": self.rejected,
+            "last_error": self.last_error,
+        }
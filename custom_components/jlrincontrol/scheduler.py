@@ -0,0 +1,143 @@
+"""
+Priority request scheduler for JLR InControl.
+
+Api calls for an account run in a limited number of slots. Each call is
+queued in a lane and, when slots free up, waiting calls are started in
+lane order: interactive commands, command status monitoring, status
+polls, then bulk and background fetches. Polling lanes can never take the
+reserved slots, so a command starts straight away even when an update or
+health update is in progress.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from .const import SCHEDULER_RESERVED_SLOTS, SCHEDULER_SLOTS
+
+_LOGGER = logging.getLogger(__name__)
+
+LANE_COMMAND = 0
+LANE_MONITOR = 1
+LANE_STATUS = 2
+LANE_BACKGROUND = 3
+LANE_NAMES = {
+    LANE_COMMAND: "command",
+    LANE_MONITOR: "monitor",
+    LANE_STATUS: "status",
+    LANE_BACKGROUND: "background",
+}
+
+
+class LaneStats:
+    """Queue wait times for one lane"""
+
+    __slots__ = ["calls", "queued", "total_wait", "max_wait"]
+
+    def __init__(self):
+        self.calls = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait, queued):
+        self.calls += 1
+        self.queued += queued
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "queued": self.queued,
+            "avg_wait_ms": round(self.total_wait / self.calls * 1000, 1)
+            if self.calls
+            else None,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+
+class JLRRequestScheduler:
+    """Runs api calls for an account in priority order"""
+
+    def __init__(self, slots=SCHEDULER_SLOTS, reserved=SCHEDULER_RESERVED_SLOTS):
+        self.slots = slots
+        self.reserved = min(reserved, slots - 1)
+        self.active = 0
+        self.lanes = {lane: LaneStats() for lane in LANE_NAMES}
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _can_start(self, lane):
+        if lane <= LANE_MONITOR:
+            return self.active < self.slots
+        return self.active < self.slots - self.reserved
+
+    async def _async_acquire(self, lane):
+        """Returns True if the call had to queue"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._seq), future))
+        self._start_waiting()
+        if future.done():
+            return False
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Given a slot just as we were cancelled
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        return True
+
+    def _start_waiting(self):
+        while self._waiters:
+            lane, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            # Lower lanes cannot start if the first waiting lane cannot
+            if not self._can_start(lane):
+                break
+            heapq.heappop(self._waiters)
+            self.active += 1
+            future.set_result(None)
+
+    def _release(self):
+        self.active -= 1
+        self._start_waiting()
+
+    @asynccontextmanager
+    async def slot(self, lane):
+        """Wait for a slot in a lane"""
+        start = time.perf_counter()
+        queued = await self._async_acquire(lane)
+        self.lanes[lane].record(time.perf_counter() - start, queued)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def cancel(self):
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    def as_dict(self):
+        return {
+            "slots": self.slots,
+            "reserved_slots": self.reserved,
+            "active": self.active,
+            "waiting": {
+                name: sum(
+                    1
+                    for lane, _, future in self._waiters
+                    if lane == key and not future.done()
+                )
+                for key, name in LANE_NAMES.items()
+            },
+            "lanes": {
+                LANE_NAMES[lane]: stats.as_dict() for lane, stats in self.lanes.items()
+            },
+        }
@@ -8,11 +8,13 @@ from homeassistant.const import (
     UnitOfLength,
     UnitOfPressure,
 )
+from homeassistant.core import callback
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers import icon
-from homeassistant.util import dt, unit_conversion
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.util import dt
 from .const import (
     DOMAIN,
-    DATA_ATTRS_CAR_INFO,
     DATA_ATTRS_TYRE_STATUS,
     DATA_ATTRS_TYRE_PRESSURE,
     DATA_ATTRS_WINDOW_STATUS,
@@ -25,9 +27,15 @@ from .const import (
     JLR_CHARGE_STATUS_TO_HA,
     JLR_DATA,
     SERVICE_STATUS_OK,
+    SIGNAL_API_STATUS_UPDATED,
+    SIGNAL_TRIPS_UPDATED,
+    SIGNAL_VEHICLES_ADDED,
+    CONF_ALL_DATA_SENSOR,
+    CONF_ENERGY_PRICE,
+    CONF_FUEL_PRICE,
 )
 from .entity import JLREntity
-from .config_flow import CONF_ALL_DATA_SENSOR
+from .util import async_import_module, convert_fuel_consumption
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -35,41 +43,53 @@ _LOGGER = logging.getLogger(__name__)
 async def async_setup_entry(hass, config_entry, async_add_entities):
     data = hass.data[DOMAIN][config_entry.entry_id][JLR_DATA]
 
-    devices = []
-    _LOGGER.debug("Loading Sensors")
+    @callback
+    def async_add_vehicles(vins):
+        devices = []
+        _LOGGER.debug("Loading Sensors")
 
-    for vehicle in data.vehicles:
-        _LOGGER.debug(
-            "Setting Up Sensors for - {}".format(
-                data.vehicles[vehicle].attributes.get("nickname")
+        for vehicle in vins:
+            _LOGGER.debug(
+                "Setting Up Sensors for - {}".format(
+                    data.vehicles[vehicle].attributes.get("nickname")
+                )
             )
-        )
 
-        devices.append(JLRVehicleSensor(hass, data, vehicle))
-        devices.append(JLRVehicleWindowSensor(hass, data, vehicle))
-        devices.append(JLRVehicleAlarmSensor(hass, data, vehicle))
-        devices.append(JLRVehicleTyreSensor(hass, data, vehicle))
-        devices.append(JLRVehicleServiceSensor(hass, data, vehicle))
-        devices.append(JLRVehicleRangeSensor(hass, data, vehicle))
-        devices.append(JLRVehicleStatusSensor(hass, data, vehicle))
-
-        if config_entry.options.get(CONF_ALL_DATA_SENSOR):
-            devices.append(JLRVehicleAllDataSensor(hass, data, vehicle))
-
-        # If EV/PHEV show Battery Sensor
-        if data.vehicles[vehicle].engine_type in [FUEL_TYPE_BATTERY, FUEL_TYPE_HYBRID]:
-            devices.append(JLREVBatterySensor(hass, data, vehicle))
+            devices.append(JLRVehicleSensor(hass, data, vehicle))
+            devices.append(JLRVehicleWindowSensor(hass, data, vehicle))
+            devices.append(JLRVehicleAlarmSensor(hass, data, vehicle))
+            devices.append(JLRVehicleTyreSensor(hass, data, vehicle))
+            devices.append(JLRVehicleServiceSensor(hass, data, vehicle))
+            devices.append(JLRVehicleRangeSensor(hass, data, vehicle))
+            devices.append(JLRVehicleStatusSensor(hass, data, vehicle))
+            devices.append(JLRApiMetricsSensor(hass, data, vehicle))
+            devices.append(JLRApiStatusSensor(hass, data, vehicle))
+
+            if config_entry.options.get(CONF_ALL_DATA_SENSOR):
+                devices.append(JLRVehicleAllDataSensor(hass, data, vehicle))
+
+            # If EV/PHEV show Battery Sensor
+            if data.vehicles[vehicle].engine_type in [FUEL_TYPE_BATTERY, FUEL_TYPE_HYBRID]:
+                devices.append(JLREVBatterySensor(hass, data, vehicle))
+
+            # Show last trip sensor is privacy mode off and data exists
+            if data.vehicles[vehicle].last_trip:
+                devices.append(JLRVehicleLastTripSensor(hass, data, vehicle))
+                devices.append(JLRVehicleTripAnalyticsSensor(hass, data, vehicle))
+            else:
+                _LOGGER.debug(
+                    f"Not loading Last Trip sensor for {data.vehicles[vehicle].attributes.get('nickname')} due to privacy mode or no data"
+                )
 
-        # Show last trip sensor is privacy mode off and data exists
-        if data.vehicles[vehicle].last_trip:
-            devices.append(JLRVehicleLastTripSensor(hass, data, vehicle))
-        else:
-            _LOGGER.debug(
-                f"Not loading Last Trip sensor for {data.vehicles[vehicle].attributes.get('nickname')} due to privacy mode or no data"
-            )
+        async_add_entities(devices, True)
 
-    data.entities.extend(devices)
-    async_add_entities(devices, True)
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            SIGNAL_VEHICLES_ADDED.format(config_entry.entry_id),
+            async_add_vehicles,
+        )
+    )
 
 
 class JLRVehicleAllDataSensor(JLREntity):
@@ -137,13 +157,9 @@ class JLRVehicleSensor(JLREntity):
 
     @property
     def extra_state_attributes(self):
-        a = self._vehicle.attributes
         attrs = {}
         attrs["Engine Type"] = self._engine_type
-
-        for k, v in DATA_ATTRS_CAR_INFO.items():
-            if a.get(v):
-                attrs[k.title()] = a.get(v)
+        attrs.update(self.profile.car_info)
 
         attrs["Odometer"] = self.get_odometer(self._vehicle)
 
@@ -198,19 +214,12 @@ class JLRVehicleTyreSensor(JLREntity):
                     tyre_pressure = tyre_pressure / 10
 
                 # Convert to local units - metric = bar, imperial = psi
-                if self._units == UnitOfPressure.BAR:
-                    attrs[
-                        k.title() + " Pressure ({})".format(self._units)
-                    ] = round(tyre_pressure / 100, 2)
-                else:
-                    attrs[
-                        k.title() + " Pressure ({})".format(self._units)
-                    ] = round(
-                        unit_conversion.PressureConverter.convert(
-                            tyre_pressure * 1000, UnitOfPressure.PA, self._units
-                        ),
-                        1,
-                    )
+                attrs[
+                    k.title() + " Pressure ({})".format(self._units)
+                ] = round(
+                    self.profile.convert_pressure(tyre_pressure),
+                    2 if self._units == UnitOfPressure.BAR else 1,
+                )
 
         return attrs
 
@@ -337,10 +346,8 @@ class JLRVehicleRangeSensor(JLREntity):
             )
         # Fuel only
         return round(
-            unit_conversion.DistanceConverter.convert(
-                int(self._vehicle.status.get("DISTANCE_TO_EMPTY_FUEL")),
-                UnitOfLength.KILOMETERS,
-                self._units,
+            self.profile.convert_distance(
+                int(self._vehicle.status.get("DISTANCE_TO_EMPTY_FUEL"))
             )
         )
 
@@ -366,10 +373,9 @@ class JLRVehicleRangeSensor(JLREntity):
             )
         # If hybrid
         if self._engine_type == FUEL_TYPE_HYBRID:
-            attrs["Fuel Range"] = round(unit_conversion.DistanceConverter.convert(
-                int(self._vehicle.status.get("DISTANCE_TO_EMPTY_FUEL")),
-                UnitOfLength.KILOMETERS,
-                self._units,
+            attrs["Fuel Range"] = round(
+                self.profile.convert_distance(
+                    int(self._vehicle.status.get("DISTANCE_TO_EMPTY_FUEL"))
                 )
             )
 
@@ -484,14 +490,13 @@ class JLRVehicleLastTripSensor(JLREntity):
             "tripDetails"
         ):
             return round(
-                unit_conversion.DistanceConverter.convert(
+                self.profile.convert_distance(
                     int(
                         self._vehicle.last_trip.get("tripDetails", "{}").get(
                             "distance"
                         )
                     ),
                     UnitOfLength.METERS,
-                    self._units,
                 )
             )
         else:
@@ -528,11 +533,7 @@ class JLRVehicleLastTripSensor(JLREntity):
                 if t.get("totalEcoScore"):
                     attrs["eco_score"] = t.get("totalEcoScore").get("score",0)
                 attrs["average_speed"] = round(
-                    unit_conversion.DistanceConverter.convert(
-                        int(t.get("averageSpeed",0)),
-                        UnitOfLength.KILOMETERS,
-                        self._units,
-                    )
+                    self.profile.convert_distance(int(t.get("averageSpeed", 0)))
                 )
 
                 if self._fuel == FUEL_TYPE_BATTERY:
@@ -543,18 +544,76 @@ class JLRVehicleLastTripSensor(JLREntity):
                         avg_consumption, 1
                     )
                 else:
-                    if self._units == UnitOfLength.KILOMETERS:
-                        attrs["average_consumption"] = round(
-                            t.get("averageFuelConsumption",0), 1
-                        )
-                    else:
-                        attrs["average_consumption"] = round(
-                            int(t.get("averageFuelConsumption",0)) * 2.35215, 1
-                        )
+                    attrs["average_consumption"] = round(
+                        convert_fuel_consumption(
+                            t.get("averageFuelConsumption", 0), self._units
+                        ),
+                        1,
+                    )
 
             return attrs
 
 
+class JLRVehicleTripAnalyticsSensor(JLREntity):
+    def __init__(self, hass, data, vin):
+        self._sensor_name = "trip efficiency"
+        super().__init__(hass, data, vin)
+        self._units = self.get_distance_units()
+        self._icon = "mdi:chart-line"
+        self._analytics = None
+
+    async def async_added_to_hass(self):
+        """Also recalculate the analytics when new trips are received"""
+        await super().async_added_to_hass()
+        # NumPy is only loaded once there is a trip analytics sensor
+        analytics = await async_import_module(self._hass, "analytics")
+        price = self._data.config_entry.options.get(
+            CONF_ENERGY_PRICE
+            if self._fuel == FUEL_TYPE_BATTERY
+            else CONF_FUEL_PRICE
+        )
+        self._analytics = analytics.JLRTripAnalytics(
+            self._hass, self._data.trip_stores[self._vin], self._units, self._fuel, price
+        )
+
+        async def async_trips_updated(vin):
+            """Recalculate analytics when trips are added."""
+            if vin == self._vin:
+                await self._analytics.async_refresh()
+                self.async_write_budgeted_state()
+
+        await self._analytics.async_refresh()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self._hass, SIGNAL_TRIPS_UPDATED, async_trips_updated
+            )
+        )
+
+    @property
+    def state(self):
+        if self._analytics and self._analytics.results:
+            return self._analytics.results.get("rolling_consumption")
+        return None
+
+    @property
+    def unit_of_measurement(self):
+        if self._fuel == FUEL_TYPE_BATTERY:
+            return "kWh/100km"
+        if self._units == UnitOfLength.KILOMETERS:
+            return "L/100km"
+        return "mpg"
+
+    @property
+    def extra_state_attributes(self):
+        attrs = {}
+        if self._analytics and self._analytics.results:
+            for k, v in self._analytics.results.items():
+                if v is not None:
+                    attrs[k] = v
+            attrs["distance_unit"] = self._units
+        return attrs
+
+
 class JLRVehicleStatusSensor(JLREntity):
     def __init__(self, hass, data, vin):
         self._sensor_name = "status"
@@ -574,3 +633,78 @@ class JLRVehicleStatusSensor(JLREntity):
     def extra_state_attributes(self):
         attrs = {}
         return attrs
+
+
+class JLRApiMetricsSensor(JLREntity):
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass, data, vin):
+        self._sensor_name = "api calls"
+        super().__init__(hass, data, vin)
+        self._icon = "mdi:api"
+
+    @property
+    def available(self):
+        """Api figures stay current when the vehicle data is old"""
+        return True
+
+    @property
+    def state(self):
+        return self._data.transport.metrics.calls_today(self._vin)
+
+    @property
+    def unit_of_measurement(self):
+        return "calls"
+
+    @property
+    def extra_state_attributes(self):
+        metrics = self._data.transport.metrics
+        attrs = {}
+        attrs["errors_today"] = metrics.errors_today(self._vin)
+        attrs["account_calls_today"] = metrics.calls_today()
+        for endpoint, m in sorted(metrics.summary(self._vin).items()):
+            attrs[endpoint] = {
+                "calls_today": m.calls_today,
+                "errors_today": m.errors_today,
+                "avg_ms": round(m.total_time / m.calls * 1000) if m.calls else None,
+                "p95_ms": round(m.percentile(95) * 1000) if m.calls else None,
+            }
+        return attrs
+
+
+class JLRApiStatusSensor(JLREntity):
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass, data, vin):
+        self._sensor_name = "api status"
+        super().__init__(hass, data, vin)
+        self._icon = "mdi:api"
+
+    @property
+    def available(self):
+        """Api figures stay current when the vehicle data is old"""
+        return True
+
+    async def async_added_to_hass(self):
+        """Also update when the circuit breaker changes state"""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self._hass,
+                SIGNAL_API_STATUS_UPDATED,
+                self.async_write_budgeted_state,
+            )
+        )
+
+    @property
+    def state(self):
+        return self._data.breaker.state
+
+    @property
+    def extra_state_attributes(self):
+        attrs = self._data.breaker.as_dict()
+        attrs.pop("state")
+        attrs["api_threads_busy"] = self._data.executor.running
+        attrs["api_calls_queued"] = self._data.executor.queued
+        attrs["api_timeouts"] = self._data.executor.timeouts
+        return attrs
@@ -1,10 +1,13 @@
 import inspect
 import logging
 import asyncio
+import time
 from urllib import error
 from functools import partial
 
 from .const import DOMAIN, JLR_DATA
+from .ratelimit import PRIORITY_COMMAND
+from .scheduler import LANE_MONITOR
 from .util import convert_temp_value, field_mask
 
 _LOGGER = logging.getLogger(__name__)
@@ -15,11 +18,18 @@ class JLRService:
         self.hass = hass
         self.data = hass.data[DOMAIN][config_entry.entry_id][JLR_DATA]
         self.vin = vin
-        self.vehicle = self.data.vehicles[vin]
         self.service_code = None
         self.service_name = None
         self.attributes = self.vehicle.attributes
         self.nickname = self.attributes.get("nickname")
+        self.priority = PRIORITY_COMMAND
+        # One service call at a time per vehicle
+        self._lock = asyncio.Lock()
+
+    @property
+    def vehicle(self):
+        # Replaced when a restored vehicle is connected
+        return self.data.vehicles[self.vin]
 
     async def validate_service_call(self):
         if self.service_code and self.service_name:
@@ -52,91 +62,157 @@ class JLRService:
             )
         return False
 
-    async def async_call_service(self, **kwargs):
+    async def async_call_service(
+        self, on_accepted=None, priority=PRIORITY_COMMAND, **kwargs
+    ):
+        """Call a service and wait for the result"""
+        if not self.data.connection:
+            _LOGGER.error(
+                "Unable to call {} on vehicle {}. ".format(
+                    kwargs.get("service_name"), self.nickname
+                )
+                + "Not connected to JLR InControl"
+            )
+            return None
+        async with self._lock:
+            self.priority = priority
+            try:
+                return await self._async_call_service(on_accepted, **kwargs)
+            finally:
+                # The command may have changed the vehicle so drop cached reads
+                if self.data.transport.cache:
+                    self.data.transport.cache.invalidate(self.vin)
+
+    async def async_run_sequence(self, steps):
+        """
+        Call services one after another, checking for pending calls once.
+
+        Steps are the kwargs for each service call, already checked as
+        available on the vehicle. Stops at the first step that fails.
+        Returns the status and duration of each step run, and an error if
+        the sequence could not be run at all.
+        """
+        if not self.data.connection:
+            error = (
+                "Unable to run sequence on vehicle {}. ".format(self.nickname)
+                + "Not connected to JLR InControl"
+            )
+            _LOGGER.error(error)
+            return [], error
+        async with self._lock:
+            self.priority = PRIORITY_COMMAND
+            try:
+                if await self.async_get_services(
+                    [step.get("service_code") for step in steps]
+                ):
+                    error = (
+                        "Error running sequence on vehicle {}. ".format(
+                            self.nickname
+                        )
+                        + "Another request is still processing. "
+                        + "Please try again later."
+                    )
+                    _LOGGER.error(error)
+                    return [], error
+
+                results = []
+                for step in steps:
+                    self.service_code = step.get("service_code")
+                    self.service_name = step.get("service_name")
+                    start = time.monotonic()
+                    status = await self._async_send_service(None, **step)
+                    results.append((status, time.monotonic() - start))
+                    if status != "Successful":
+                        break
+                return results, None
+            finally:
+                if self.data.transport.cache:
+                    self.data.transport.cache.invalidate(self.vin)
+
+    async def _async_call_service(self, on_accepted, **kwargs):
         self.service_code = kwargs.get("service_code")
         self.service_name = kwargs.get("service_name")
 
         if await self.validate_service_call():
-            service_kwargs = {}
-
-            # populate required parameters for service call
-            service = getattr(self.vehicle, self.service_name)
-            for param in inspect.signature(service).parameters:
-                if param in ["target_value", "target_temp"]:
-                    # convert temp values to car requirements
-                    service_kwargs[param] = convert_temp_value(
-                        self.hass.config.units.temperature_unit,
-                        self.service_code,
-                        kwargs.get(param),
-                    )
-                else:
-                    service_kwargs[param] = kwargs.get(param)
-
-            # Call service
-            try:
-                status = await self.hass.async_add_executor_job(
-                    partial(service, **service_kwargs)
+            return await self._async_send_service(on_accepted, **kwargs)
+        else:
+            _LOGGER.error(
+                "Error calling service {}.  Invalid parameters".format(
+                    self.service_name
                 )
-                _LOGGER.info(
-                    "Service {} called on vehicle {}. ".format(
-                        self.service_name, self.nickname,
-                    )
-                    + "Awaiting feedback on success."
+            )
+
+    async def _async_send_service(self, on_accepted, **kwargs):
+        """Send a validated service call and wait for the result"""
+        service_kwargs = {}
+
+        # populate required parameters for service call
+        service = getattr(self.vehicle, self.service_name)
+        for param in inspect.signature(service).parameters:
+            if param in ["target_value", "target_temp"]:
+                # convert temp values to car requirements
+                service_kwargs[param] = convert_temp_value(
+                    self.hass.config.units.temperature_unit,
+                    self.service_code,
+                    kwargs.get(param),
                 )
-                # monitor service for success / failure
-                monitor_status = await self.async_monitor_service_call(
-                    status.get("customerServiceId")
+            else:
+                service_kwargs[param] = kwargs.get(param)
+
+        # Call service
+        try:
+            status = await self.data.transport.async_call(
+                partial(service, **service_kwargs), priority=self.priority
+            )
+            _LOGGER.info(
+                "Service {} called on vehicle {}. ".format(
+                    self.service_name, self.nickname,
                 )
+                + "Awaiting feedback on success."
+            )
+            # Let the caller show the expected result straight away
+            if on_accepted:
+                on_accepted()
+            # monitor service for success / failure
+            monitor_status = await self.async_monitor_service_call(
+                status.get("customerServiceId")
+            )
 
-                return monitor_status
+            return monitor_status
 
-            except error.HTTPError as ex:
-                if ex.code == 401:
-                    _LOGGER.warning(
-                        "Service: {} on vehicle {} ".format(
-                            self.service_name, self.nickname,
-                        )
-                        + "- not authorised error. Is your pin correct?"
-                    )
-                else:
-                    _LOGGER.error(
-                        "Error calling service {} on vehicle {}. ".format(
-                            self.service_name, self.nickname
-                        )
-                        + "Error is {}".format(ex.msg)
+        except error.HTTPError as ex:
+            if ex.code == 401:
+                _LOGGER.warning(
+                    "Service: {} on vehicle {} ".format(
+                        self.service_name, self.nickname,
                     )
-
-            except Exception as ex:
+                    + "- not authorised error. Is your pin correct?"
+                )
+            else:
                 _LOGGER.error(
                     "Error calling service {} on vehicle {}. ".format(
                         self.service_name, self.nickname
                     )
-                    + "Error is {}".format(ex)
+                    + "Error is {}".format(ex.msg)
                 )
-        else:
+
+        except Exception as ex:
             _LOGGER.error(
-                "Error calling service {}.  Invalid parameters".format(
-                    self.service_name
+                "Error calling service {} on vehicle {}. ".format(
+                    self.service_name, self.nickname
                 )
+                + "Error is {}".format(ex)
             )
 
     def check_service_enabled(self, service_code):
         """Check service code is capable and enabled"""
-        if service_code == "NA":
-            return True
-        else:
-            for service in self.attributes.get("availableServices"):
-                if service.get("serviceType") == service_code:
-                    if service.get("vehicleCapable") and service.get(
-                        "serviceEnabled"
-                    ):
-                        return True
-        return False
+        return self.vehicle.profile.supports(service_code)
 
-    async def async_get_services(self):
+    async def async_get_services(self, service_codes=None):
         """Check for any exisitng queued service calls to vehicle"""
-        services = await self.hass.async_add_executor_job(
-            self.vehicle.get_services
+        service_codes = service_codes or [self.service_code]
+        services = await self.data.transport.async_call(
+            self.vehicle.get_services, priority=self.priority
         )
         if services:
             services = services.get("services")
@@ -148,11 +224,13 @@ class JLRService:
                 # Check service to see if matched to this service call
                 # TODO: need to test for equivalents like RDL and RDU
                 try:
-                    status = await self.hass.async_add_executor_job(
-                        partial(self.vehicle.get_service_status, service_id)
+                    status = await self.data.transport.async_call(
+                        self.vehicle.get_service_status,
+                        service_id,
+                        priority=self.priority,
                     )
                     if status:
-                        if status.get("serviceType") == self.service_code:
+                        if status.get("serviceType") in service_codes:
                             return True
                 except Exception:
                     pass
@@ -164,8 +242,11 @@ class JLRService:
 
     async def async_check_service_status(self, service_id):
         """Get status of current service call"""
-        return await self.hass.async_add_executor_job(
-            self.vehicle.get_service_status, service_id
+        return await self.data.transport.async_call(
+            self.vehicle.get_service_status,
+            service_id,
+            priority=self.priority,
+            lane=LANE_MONITOR if self.priority == PRIORITY_COMMAND else None,
         )
 
     async def async_monitor_service_call(self, service_id):
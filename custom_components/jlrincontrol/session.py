@@ -0,0 +1,81 @@
+"""
+Api session for JLR InControl.
+
+Each config entry has its own session, holding the jlrpy connection, the
+account rate limiter, the response cache and the thread pool and
+scheduler used for api calls. Only one entry can be set up per account,
+so every per vehicle store has one owner. The session is closed when its
+entry is unloaded.
+"""
+import asyncio
+import logging
+from functools import partial
+
+from homeassistant.const import CONF_USERNAME
+
+from .const import (
+    API_CONNECT_TIMEOUT,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTLS,
+    CONF_API_THREADS,
+    CONF_DAILY_REQUEST_BUDGET,
+    CONF_USE_CHINA_SERVERS,
+    DEFAULT_API_THREADS,
+    DEFAULT_DAILY_REQUEST_BUDGET,
+)
+from .cache import JLRResponseCache
+from .executor import JLRExecutor
+from .ratelimit import JLRRateLimiter
+from .scheduler import JLRRequestScheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def connect(email, password, use_china_servers):
+    """Log in to JLR InControl. Run in a thread, it imports jlrpy."""
+    import jlrpy
+
+    return jlrpy.Connection(email, password, "", "", use_china_servers)
+
+
+class JLRSession:
+    """Connection, limits and cache for a config entry's account"""
+
+    def __init__(self, config_entry):
+        self.email = config_entry.data.get(CONF_USERNAME)
+        self.use_china_servers = bool(
+            config_entry.data.get(CONF_USE_CHINA_SERVERS)
+        )
+        self.connection = None
+        options = config_entry.options
+        threads = options.get(CONF_API_THREADS, DEFAULT_API_THREADS)
+        self.limiter = JLRRateLimiter(
+            options.get(CONF_DAILY_REQUEST_BUDGET, DEFAULT_DAILY_REQUEST_BUDGET)
+        )
+        self.executor = JLRExecutor(threads)
+        self.scheduler = JLRRequestScheduler(threads)
+        self.cache = JLRResponseCache(CACHE_TTLS, CACHE_MAX_ENTRIES)
+        self._connect_lock = asyncio.Lock()
+
+    async def async_connect(self, transport, password):
+        """Log in once, reusing the connection on later calls"""
+        async with self._connect_lock:
+            if self.connection is None:
+                self.connection = await transport.async_call(
+                    partial(connect, self.email, password, self.use_china_servers),
+                    endpoint="connect",
+                    timeout=API_CONNECT_TIMEOUT,
+                )
+            else:
+                _LOGGER.debug("Using existing connection to JLR InControl")
+        return self.connection
+
+    def close(self):
+        self.limiter.cancel()
+        self.scheduler.cancel()
+        self.executor.shutdown()
+
+    def as_dict(self):
+        return {
+            "connected": self.connection is not None,
+        }
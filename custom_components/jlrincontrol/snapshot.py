@@ -0,0 +1,81 @@
+"""
+Last known vehicle data for JLR InControl.
+
+The data from each successful update is kept in HA storage. On startup the
+vehicles are restored from it before connecting, so their entities show
+the last known state while the InControl servers are slow or down. The
+snapshot vehicles stand in for jlrpy vehicles until the connection is made.
+"""
+import logging
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt
+
+from .const import SNAPSHOT_SAVE_DELAY, SNAPSHOT_STORE, SNAPSHOT_VERSION
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = [
+    "attributes",
+    "status",
+    "status_ev",
+    "position",
+    "last_trip",
+    "engine_type",
+]
+
+
+class JLRSnapshotVehicle(dict):
+    """Stands in for a jlrpy vehicle with its last known data"""
+
+    def __init__(self, vin, data):
+        super().__init__(vin=vin)
+        self.vin = vin
+        self.attributes = data.get("attributes") or {}
+        self.status = data.get("status") or {}
+        self.status_ev = data.get("status_ev") or {}
+        self.position = data.get("position")
+        self.last_trip = data.get("last_trip")
+        self.engine_type = data.get("engine_type")
+
+
+class JLRSnapshot:
+    """Saved vehicle data for a config entry"""
+
+    def __init__(self, hass, entry_id):
+        self._store = Store(hass, SNAPSHOT_VERSION, SNAPSHOT_STORE.format(entry_id))
+        self.vehicles = {}
+
+    async def async_load(self):
+        """Snapshot vehicles and when their data was received"""
+        try:
+            self.vehicles = (await self._store.async_load() or {}).get("vehicles", {})
+        except Exception as ex:
+            _LOGGER.warning("Unable to load last vehicle data. {}".format(ex))
+            self.vehicles = {}
+
+        restored = {}
+        for vin, data in self.vehicles.items():
+            received = dt.parse_datetime(data.get("received") or "")
+            if not data.get("attributes") or not received:
+                continue
+            restored[vin] = (JLRSnapshotVehicle(vin, data), received)
+            _LOGGER.debug(
+                "Restored data for {} from {}".format(
+                    field_mask(vin, 3, 2), dt.as_local(received).isoformat()
+                )
+            )
+        return restored
+
+    @callback
+    def async_update(self, vehicle, received):
+        """Record a vehicle's data and save it shortly"""
+        data = {field: getattr(vehicle, field, None) for field in SNAPSHOT_FIELDS}
+        data["received"] = received.isoformat()
+        self.vehicles[vehicle.vin] = data
+        self._store.async_delay_save(self._data, SNAPSHOT_SAVE_DELAY)
+
+    def _data(self):
+        return {"vehicles": self.vehicles}
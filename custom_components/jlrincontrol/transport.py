@@ -0,0 +1,135 @@
+"""
+Api transport for JLR InControl.
+
+All blocking jlrpy calls go through JLRTransport. It answers repeat reads
+from the response cache, waits for a scheduler slot and the account rate
+limiter, runs calls in the integration thread pool, records their timing
+against the endpoint and vehicle, and writes them to a capture journal if
+one is set.
+"""
+import logging
+import time
+from contextlib import nullcontext
+from functools import partial
+
+from .instrumentation import JLRApiMetrics
+from .ratelimit import (
+    PRIORITY_COMMAND,
+    PRIORITY_HEALTH,
+    PRIORITY_POSITION,
+    PRIORITY_STATUS,
+)
+from .scheduler import LANE_BACKGROUND, LANE_COMMAND, LANE_STATUS
+
+_LOGGER = logging.getLogger(__name__)
+
+# Scheduler lane for calls that do not give one
+PRIORITY_LANES = {
+    PRIORITY_COMMAND: LANE_COMMAND,
+    PRIORITY_STATUS: LANE_STATUS,
+    PRIORITY_POSITION: LANE_BACKGROUND,
+    PRIORITY_HEALTH: LANE_BACKGROUND,
+}
+
+
+def endpoint_name(func):
+    """Name of the jlrpy method being called"""
+    while isinstance(func, partial):
+        func = func.func
+    return getattr(func, "__name__", str(func))
+
+
+def endpoint_vin(func):
+    """Vin of the vehicle a jlrpy method is bound to, if any"""
+    while isinstance(func, partial):
+        func = func.func
+    return getattr(getattr(func, "__self__", None), "vin", None)
+
+
+def call_arguments(func, args):
+    """Positional and keyword arguments of a call, including partials"""
+    kwargs = {}
+    while isinstance(func, partial):
+        args = func.args + tuple(args)
+        kwargs = {**func.keywords, **kwargs}
+        func = func.func
+    return {"args": list(args), "kwargs": kwargs}
+
+
+class JLRTransport:
+    """Runs api calls in the executor and instruments them"""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.metrics = JLRApiMetrics()
+        self.journal = None
+        self.limiter = None
+        self.scheduler = None
+        self.executor = None
+        self.cache = None
+
+    async def async_call(
+        self,
+        func,
+        *args,
+        endpoint=None,
+        vin=None,
+        priority=PRIORITY_STATUS,
+        lane=None,
+        timeout=None,
+    ):
+        """Call a blocking jlrpy method"""
+        endpoint = endpoint or endpoint_name(func)
+        vin = vin or endpoint_vin(func)
+        if lane is None:
+            lane = PRIORITY_LANES[priority]
+        call = partial(
+            self._async_scheduled_call,
+            func,
+            args,
+            endpoint,
+            vin,
+            priority,
+            lane,
+            timeout,
+        )
+        if self.cache and self.cache.cacheable(endpoint):
+            key = (endpoint, vin, repr(call_arguments(func, args)))
+            return await self.cache.async_get(key, call)
+        return await call()
+
+    async def _async_scheduled_call(
+        self, func, args, endpoint, vin, priority, lane, timeout
+    ):
+        slot = self.scheduler.slot(lane) if self.scheduler else nullcontext()
+        async with slot:
+            return await self._async_call(
+                func, args, endpoint, vin, priority, timeout
+            )
+
+    async def _run(self, func, args, timeout):
+        if self.executor:
+            return await self.executor.async_run(func, *args, timeout=timeout)
+        return await self.hass.async_add_executor_job(func, *args)
+
+    async def _async_call(self, func, args, endpoint, vin, priority, timeout):
+        if self.limiter:
+            await self.limiter.async_acquire(priority)
+        start = time.perf_counter()
+        try:
+            result = await self._run(func, args, timeout)
+        except Exception as ex:
+            elapsed = time.perf_counter() - start
+            self.metrics.record(endpoint, vin, elapsed, ex)
+            if self.journal:
+                self.journal.record(
+                    endpoint, vin, call_arguments(func, args), elapsed, error=ex
+                )
+            raise
+        elapsed = time.perf_counter() - start
+        self.metrics.record(endpoint, vin, elapsed)
+        if self.journal:
+            self.journal.record(
+                endpoint, vin, call_arguments(func, args), elapsed, result
+            )
+        return result
@@ -0,0 +1,327 @@
+"""
+Local trip history store for JLR InControl.
+
+Trips are kept in a SQLite database in the HA storage directory so that
+history queries and aggregates never need to go back to the InControl API.
+The store is synced incrementally by trip id on each update. The full
+history is only fetched once per vehicle, which is recorded so a vehicle
+with no trips does not fetch it again on every update.
+"""
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import dt
+
+from .const import (
+    TRIP_DB_FILE,
+    TRIP_PERIODS,
+    TRIP_SYNC_BATCH,
+    TRIP_SYNC_MAX,
+)
+from .ratelimit import PRIORITY_POSITION
+from .util import field_mask
+
+_LOGGER = logging.getLogger(__name__)
+
+# All stores share one database file, so serialise writes across them
+_DB_LOCK = threading.Lock()
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS trips (
+        vin TEXT NOT NULL,
+        trip_id TEXT NOT NULL,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER,
+        distance REAL NOT NULL DEFAULT 0,
+        average_speed REAL,
+        fuel_consumption REAL,
+        energy_consumption REAL,
+        eco_score REAL,
+        start_latitude REAL,
+        start_longitude REAL,
+        start_address TEXT,
+        end_latitude REAL,
+        end_longitude REAL,
+        end_address TEXT,
+        raw TEXT,
+        PRIMARY KEY (vin, trip_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_trips_start ON trips (vin, start_ts)",
+    "CREATE INDEX IF NOT EXISTS idx_trips_distance ON trips (vin, distance)",
+    """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        vin TEXT PRIMARY KEY,
+        backfilled_ts INTEGER NOT NULL
+    )
+    """,
+]
+
+TRIP_COLUMNS = [
+    "trip_id",
+    "start_ts",
+    "end_ts",
+    "distance",
+    "average_speed",
+    "fuel_consumption",
+    "energy_consumption",
+    "eco_score",
+    "start_latitude",
+    "start_longitude",
+    "start_address",
+    "end_latitude",
+    "end_longitude",
+    "end_address",
+]
+
+# strftime formats used to bucket trips by period
+PERIOD_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+
+
+def _to_timestamp(value):
+    """Convert an InControl time string to a unix timestamp"""
+    if not value:
+        return None
+    parsed = dt.parse_datetime(value)
+    if parsed is None:
+        return None
+    return int(dt.as_timestamp(parsed))
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def trip_to_row(vin, trip):
+    """Flatten an InControl trip into a database row"""
+    t = trip.get("tripDetails") or {}
+    start = t.get("startPosition") or {}
+    end = t.get("endPosition") or {}
+    eco = t.get("totalEcoScore") or {}
+    return (
+        vin,
+        str(trip.get("id")),
+        _to_timestamp(t.get("startTime")) or 0,
+        _to_timestamp(t.get("endTime")),
+        _to_float(t.get("distance")) or 0,
+        _to_float(t.get("averageSpeed")),
+        _to_float(t.get("averageFuelConsumption")),
+        _to_float(t.get("averageEnergyConsumption")),
+        _to_float(eco.get("score")),
+        _to_float(start.get("latitude")),
+        _to_float(start.get("longitude")),
+        start.get("address"),
+        _to_float(end.get("latitude")),
+        _to_float(end.get("longitude")),
+        end.get("address"),
+        json.dumps(trip),
+    )
+
+
+class JLRTripStore:
+    """SQLite backed trip history for a single vehicle"""
+
+    def __init__(self, hass, vin, transport):
+        self.hass = hass
+        self.vin = vin
+        self.transport = transport
+        self.path = hass.config.path(STORAGE_DIR, TRIP_DB_FILE)
+        self.trip_count = 0
+        self.backfilled = False
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _setup(self):
+        with _DB_LOCK, self._connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            count = conn.execute(
+                "SELECT COUNT(*) FROM trips WHERE vin = ?", (self.vin,)
+            ).fetchone()[0]
+            backfilled = conn.execute(
+                "SELECT 1 FROM sync_state WHERE vin = ?", (self.vin,)
+            ).fetchone()
+            return count, backfilled is not None
+
+    async def async_setup(self):
+        """Create schema if needed and load stored trip count"""
+        self.trip_count, self.backfilled = await self.hass.async_add_executor_job(
+            self._setup
+        )
+        _LOGGER.debug(
+            "Trip store for {} has {} trips".format(
+                field_mask(self.vin, 3, 2), self.trip_count
+            )
+        )
+
+    def _insert_trips(self, trips):
+        rows = [trip_to_row(self.vin, trip) for trip in trips if trip.get("id")]
+        with _DB_LOCK, self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO trips VALUES ({})".format(
+                    ",".join(["?"] * 16)
+                ),
+                rows,
+            )
+            return conn.total_changes - before
+
+    def _set_backfilled(self):
+        with _DB_LOCK, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?)",
+                (self.vin, int(dt.utcnow().timestamp())),
+            )
+
+    async def async_sync(self, vehicle):
+        """
+        Fetch new trips from the api and add them to the store.
+
+        Asks for a small batch of the latest trips and only widens the
+        request if every trip in the batch was new, so a normal update
+        costs a single small call. The full history is only asked for until
+        it has been received once. Returns the number of new trips and the
+        latest trip received.
+        """
+        count = (
+            TRIP_SYNC_BATCH if self.trip_count or self.backfilled else TRIP_SYNC_MAX
+        )
+        new_trips = 0
+        latest = None
+
+        while True:
+            result = await self.transport.async_call(
+                vehicle.get_trips, count, priority=PRIORITY_POSITION
+            )
+            trips = result.get("trips") if result else None
+            if not trips:
+                break
+
+            if latest is None:
+                latest = trips[0]
+
+            added = await self.hass.async_add_executor_job(
+                self._insert_trips, trips
+            )
+            new_trips += added
+
+            if added < len(trips) or len(trips) < count or count >= TRIP_SYNC_MAX:
+                break
+            count = min(count * 10, TRIP_SYNC_MAX)
+
+        self.trip_count += new_trips
+        if not self.backfilled:
+            await self.hass.async_add_executor_job(self._set_backfilled)
+            self.backfilled = True
+        if new_trips:
+            _LOGGER.debug(
+                "Added {} trips to store for {}".format(
+                    new_trips, field_mask(self.vin, 3, 2)
+                )
+            )
+        return new_trips, latest
+
+    def _query_trips(self, start_ts, end_ts, min_distance, limit):
+        sql = "SELECT {} FROM trips WHERE vin = ? AND start_ts >= ? AND start_ts < ?".format(
+            ",".join(TRIP_COLUMNS)
+        )
+        params = [self.vin, start_ts, end_ts]
+        if min_distance:
+            sql += " AND distance >= ?"
+            params.append(min_distance)
+        sql += " ORDER BY start_ts DESC LIMIT ?"
+        params.append(limit)
+
+        with self._connect() as conn:
+            return [
+                dict(zip(TRIP_COLUMNS, row))
+                for row in conn.execute(sql, params).fetchall()
+            ]
+
+    async def async_get_trips(self, start=None, end=None, min_distance=None, limit=100):
+        """Return stored trips started within the date range, newest first"""
+        start_ts, end_ts = self._range(start, end)
+        return await self.hass.async_add_executor_job(
+            self._query_trips, start_ts, end_ts, min_distance, limit
+        )
+
+    def _query_summary(self, start_ts, end_ts, period, time_zone):
+        sql = (
+            "SELECT local_period(?, start_ts) AS period, "
+            "COUNT(*), SUM(distance), SUM(end_ts - start_ts), AVG(eco_score), "
+            "SUM(fuel_consumption * distance) / SUM(CASE WHEN fuel_consumption "
+            "IS NOT NULL THEN distance END), "
+            "SUM(energy_consumption * distance) / SUM(CASE WHEN energy_consumption "
+            "IS NOT NULL THEN distance END) "
+            "FROM trips WHERE vin = ? AND start_ts >= ? AND start_ts < ? "
+            "GROUP BY period ORDER BY period"
+        )
+        params = [PERIOD_FORMATS[period], self.vin, start_ts, end_ts]
+
+        def local_period(period_format, timestamp):
+            # Each trip uses its own offset so periods are right across DST
+            return datetime.fromtimestamp(timestamp, time_zone).strftime(
+                period_format
+            )
+
+        with self._connect() as conn:
+            conn.create_function(
+                "local_period", 2, local_period, deterministic=True
+            )
+            return [
+                {
+                    "period": row[0],
+                    "trips": row[1],
+                    "distance": row[2] or 0,
+                    "duration": row[3] or 0,
+                    "eco_score": round(row[4], 1) if row[4] is not None else None,
+                    "fuel_consumption": round(row[5], 1) if row[5] is not None else None,
+                    "energy_consumption": round(row[6], 1) if row[6] is not None else None,
+                }
+                for row in conn.execute(sql, params).fetchall()
+            ]
+
+    async def async_get_summary(self, start=None, end=None, period="day"):
+        """Return per period aggregates for stored trips"""
+        if period not in TRIP_PERIODS:
+            raise ValueError("Invalid period {}".format(period))
+        start_ts, end_ts = self._range(start, end)
+        return await self.hass.async_add_executor_job(
+            self._query_summary, start_ts, end_ts, period, dt.DEFAULT_TIME_ZONE
+        )
+
+    def get_analytics_rows(self, columns):
+        """Return the given columns for all stored trips, oldest first"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT {} FROM trips WHERE vin = ? ORDER BY start_ts".format(
+                    ",".join(columns)
+                ),
+                (self.vin,),
+            ).fetchall()
+
+    def _range(self, start, end):
+        end = end or dt.utcnow()
+        start = start or end - timedelta(days=30)
+        return int(dt.as_utc(start).timestamp()), int(dt.as_utc(end).timestamp())
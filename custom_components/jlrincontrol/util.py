@@ -1,9 +1,49 @@
-from homeassistant.const import UnitOfTemperature
+from importlib import import_module
+
+from homeassistant.const import UnitOfLength, UnitOfTemperature
+from homeassistant.core import callback
+from homeassistant.util import unit_conversion
+
+from .const import L100KM_TO_MPG
+
+try:
+    from homeassistant.core import SupportsResponse
+except ImportError:
+    # Service responses were added in HA 2023.7
+    SupportsResponse = None
+
+
+async def async_import_module(hass, name):
+    """Import a module of this package in the executor on first use"""
+    return await hass.async_add_executor_job(
+        import_module, "{}.{}".format(__package__, name)
+    )
 
 
 def field_mask(str_value, from_start=0, from_end=0):
     str_mask = "x" * (len(str_value) - from_start - from_end)
-    return f"{str_value[:from_start]}{str_mask}{str_value[-from_end:]}"
+    return f"{str_value[:from_start]}{str_mask}{str_value[len(str_value) - from_end:]}"
+
+
+def distance_conversion_factor(from_unit, to_unit):
+    """Multiplier to convert a distance between units"""
+    return unit_conversion.DistanceConverter.convert(1, from_unit, to_unit)
+
+
+def pressure_conversion_factor(from_unit, to_unit):
+    """Multiplier to convert a pressure between units"""
+    return unit_conversion.PressureConverter.convert(1, from_unit, to_unit)
+
+
+def convert_fuel_consumption(value, distance_unit):
+    """
+    Convert average fuel consumption from trip data to local units.
+
+    Works on single values or numpy arrays.
+    """
+    if distance_unit == UnitOfLength.KILOMETERS:
+        return value
+    return (value // 1) * L100KM_TO_MPG
 
 
 def convert_temp_value(temp_unit, service_code, target_value):
@@ -31,3 +71,49 @@ def convert_temp_value(temp_unit, service_code, target_value):
             # Convert from F
             return min(285, max(155, int(((target_value - 27) / 2) * 10)))
 
+
+
+def async_create_entry_task(hass, config_entry, target, name):
+    """
+    Run a task for a config entry that does not hold up startup.
+
+    Background tasks for config entries were added in HA 2023.10. On older
+    versions a plain task is used, cancelled when the entry is unloaded.
+    """
+    if hasattr(config_entry, "async_create_background_task"):
+        return config_entry.async_create_background_task(hass, target, name)
+
+    task = hass.async_create_task(target)
+
+    @callback
+    def async_cancel_task():
+        if not task.done():
+            task.cancel()
+
+    config_entry.async_on_unload(async_cancel_task)
+    return task
+
+
+def async_register_data_service(hass, domain, service, handler, schema):
+    """
+    Register a service that returns data.
+
+    On HA versions without service responses, the result is fired as a
+    {domain}_{service} event instead.
+    """
+    if SupportsResponse:
+        hass.services.async_register(
+            domain,
+            service,
+            handler,
+            schema=schema,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+        return
+
+    async def async_fire_response(call):
+        result = await handler(call)
+        if result is not None:
+            hass.bus.async_fire(f"{domain}_{service}", result)
+
+    hass.services.async_register(domain, service, async_fire_response, schema=schema)
@@ -0,0 +1,85 @@
+"""
+Static vehicle profile for JLR InControl.
+
+Vehicle attributes and unit settings do not change between updates, so
+the values entities need from them are resolved once when the vehicle is
+set up rather than on every state read.
+"""
+import logging
+
+from homeassistant.const import UnitOfLength, UnitOfPressure
+
+from .const import DATA_ATTRS_CAR_INFO, SERVICE_CODE_ANY
+from .util import distance_conversion_factor, pressure_conversion_factor
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def resolve_distance_unit(hass, distance_unit):
+    """Distance unit from options, or HA unit system if not set"""
+    if distance_unit and distance_unit != "Default":
+        return distance_unit
+    return hass.config.units.length_unit
+
+
+def resolve_pressure_unit(hass, pressure_unit):
+    """Pressure unit from options, or bar/psi from HA unit system if not set"""
+    if pressure_unit and pressure_unit != "Default":
+        return pressure_unit
+    if hass.config.units.pressure_unit == UnitOfPressure.PA:
+        return UnitOfPressure.BAR
+    return UnitOfPressure.PSI
+
+
+class JLRVehicleProfile:
+    """Car info, capabilities and resolved units for a vehicle"""
+
+    def __init__(self, hass, vehicle, distance_unit=None, pressure_unit=None):
+        attributes = vehicle.attributes or {}
+
+        self.car_info = {
+            k.title(): attributes.get(v)
+            for k, v in DATA_ATTRS_CAR_INFO.items()
+            if attributes.get(v)
+        }
+
+        # Services the vehicle can use
+        self.services = {
+            service.get("serviceType")
+            for service in attributes.get("availableServices") or []
+            if service.get("vehicleCapable") and service.get("serviceEnabled")
+        }
+
+        # Capability names, which are returned as strings or dicts
+        self.capabilities = set()
+        for capability in attributes.get("capabilities") or []:
+            if isinstance(capability, dict):
+                capability = capability.get("capability") or capability.get("name")
+            if capability:
+                self.capabilities.add(capability)
+
+        self.distance_unit = resolve_distance_unit(hass, distance_unit)
+        self.pressure_unit = resolve_pressure_unit(hass, pressure_unit)
+
+        self._distance_factors = {
+            unit: distance_conversion_factor(unit, self.distance_unit)
+            for unit in [UnitOfLength.METERS, UnitOfLength.KILOMETERS]
+        }
+        self._pressure_factor = pressure_conversion_factor(
+            UnitOfPressure.KPA, self.pressure_unit
+        )
+
+    def supports(self, service_code):
+        """Whether the vehicle can use a service code"""
+        return service_code == SERVICE_CODE_ANY or service_code in self.services
+
+    def has_capability(self, capability):
+        return capability in self.capabilities
+
+    def convert_distance(self, value, from_unit=UnitOfLength.KILOMETERS):
+        """Convert a distance to the vehicle distance unit"""
+        return value * self._distance_factors[from_unit]
+
+    def convert_pressure(self, value):
+        """Convert a pressure in kPa to the vehicle pressure unit"""
+        return value * self._pressure_factor
@@ -0,0 +1 @@
+"""Tests for the JLR InControl integration."""
@@ -0,0 +1,144 @@
+"""Fake JLR InControl account and helpers for tests."""
+import itertools
+
+from homeassistant.util import dt
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.jlrincontrol.const import DATA_ATTRS_WINDOW_STATUS, DOMAIN
+
+VIN = "SALVIN00000000000"
+
+CONFIG_DATA = {
+    "username": "test@example.com",
+    "password": "password",
+    "use_china_servers": False,
+}
+
+SERVICE_CODES = ["RDL", "RDU", "VHS", "HBLF", "CP", "ECC"]
+
+
+def _key_values(values):
+    return [{"key": key, "value": value} for key, value in values.items()]
+
+
+class FakeVehicle(dict):
+    """Vehicle on the fake account, recording the api calls made"""
+
+    def __init__(self, vin, connection):
+        super().__init__({"vin": vin})
+        self.vin = vin
+        self.connection = connection
+        self.calls = []
+        self.service_ids = itertools.count(1)
+
+    def get_attributes(self):
+        self.calls.append("attributes")
+        return {
+            "nickname": "Car 00",
+            "vehicleBrand": "Jaguar",
+            "vehicleType": "I-PACE",
+            "fuelType": "Electric",
+            "registrationNumber": "AB12CDE",
+            "modelYear": 2020,
+            "availableServices": [
+                {"serviceType": code, "vehicleCapable": True, "serviceEnabled": True}
+                for code in SERVICE_CODES
+            ],
+            "capabilities": [],
+        }
+
+    def get_status(self, key=None):
+        self.calls.append("status")
+        return {
+            "vehicleStatus": {
+                "coreStatus": _key_values(
+                    {
+                        "DOOR_IS_ALL_DOORS_LOCKED": "TRUE",
+                        "PRIVACY_SWITCH": "FALSE",
+                        "VEHICLE_STATE_TYPE": "KEY_REMOVED",
+                        "ODOMETER_METER": "12345000",
+                        **{key: "CLOSED" for key in DATA_ATTRS_WINDOW_STATUS.values()},
+                    }
+                ),
+                "evStatus": _key_values(
+                    {
+                        "EV_STATE_OF_CHARGE": "50",
+                        "EV_CHARGING_STATUS": "NOTCONNECTED",
+                    }
+                ),
+            },
+            "lastUpdatedTime": dt.utcnow().strftime("%Y-%m-%dT%H:%M:%S+0000"),
+        }
+
+    def get_position(self):
+        self.calls.append("position")
+        return {
+            "position": {
+                "latitude": 51.5,
+                "longitude": -0.1,
+                "speed": 0,
+                "heading": 0,
+                "timestamp": dt.utcnow().strftime("%Y-%m-%dT%H:%M:%S+0000"),
+            }
+        }
+
+    def get_trips(self, count=1000, start=None, stop=None):
+        self.calls.append("trips")
+        return {"trips": []}
+
+    def get_services(self):
+        self.calls.append("services")
+        return {"services": []}
+
+    def get_service_status(self, service_id):
+        self.calls.append("service_status")
+        return {"status": "Successful"}
+
+    def _command(self, name):
+        self.calls.append(name)
+        return {"customerServiceId": str(next(self.service_ids))}
+
+    def lock(self, pin):
+        return self._command("lock")
+
+    def unlock(self, pin):
+        return self._command("unlock")
+
+    def honk_blink(self):
+        return self._command("honk_blink")
+
+    def preconditioning_start(self, target_temp):
+        return self._command("preconditioning_start")
+
+    def set_max_soc(self, max_charge_level):
+        return self._command("set_max_soc")
+
+
+class FakeConnection:
+    """Account with a single vehicle"""
+
+    instances = []
+
+    def __init__(
+        self, email, password, device_id="", refresh_token="", use_china_servers=False
+    ):
+        self.email = email
+        self.vehicles = [FakeVehicle(VIN, self)]
+        FakeConnection.instances.append(self)
+
+    def reverse_geocode(self, lat, lon):
+        return {"formattedAddress": "Somewhere"}
+
+
+async def async_setup_integration(hass, options=None):
+    """Set up an entry and wait until it has connected."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=CONFIG_DATA,
+        options={"pin": "1234", "distance_unit": "km", **(options or {})},
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.data[DOMAIN][entry.entry_id]["setup_task"]
+    await hass.async_block_till_done()
+    return entry
@@ -0,0 +1,31 @@
+"""Fixtures for JLR InControl tests."""
+from unittest.mock import patch
+
+import pytest
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .common import FakeConnection
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Load the integration from custom_components."""
+    yield
+
+
+@pytest.fixture
+def config_dir(hass, tmp_path):
+    """Keep trip and position history in a fresh directory for each test."""
+    hass.config.config_dir = str(tmp_path)
+    (tmp_path / STORAGE_DIR).mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def mock_connection():
+    """Replace the jlrpy connection with a fake account of one vehicle."""
+    FakeConnection.instances.clear()
+    with patch("jlrpy.Connection", FakeConnection):
+        yield FakeConnection.instances
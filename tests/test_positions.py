@@ -0,0 +1,101 @@
+"""Tests for the position log."""
+from custom_components.jlrincontrol.positions import (
+    LOG_HEADER,
+    JLRPositionLog,
+    decode_log,
+    decode_records,
+    encode_record,
+)
+
+RECORDS = [
+    (1700000000, 51500000, -100000),
+    (1700000060, 51500120, -100250),
+    (1700000120, 51499000, 50000),
+]
+
+VIN = "SALVIN00000000000"
+
+
+def _encode(records):
+    data = bytearray()
+    previous = (0, 0, 0)
+    for record in records:
+        data += encode_record(record, previous)
+        previous = record
+    return bytes(data)
+
+
+def test_round_trip():
+    """Records decode back to the values encoded, including negative deltas."""
+    columns = decode_records(_encode(RECORDS))
+    assert [list(column) for column in columns] == [list(c) for c in zip(*RECORDS)]
+
+
+def test_small_deltas_use_one_byte():
+    """A small move costs a byte per field."""
+    assert len(encode_record((61, 1, -1), (0, 0, 0))) == 3
+
+
+def test_partial_record_dropped():
+    """A partly written last record is not decoded."""
+    complete = _encode(RECORDS[:2])
+    data = _encode(RECORDS)[: len(complete) + 2]
+
+    columns, length = decode_log(data)
+
+    assert [list(column) for column in columns] == [
+        list(c) for c in zip(*RECORDS[:2])
+    ]
+    assert length == len(complete)
+
+
+def test_empty():
+    columns, length = decode_log(b"")
+    assert [list(column) for column in columns] == [[], [], []]
+    assert length == 0
+
+
+async def test_load_truncates_partial_record(hass, config_dir):
+    """Loading cuts off a partial record so new ones decode in step."""
+    log = JLRPositionLog(hass, VIN)
+    complete = _encode(RECORDS[:2])
+    with open(log.path, "wb") as file:
+        file.write(LOG_HEADER + _encode(RECORDS)[: len(complete) + 2])
+
+    await log.async_load()
+    assert list(log.timestamps) == [RECORDS[0][0], RECORDS[1][0]]
+    with open(log.path, "rb") as file:
+        assert file.read() == LOG_HEADER + complete
+
+    timestamp, latitude, longitude = RECORDS[2]
+    assert await log.async_add_position(
+        {
+            "position": {
+                "latitude": latitude / 1000000,
+                "longitude": longitude / 1000000,
+                "timestamp": "2023-11-14T22:15:20+00:00",
+            }
+        }
+    )
+
+    reloaded = JLRPositionLog(hass, VIN)
+    await reloaded.async_load()
+    assert list(reloaded.timestamps) == [r[0] for r in RECORDS]
+    assert list(reloaded.latitudes) == [r[1] for r in RECORDS]
+    assert list(reloaded.longitudes) == [r[2] for r in RECORDS]
+
+
+async def test_unchanged_position_not_added(hass, config_dir):
+    log = JLRPositionLog(hass, VIN)
+    await log.async_load()
+    position = {
+        "position": {
+            "latitude": 51.5,
+            "longitude": -0.1,
+            "timestamp": "2023-11-14T22:13:20+00:00",
+        }
+    }
+    assert await log.async_add_position(position)
+    position["position"]["timestamp"] = "2023-11-14T22:14:20+00:00"
+    assert not await log.async_add_position(position)
+    assert len(log.timestamps) == 1
@@ -0,0 +1,101 @@
+"""Tests for the account rate limiter."""
+import asyncio
+
+import pytest
+
+from custom_components.jlrincontrol.ratelimit import (
+    PRIORITY_COMMAND,
+    PRIORITY_HEALTH,
+    PRIORITY_POSITION,
+    PRIORITY_STATUS,
+    JLRRateLimiter,
+    JLRRateLimitExceeded,
+)
+
+
+def test_no_budget_always_allowed():
+    limiter = JLRRateLimiter()
+    limiter.used[PRIORITY_STATUS] = 10000
+    assert limiter.allow(PRIORITY_HEALTH)
+    assert limiter.remaining is None
+
+
+@pytest.mark.parametrize(
+    ("used", "allowed"),
+    [
+        (49, [PRIORITY_COMMAND, PRIORITY_STATUS, PRIORITY_POSITION, PRIORITY_HEALTH]),
+        (50, [PRIORITY_COMMAND, PRIORITY_STATUS, PRIORITY_POSITION]),
+        (75, [PRIORITY_COMMAND, PRIORITY_STATUS]),
+        (90, [PRIORITY_COMMAND]),
+        (100, []),
+    ],
+)
+def test_budget_shared_by_priority(used, allowed):
+    """Lower priorities stop earlier, keeping the rest for commands."""
+    limiter = JLRRateLimiter(daily_budget=100)
+    limiter.used[PRIORITY_STATUS] = used
+    assert [
+        priority
+        for priority in (
+            PRIORITY_COMMAND,
+            PRIORITY_STATUS,
+            PRIORITY_POSITION,
+            PRIORITY_HEALTH,
+        )
+        if limiter.allow(priority)
+    ] == allowed
+
+
+def test_paused_priorities_reported():
+    limiter = JLRRateLimiter(daily_budget=100)
+    limiter.used[PRIORITY_STATUS] = 80
+    limiter.allow(PRIORITY_POSITION)
+    limiter.allow(PRIORITY_HEALTH)
+    assert limiter.as_dict()["paused"] == ["health", "position"]
+    assert limiter.as_dict()["remaining_today"] == 20
+
+
+async def test_acquire_over_budget_raises():
+    limiter = JLRRateLimiter(daily_budget=2)
+    await limiter.async_acquire(PRIORITY_COMMAND)
+    await limiter.async_acquire(PRIORITY_COMMAND)
+    with pytest.raises(JLRRateLimitExceeded):
+        await limiter.async_acquire(PRIORITY_COMMAND)
+    assert limiter.rejected == 1
+    assert limiter.used_today == 2
+
+
+async def test_waiters_released_in_priority_order():
+    """Once the burst is used, waiting commands go before health updates."""
+    limiter = JLRRateLimiter(per_minute=6000, burst=1)
+    await limiter.async_acquire(PRIORITY_HEALTH)
+
+    order = []
+
+    async def acquire(priority):
+        await limiter.async_acquire(priority)
+        order.append(priority)
+
+    tasks = [
+        asyncio.create_task(acquire(priority))
+        for priority in (PRIORITY_HEALTH, PRIORITY_STATUS, PRIORITY_COMMAND)
+    ]
+    await asyncio.sleep(0)
+    assert len(limiter._waiters) == 3
+    await asyncio.wait_for(asyncio.gather(*tasks), 5)
+
+    assert order == [PRIORITY_COMMAND, PRIORITY_STATUS, PRIORITY_HEALTH]
+    assert limiter.waited == 3
+    limiter.cancel()
+
+
+async def test_cancel_releases_waiters():
+    limiter = JLRRateLimiter(per_minute=1, burst=1)
+    await limiter.async_acquire(PRIORITY_STATUS)
+    task = asyncio.create_task(limiter.async_acquire(PRIORITY_STATUS))
+    await asyncio.sleep(0)
+
+    limiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not limiter._waiters
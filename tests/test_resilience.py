@@ -0,0 +1,83 @@
+"""Tests for the circuit breaker."""
+import time
+
+from custom_components.jlrincontrol.resilience import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    JLRCircuitBreaker,
+    backoff_delay,
+)
+
+
+def make_breaker():
+    return JLRCircuitBreaker(3, 60, 3600)
+
+
+def test_backoff_delay_has_jitter_and_limit():
+    delays = {backoff_delay(60, 3600, 2) for _ in range(50)}
+    assert all(120 <= delay <= 240 for delay in delays)
+    assert len(delays) > 1
+    assert all(1800 <= backoff_delay(60, 3600, 20) <= 3600 for _ in range(50))
+
+
+def test_opens_after_threshold():
+    breaker = make_breaker()
+    assert breaker.record_failure("one") is None
+    assert breaker.record_failure("two") is None
+    assert breaker.state == STATE_CLOSED
+
+    delay = breaker.record_failure("three")
+    assert 30 <= delay <= 60
+    assert breaker.state == STATE_OPEN
+    assert breaker.last_error == "three"
+    assert breaker.trips == 1
+
+    assert not breaker.allow_request()
+    assert breaker.rejected == 1
+    # Further failures while open do not reschedule the probe
+    assert breaker.record_failure("four") is None
+
+
+def test_single_probe_when_half_open():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.retry_at = time.monotonic()
+
+    assert breaker.allow_request()
+    assert breaker.state == STATE_HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.cancel_probe()
+    assert breaker.allow_request()
+
+
+def test_failed_probe_waits_longer():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.retry_at = time.monotonic()
+    assert breaker.allow_request()
+
+    delay = breaker.record_failure()
+    assert 60 <= delay <= 120
+    assert breaker.level == 1
+    assert breaker.state == STATE_OPEN
+    assert breaker.trips == 1
+
+
+def test_success_closes():
+    breaker = make_breaker()
+    assert not breaker.record_success()
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.retry_at = time.monotonic()
+    assert breaker.allow_request()
+
+    assert breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failures == 0
+    assert breaker.level == 0
+    assert breaker.allow_request()
+    assert breaker.as_dict()["times_opened"] == 1
@@ -0,0 +1,151 @@
+"""Tests for the run_sequence service."""
+from unittest.mock import patch
+
+import pytest
+import voluptuous as vol
+
+from custom_components.jlrincontrol import SERVICE_SCHEMAS
+from custom_components.jlrincontrol.const import DOMAIN, SEQUENCE_MAX_STEPS
+
+from .common import VIN, async_setup_integration
+
+ENTITY_ID = "sensor.car_00_info"
+
+
+@pytest.fixture(autouse=True)
+def no_status_wait():
+    """Skip the wait between service status checks."""
+    with patch("custom_components.jlrincontrol.services.asyncio.sleep"):
+        yield
+
+
+async def run_sequence(hass, steps, **data):
+    return await hass.services.async_call(
+        DOMAIN,
+        "run_sequence",
+        {"entity_id": ENTITY_ID, "steps": steps, **data},
+        blocking=True,
+        return_response=True,
+    )
+
+
+def test_schema():
+    schema = SERVICE_SCHEMAS["run_sequence"]
+    data = schema(
+        {
+            "entity_id": ENTITY_ID,
+            "steps": [{"service": "start_preconditioning", "target_temp": "21"}],
+        }
+    )
+    assert data["steps"] == [{"service": "start_preconditioning", "target_temp": 21}]
+
+    with pytest.raises(vol.Invalid):
+        schema({"entity_id": ENTITY_ID, "steps": []})
+    with pytest.raises(vol.Invalid):
+        schema({"entity_id": ENTITY_ID, "steps": [{"service": "not_a_service"}]})
+    with pytest.raises(vol.Invalid):
+        schema(
+            {
+                "entity_id": ENTITY_ID,
+                "steps": [{"service": "honk_blink"}] * (SEQUENCE_MAX_STEPS + 1),
+            }
+        )
+
+
+async def test_steps_run_in_order(hass, config_dir, mock_connection):
+    entry = await async_setup_integration(hass)
+    vehicle = mock_connection[-1].vehicles[0]
+    vehicle.calls.clear()
+
+    response = await run_sequence(
+        hass,
+        [
+            {"service": "unlock_vehicle"},
+            {"service": "start_preconditioning", "target_temp": 21},
+            {"service": "set_max_charge_level", "max_charge_level": 80},
+        ],
+    )
+
+    assert response["success"]
+    assert response["error"] is None
+    assert [step["status"] for step in response["steps"]] == ["Successful"] * 3
+    commands = ["unlock", "preconditioning_start", "set_max_soc"]
+    assert [call for call in vehicle.calls if call in commands] == commands
+    # Pending services checked once and one status refresh at the end
+    assert vehicle.calls.count("services") == 1
+    assert vehicle.calls.count("status") == 1
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+@pytest.mark.parametrize(
+    ("steps", "options", "error"),
+    [
+        (
+            [
+                {"service": "honk_blink"},
+                {"service": "start_vehicle", "target_value": 21},
+            ],
+            {},
+            "not available",
+        ),
+        (
+            [{"service": "honk_blink"}, {"service": "start_preconditioning"}],
+            {},
+            "Invalid step start_preconditioning",
+        ),
+        (
+            [{"service": "honk_blink"}, {"service": "unlock_vehicle"}],
+            {"pin": ""},
+            "needs a pin",
+        ),
+    ],
+)
+async def test_invalid_sequence_runs_nothing(
+    hass, config_dir, mock_connection, steps, options, error
+):
+    """Every step is checked before any is sent."""
+    entry = await async_setup_integration(hass, options)
+    vehicle = mock_connection[-1].vehicles[0]
+    vehicle.calls.clear()
+
+    response = await run_sequence(hass, steps)
+
+    assert not vehicle.calls
+    assert not response["success"]
+    assert error in response["error"]
+    assert [step["status"] for step in response["steps"]] == ["Skipped"] * 2
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_failed_step_stops_sequence(hass, config_dir, mock_connection):
+    entry = await async_setup_integration(hass)
+    data = hass.data[DOMAIN][entry.entry_id]["jlr_data"]
+
+    def refused(pin):
+        raise ValueError("Refused")
+
+    data.vehicles[VIN].unlock = refused
+    response = await run_sequence(
+        hass, [{"service": "unlock_vehicle"}, {"service": "honk_blink"}]
+    )
+
+    assert not response["success"]
+    assert [step["status"] for step in response["steps"]] == ["Failed", "Skipped"]
+    assert "honk_blink" not in mock_connection[-1].vehicles[0].calls
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_pending_service_rejects_sequence(hass, config_dir, mock_connection):
+    entry = await async_setup_integration(hass)
+    data = hass.data[DOMAIN][entry.entry_id]["jlr_data"]
+
+    async def pending(service_codes):
+        return True
+
+    data.get_service(VIN).async_get_services = pending
+    response = await run_sequence(hass, [{"service": "honk_blink"}])
+
+    assert not response["success"]
+    assert "still processing" in response["error"]
+    assert [step["status"] for step in response["steps"]] == ["Skipped"]
+    assert await hass.config_entries.async_unload(entry.entry_id)
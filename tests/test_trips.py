@@ -0,0 +1,146 @@
+"""Tests for the local trip store."""
+from datetime import datetime
+
+from homeassistant.util import dt
+
+from custom_components.jlrincontrol.const import TRIP_SYNC_BATCH, TRIP_SYNC_MAX
+from custom_components.jlrincontrol.trips import JLRTripStore
+
+VIN = "SALVIN00000000000"
+
+
+def make_trip(trip_id, start, distance=10000):
+    """An InControl trip starting at a UTC time string"""
+    return {
+        "id": trip_id,
+        "tripDetails": {
+            "startTime": start,
+            "endTime": start,
+            "distance": distance,
+            "averageFuelConsumption": 6.0,
+            "totalEcoScore": {"score": 80},
+        },
+    }
+
+
+class FakeTransport:
+    """Returns the newest trips first, as the api does"""
+
+    def __init__(self, trips):
+        self.trips = trips
+        self.counts = []
+
+    async def async_call(self, func, count, priority=None):
+        self.counts.append(count)
+        return {"trips": self.trips[:count]}
+
+
+class FakeVehicle:
+    def get_trips(self, count):
+        pass
+
+
+def trips_for_days(days):
+    return [
+        make_trip(day, "2024-01-{:02d}T08:00:00+0000".format(day))
+        for day in range(days, 0, -1)
+    ]
+
+
+async def test_first_sync_fetches_history(hass, config_dir):
+    """The full history is asked for once, then only the latest batch."""
+    transport = FakeTransport(trips_for_days(5))
+    store = JLRTripStore(hass, VIN, transport)
+    await store.async_setup()
+
+    new_trips, latest = await store.async_sync(FakeVehicle())
+    assert transport.counts == [TRIP_SYNC_MAX]
+    assert new_trips == 5
+    assert latest["id"] == 5
+
+    new_trips, latest = await store.async_sync(FakeVehicle())
+    assert transport.counts == [TRIP_SYNC_MAX, TRIP_SYNC_BATCH]
+    assert new_trips == 0
+    assert latest["id"] == 5
+
+
+async def test_no_trips_backfilled_once(hass, config_dir):
+    """A vehicle with no trips does not ask for the full history again."""
+    transport = FakeTransport([])
+    store = JLRTripStore(hass, VIN, transport)
+    await store.async_setup()
+    await store.async_sync(FakeVehicle())
+
+    restarted = JLRTripStore(hass, VIN, transport)
+    await restarted.async_setup()
+    new_trips, latest = await restarted.async_sync(FakeVehicle())
+
+    assert transport.counts == [TRIP_SYNC_MAX, TRIP_SYNC_BATCH]
+    assert new_trips == 0
+    assert latest is None
+
+
+async def test_sync_widens_when_batch_all_new(hass, config_dir):
+    """A full batch of new trips widens the request to catch up."""
+    transport = FakeTransport(trips_for_days(1))
+    store = JLRTripStore(hass, VIN, transport)
+    await store.async_setup()
+    await store.async_sync(FakeVehicle())
+
+    transport.trips = trips_for_days(25)
+    new_trips, _ = await store.async_sync(FakeVehicle())
+
+    assert transport.counts[1:] == [TRIP_SYNC_BATCH, TRIP_SYNC_BATCH * 10]
+    assert new_trips == 24
+    assert store.trip_count == 25
+
+
+async def test_summary_by_period(hass, config_dir):
+    transport = FakeTransport(trips_for_days(3))
+    store = JLRTripStore(hass, VIN, transport)
+    await store.async_setup()
+    await store.async_sync(FakeVehicle())
+
+    start = datetime(2024, 1, 1, tzinfo=dt.UTC)
+    end = datetime(2024, 2, 1, tzinfo=dt.UTC)
+    days = await store.async_get_summary(start, end, "day")
+    assert [day["period"] for day in days] == [
+        "2024-01-01",
+        "2024-01-02",
+        "2024-01-03",
+    ]
+    assert all(day["trips"] == 1 for day in days)
+
+    months = await store.async_get_summary(start, end, "month")
+    assert months == [
+        {
+            "period": "2024-01",
+            "trips": 3,
+            "distance": 30000,
+            "duration": 0,
+            "eco_score": 80.0,
+            "fuel_consumption": 6.0,
+            "energy_consumption": None,
+        }
+    ]
+
+
+async def test_summary_uses_local_date_across_dst(hass, config_dir):
+    """Each trip is bucketed with the UTC offset at its own start."""
+    await hass.config.async_update(time_zone="Europe/London")
+    transport = FakeTransport(
+        [
+            # 23:30 BST on 1 July
+            make_trip(2, "2024-07-01T22:30:00+0000"),
+            # 23:30 GMT on 10 January
+            make_trip(1, "2024-01-10T23:30:00+0000"),
+        ]
+    )
+    store = JLRTripStore(hass, VIN, transport)
+    await store.async_setup()
+    await store.async_sync(FakeVehicle())
+
+    days = await store.async_get_summary(
+        datetime(2024, 1, 1, tzinfo=dt.UTC), datetime(2024, 12, 1, tzinfo=dt.UTC)
+    )
+    assert [day["period"] for day in days] == ["2024-01-10", "2024-07-01"]